@@ -1,15 +1,29 @@
-
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.serving import run_simple
-from flask import Flask, request, url_for, render_template_string
+from flask import Flask, request, url_for, render_template_string, jsonify, abort, send_from_directory
+from dash.fingerprint import check_fingerprint
 from pathlib import Path
 from importlib import import_module
 import os
+import threading
+import time
+
+from ebm.figurbuffer import Figurbuffer, SqliteFigurbuffer, bufre_callbacks
+from ebm.koalesering import Koalesering, koalesere_callbacks
+from ebm.komprimering import komprimere, versjonerte_filer
+from ebm.serialisering import Serialisering, serialisere_callbacks
 
 # Simple application dispatching for Dash. Adding all dash instances
 # to the same flask instance is apparently quite bug-prone, so we
 # instantiate a new flask instance for each dash component, and
 # dispatch with Wergzeug middleware.
+#
+# HOST_MODE=single instead mounts every dash module on the one flask
+# instance, each under its own prefix, and serves the Dash and
+# dash-bootstrap-components bundles (and modules/assets) from a single shared
+# route, so the browser downloads and caches them once for all modules.
+# Flask cannot safely take new routes while it is serving, so in this mode all
+# modules are imported at startup.
 
 # module_dir = "Apper_SDG613"
 module_dir = "modules"
@@ -17,40 +31,271 @@ global_prefix = os.environ.get("PASSENGER_BASE_URI")
 if global_prefix is None:
     global_prefix = ''
 
+host_mode = os.environ.get("HOST_MODE", "dispatcher")
+if host_mode not in ("dispatcher", "single"):
+    raise ValueError("HOST_MODE must be 'dispatcher' or 'single', not %r" % host_mode)
+
 modules = [ f.stem for f in Path(module_dir).glob("*.py") ]
+assets_folder = os.path.abspath(os.path.join(module_dir, "assets"))
 server = Flask(__name__)
 
+# One cache of serialized callback responses, shared by all dash apps.
+# Set FIGURBUFFER to a file path to share it between worker processes.
+figurbuffer_sti = os.environ.get("FIGURBUFFER")
+if figurbuffer_sti:
+    figurbuffer = SqliteFigurbuffer(figurbuffer_sti)
+else:
+    figurbuffer = Figurbuffer()
+
+# Only the newest of several waiting callback requests from the same browser
+# session is run, so typing in a text box does not queue up stale model runs.
+koalesering = Koalesering()
+
+# Brotli or gzip for every response above a size threshold, on the root server
+# and on every dash app's server. Compressed bundles and cached figures are kept
+# here, so plotly.js is not compressed again for every visitor.
+komprimeringsbuffer = Figurbuffer(maks_bytes=32 * 2**20)
+
+
+def add_compression(flask_app):
+    # Before bufre_callbacks, so the figure cache stores uncompressed responses.
+    komprimere(flask_app, komprimeringsbuffer)
+    versjonerte_filer(flask_app)
+
+
+add_compression(server)
+
+# FIGURSIFFER=<n> turns callback responses and layouts into JSON with
+# ebm.serialisering instead of plotly's encoder, with the numbers in figure
+# traces rounded to n significant digits. FIGURSIFFER=alle uses the faster
+# encoder without rounding. Sizes and times per callback are in /metrics.
+figursiffer = os.environ.get("FIGURSIFFER")
+serialisering = None
+if figursiffer:
+    serialisering = serialisere_callbacks(Serialisering(None if figursiffer == 'alle' else int(figursiffer)))
+
+if host_mode == "single":
+    # Both key on the prefix of the dash app, so the apps can share the hooks.
+    bufre_callbacks(server, figurbuffer)
+    koalesere_callbacks(server, koalesering)
+
+# Dash apps mounted on `server` itself (single host mode).
+dash_apps = []
+
+
+def resident_memory():
+    # Current resident set size of this process in bytes, or None if unknown.
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_usage():
+    # Memory of this worker in bytes. Pages of files that several workers map
+    # (like the shared data tables in ebm.datasett) count as shared, and pss
+    # splits them between the workers, so the sum of pss over the workers is
+    # the memory the whole server uses.
+    usage = {'pid': os.getpid(), 'rss_bytes': resident_memory()}
+    try:
+        with open('/proc/self/smaps_rollup') as rollup:
+            fields = {}
+            for line in rollup:
+                parts = line.split()
+                if len(parts) == 3 and parts[0].endswith(':') and parts[2] == 'kB':
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return usage
+    usage['pss_bytes'] = fields.get('Pss')
+    usage['shared_bytes'] = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    usage['private_bytes'] = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return usage
+
+
+class LazyModule:
+    """
+    WSGI app for one dash module that imports and initializes the module on its
+    first request. Until then only the prefix is registered, so startup does not
+    pay for reading CSVs and building layouts of apps nobody has opened yet.
+    """
+
+    def __init__(self, module, prefix):
+        self.module = module
+        self.prefix = prefix
+        self.title = module
+        self.status = 'not loaded'
+        self.import_seconds = None
+        self.rss_delta = None
+        self.local_server = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.status != 'not loaded':
+                return self.local_server
+            rss_before = resident_memory()
+            start = time.perf_counter()
+            try:
+                dash_module = import_module(module_dir + '.' + self.module)
+                dash_app = dash_module.app
+                if host_mode == "single":
+                    local_server = server
+                    dash_app.init_app(server, routes_pathname_prefix='/' + self.module + '/',
+                                      requests_pathname_prefix=self.prefix + '/')
+                    use_shared_assets(dash_app)
+                    dash_apps.append(dash_app)
+                else:
+                    # Create local server to avoid blueprint collisions. (Probably a dash bug)
+                    local_server = Flask(self.prefix)
+                    dash_app.init_app(local_server, url_base_pathname=self.module + '/',
+                                      requests_pathname_prefix=self.prefix + '/')
+                    add_compression(local_server)
+                    bufre_callbacks(local_server, figurbuffer)
+                    koalesere_callbacks(local_server, koalesering)
+            except Exception:
+                self.status = 'failed'
+                server.logger.info("Invalid dash module " + self.module)
+                return None
+            finally:
+                self.import_seconds = time.perf_counter() - start
+                rss_after = resident_memory()
+                if rss_before is not None and rss_after is not None:
+                    self.rss_delta = rss_after - rss_before
+            self.local_server = local_server
+            self.title = dash_app.title if dash_app.title is not None else self.module
+            self.status = 'loaded'
+            return local_server
+
+    def metrics(self):
+        return {'title': self.title,
+                'status': self.status,
+                'import_seconds': self.import_seconds,
+                'rss_delta_bytes': self.rss_delta}
+
+    def __call__(self, environ, start_response):
+        local_server = self.local_server or self.load()
+        if local_server is None:
+            # Same as before lazy loading: a broken module is not mounted.
+            return server(environ, start_response)
+        return local_server(environ, start_response)
+
+
+def use_shared_assets(dash_app):
+    # Point the script and stylesheet tags in the index page of dash_app at the
+    # shared routes below instead of the copies under its own prefix.
+    own_prefix = dash_app.config.requests_pathname_prefix
+    replacements = [(own_prefix + '_dash-component-suites/', global_prefix + '/_dash-component-suites/')]
+    if os.path.abspath(dash_app.config.assets_folder) == assets_folder:
+        replacements.append((own_prefix + 'assets/', global_prefix + '/assets/'))
+    interpolate_index = dash_app.interpolate_index
+
+    def shared_interpolate_index(**kwargs):
+        for key in ('scripts', 'css'):
+            for old, new in replacements:
+                kwargs[key] = kwargs[key].replace(old, new)
+        return interpolate_index(**kwargs)
+
+    dash_app.interpolate_index = shared_interpolate_index
+
+
+if host_mode == "single":
+    @server.route('/_dash-component-suites/<string:package_name>/<path:fingerprinted_path>')
+    def shared_component_suites(package_name, fingerprinted_path):
+        # The bundle from the first mounted dash app that uses it. They are the
+        # same files in every app, fingerprinted with the package version.
+        path_in_package, _ = check_fingerprint(fingerprinted_path)
+        for dash_app in dash_apps:
+            if path_in_package in dash_app.registered_paths.get(package_name, ()):
+                return dash_app.serve_component_suites(package_name, fingerprinted_path)
+        abort(404)
+
+    @server.route('/assets/<path:filename>')
+    def shared_assets(filename):
+        return send_from_directory(assets_folder, filename)
+
+
+# Modules to import at startup instead of on first request, comma separated
+# (PRELOAD_MODULES="toboks_framtid,planckkurve"), or "*" for all of them.
+# In single host mode all modules are imported at startup.
+preload = os.environ.get("PRELOAD_MODULES", "")
+if host_mode == "single" or preload.strip() == '*':
+    preload = modules
+else:
+    preload = [m.strip() for m in preload.split(',') if m.strip()]
+
 module_registry = {}
-module_index = {}
+lazy_modules = {}
 for module in modules:
-    prefix = global_prefix + '/' + module 
-    try:
-        dash_module = import_module(module_dir +  '.' + module)
-        # Create local server to avoid blueprint collisions. (Probably a dash bug)
-        local_server = Flask(prefix)
-        dash_app = dash_module.app
-        dash_app.init_app(local_server, url_base_pathname = module + '/', requests_pathname_prefix=prefix + '/')
-
-        module_registry['/' + module] = local_server
-        module_index[prefix] = dash_app.title if dash_app.title is not None else module
-    except Exception as inst:
-        module_index[prefix] =  module  + ' (not loaded)'
-        server.logger.info("Invalid dash module " + module)
+    prefix = global_prefix + '/' + module
+    lazy_modules[prefix] = module_registry['/' + module] = LazyModule(module, prefix)
+
+for module in preload:
+    if '/' + module in module_registry:
+        module_registry['/' + module].load()
+
 
 @server.route('/')
 def index():
     return render_template_string('''<!doctype html>
 <html><body><h1>Modules</h1>
 <ul>
-    {% for path, title  in modules %}
-      <li><a href="{{path}}/">{{path}} -  {{title}}</li>
+    {% for path, module in modules %}
+      <li><a href="{{path}}/">{{path}} -  {{module.title}}</a>
+      {% if module.status == 'loaded' %}
+        ({{'%.2f' % module.import_seconds}} s{% if module.rss_delta is not none %}, {{'%.1f' % (module.rss_delta / 2**20)}} MB{% endif %})
+      {% else %}
+        ({{module.status}})
+      {% endif %}
+      </li>
     {% endfor %}
-</ul>    
+</ul>
+<p>Worker {{memory.pid}} memory: {{'%.1f' % (memory.rss_bytes / 2**20) if memory.rss_bytes is not none else '?'}} MB resident
+{% if memory.pss_bytes is defined %}({{'%.1f' % (memory.shared_bytes / 2**20)}} MB shared, {{'%.1f' % (memory.private_bytes / 2**20)}} MB private){% endif %}</p>
+<p>Figure cache: {{stats.treff}} hits, {{stats.bom}} misses, {{stats.oppforinger}} figures ({{stats.bytes}} bytes)</p>
 </body></html>
-''', modules=module_index.items())
+''', modules=lazy_modules.items(), stats=figurbuffer.statistikk(), memory=memory_usage())
+
+
+@server.route('/metrics')
+def metrics():
+    return jsonify({'host_mode': host_mode,
+                    'memory': memory_usage(),
+                    'coalescing': koalesering.statistikk(),
+                    'compression': komprimeringsbuffer.statistikk(),
+                    'serialization': serialisering.statistikk() if serialisering is not None else None,
+                    'modules': {path: module.metrics() for path, module in lazy_modules.items()}})
+
+
+@server.route('/figurbuffer')
+def figurbuffer_statistikk():
+    return jsonify(figurbuffer.statistikk())
+
+
+@server.route('/kalibrering')
+def kalibrering():
+    # lambda_sum and gamma fitted to the GISS temperatures, with the misfit surface.
+    # ?skalering=1 also fits a scale factor per forcing. Imported here so that
+    # startup does not load the model and data.
+    from ebm.kalibrering import kalibrer
+    resultat = dict(kalibrer(skalering=request.args.get('skalering', '').lower() in ('1', 'true')))
+    resultat['flate'] = {navn: verdier.tolist() for navn, verdier in resultat['flate'].items()}
+    return jsonify(resultat)
+
+
+def api(environ, start_response):
+    # Batch model runs as JSON or CSV (POST /api/kjor, see ebm.api). Imported on the
+    # first request, like the dash modules.
+    from ebm.api import app as api_app
+    return api_app(environ, start_response)
+
 
-    
-app = DispatcherMiddleware(server, module_registry)
+if host_mode == "single":
+    # The dash modules are routes on server itself.
+    app = DispatcherMiddleware(server, {'/api': api})
+else:
+    app = DispatcherMiddleware(server, {**module_registry, '/api': api})
 
 if __name__ == '__main__':
-    run_simple('localhost', 8181, app,  use_reloader=True)
+    # threaded, as in Flask's own development server, so requests can be coalesced
+    run_simple('localhost', 8181, app,  use_reloader=True, threaded=True)
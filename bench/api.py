@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler gjennomstrømningen (kjøringer per sekund) for POST /api/kjor (ebm.api) med
+bolker av ulik størrelse, som JSON og CSV, med og uten avrunding. Kjøringene er
+tilfeldige utvalg av historiske pådriv og utviklingsbaner med tilfeldige
+lambda_sum og gamma. Hele svaret leses, så tallene tar med strømmingen.
+
+Først sjekkes det at ustabile eller ufysiske parametre gir 400, og at svarene
+med tilfeldige kjøringer er gyldig JSON (uten NaN og Infinity).
+
+Kjøres fra rotmappen:  python bench/api.py
+"""
+import json
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from ebm.api import app  # noqa: E402
+from ebm.datasett import delt  # noqa: E402
+
+BOLKER = [1, 10, 100, 1000, 5000]
+MINST_KJORINGER = 1000  # hver måling gjentas til minst så mange kjøringer er gjort
+
+
+def kjoringer(antall, rng):
+    historiske = list(delt('historisk').columns[:-1])
+    utviklingsbaner = [kolonne for kolonne in delt('framtid').columns if kolonne.startswith('SSP')]
+    liste = []
+    for _ in range(antall):
+        if rng.random() < 0.5:
+            paadriv = [kolonne for kolonne in historiske if rng.random() < 0.6] or historiske[:1]
+        else:
+            paadriv = str(rng.choice(utviklingsbaner))
+        liste.append({'paadriv': paadriv,
+                      'lambda_sum': float(rng.uniform(-3, -0.5)),
+                      'gamma': float(rng.uniform(-1.5, 0)),
+                      'nullnivaa': [1986, 2005]})
+    return liste
+
+
+USTABILE = [(50, -0.69), (0, -0.69), (-1.3, 0.5), (-20, 0), (-1, -30)]
+
+
+def _ingen_nan(konstant):
+    raise ValueError(f'{konstant} i svaret')
+
+
+def sjekk(klient, rng):
+    for lambda_sum, gamma in USTABILE:
+        svar = klient.post('/kjor', json={'kjoringer': [{'lambda_sum': lambda_sum, 'gamma': gamma}]})
+        assert svar.status_code == 400, (lambda_sum, gamma, svar.status_code)
+    svar = klient.post('/kjor', json={'kjoringer': kjoringer(200, rng)})
+    assert svar.status_code == 200, svar.data
+    json.loads(svar.data, parse_constant=_ingen_nan)
+    print(f'{len(USTABILE)} ustabile parametre gir 400, og svarene er gyldig JSON\n')
+
+
+def main():
+    klient = app.test_client()
+    rng = np.random.default_rng(0)
+    sjekk(klient, rng)
+    print(f'{"kjøringer":>10} {"format":>12} {"kjøringer/s":>12} {"bytes/kjøring":>14}')
+    for antall in BOLKER:
+        innhold = {'kjoringer': kjoringer(antall, rng)}
+        for format_, desimaler in (('json', None), ('json', 4), ('csv', None), ('csv', 4)):
+            innhold.update(format=format_, desimaler=desimaler)
+            gjentak = max(1, MINST_KJORINGER // antall)
+            bytes_ = 0
+            start = time.perf_counter()
+            for _ in range(gjentak):
+                svar = klient.post('/kjor', json=innhold)
+                assert svar.status_code == 200, svar.data
+                bytes_ = len(svar.data)
+            tid = time.perf_counter() - start
+            navn = format_ if desimaler is None else f'{format_} ({desimaler} d.)'
+            print(f'{antall:10d} {navn:>12} {gjentak * antall / tid:12.0f} {bytes_ / antall:14.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Minnebruk for de delte tabellene i ebm.datasett med flere arbeidere, som i en
+WSGI-server med flere prosesser. For 1, 2, 4 og 8 arbeidere startes prosesser
+som hver åpner tabellene og leser alle verdiene, og /proc/<pid>/smaps leses for
+hver av dem:
+
+  privat:  EBM_DATABUFFER='' , hver arbeider har sin egen kopi av tabellene
+  delt:    alle arbeiderne mapper den samme fila, og PSS for fila summert over
+           arbeiderne er én kopi uansett antall
+
+Kjøres fra rotmappen:  python bench/arbeidere.py
+"""
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ARBEIDER = '''
+import sys
+from ebm import datasett
+tabeller = datasett.delte_tabeller()
+for t in tabeller.values():
+    t['verdier'].sum(), t['indeks'].sum()  # leser alle sidene
+print(sum(t['verdier'].nbytes + t['indeks'].nbytes for t in tabeller.values()), flush=True)
+sys.stdin.read()
+'''
+
+
+def smaps(pid):
+    # (PSS for hele prosessen, RSS og PSS for mappingene av den delte fila), i bytes
+    totalt, fil_rss, fil_pss = 0, 0, 0
+    i_fila = False
+    with open(f'/proc/{pid}/smaps') as smaps_:
+        for linje in smaps_:
+            deler = linje.split()
+            if not deler[0].endswith(':'):
+                i_fila = deler[-1].endswith('.bin') and os.path.basename(deler[-1]).startswith('delt-')
+            elif deler[0] == 'Pss:':
+                totalt += int(deler[1]) * 1024
+                if i_fila:
+                    fil_pss += int(deler[1]) * 1024
+            elif deler[0] == 'Rss:' and i_fila:
+                fil_rss += int(deler[1]) * 1024
+    return totalt, fil_rss, fil_pss
+
+
+def mal(antall, buffer):
+    miljo = dict(os.environ, EBM_DATABUFFER=buffer)
+    arbeidere = [subprocess.Popen([sys.executable, '-c', ARBEIDER], cwd=ROT, env=miljo, text=True,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE) for _ in range(antall)]
+    try:
+        tabellbytes = [int(arbeider.stdout.readline()) for arbeider in arbeidere]
+        maalt = [smaps(arbeider.pid) for arbeider in arbeidere]
+    finally:
+        for arbeider in arbeidere:
+            arbeider.communicate('')
+    return tabellbytes[0], [m[0] for m in maalt], [m[1] for m in maalt], [m[2] for m in maalt]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as buffer:
+        mal(1, buffer)  # lager den delte fila
+
+        print(f'{"arbeidere":>9s} {"tabeller privat":>16s} {"tabeller delt (RSS / PSS)":>26s} '
+              f'{"PSS totalt privat":>18s} {"PSS totalt delt":>16s}')
+        for antall in (1, 2, 4, 8):
+            tabellbytes, pss_privat, _, _ = mal(antall, '')
+            _, pss_delt, fil_rss, fil_pss = mal(antall, buffer)
+            print(f'{antall:9d} {antall * tabellbytes / 1024:13.0f} kB '
+                  f'{sum(fil_rss) / 1024:11.0f} kB / {sum(fil_pss) / 1024:6.0f} kB '
+                  f'{sum(pss_privat) / 2**20:15.1f} MB {sum(pss_delt) / 2**20:13.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tid for ebm.ensemble.ensemble_persentiler med MEDLEMMER medlemmer, for én
+utviklingsbane med 551 og 751 år, med og uten nullnivå. Målet er omtrent 100 ms
+for 10 000 medlemmer og 551 år. Til slutt sjekkes det at persentilene er de samme
+som med np.percentile.
+
+Kjøres fra rotmappen:  python bench/ensemble.py
+"""
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from ebm.datasett import delt  # noqa: E402
+from ebm.ensemble import PERSENTILER, _integrer, ensemble_persentiler, trekk_parametre  # noqa: E402
+
+MEDLEMMER = 10000
+GJENTAK = 5
+TILBAKEKOBLINGER = [(-3.22, -3.4, -3.0), (1.77, 1.5, 2.0), (-0.5, -0.8, -0.2)]
+
+
+def main():
+    lambda_sum, gamma = trekk_parametre(MEDLEMMER, TILBAKEKOBLINGER, (-0.69, -0.89, -0.49), seed=0)
+    paadriv = delt('framtid')['SSP2-4.5'].to_numpy()
+    print(f'{"år":>5} {"nullnivå":>10} {"ms":>8}')
+    for aar in (551, 751):
+        for nullnivaa in (None, (236, 256)):
+            tider = []
+            for _ in range(GJENTAK):
+                start = time.perf_counter()
+                ensemble_persentiler(paadriv[:aar], lambda_sum, gamma, nullnivaa=nullnivaa)
+                tider.append(time.perf_counter() - start)
+            print(f'{aar:5d} {str(nullnivaa):>10} {min(tider) * 1e3:8.0f}')
+
+    Ts = np.vstack([blokk for _, blokk in _integrer(paadriv[:551], lambda_sum, gamma, 551, 551)])
+    fasit = np.percentile(Ts, PERSENTILER, axis=1)
+    avvik = np.abs(ensemble_persentiler(paadriv[:551], lambda_sum, gamma) - fasit).max()
+    print(f'\nstørste avvik fra np.percentile: {avvik:.1e}')
+    sys.exit(1 if avvik > 1e-12 else 0)
+
+
+if __name__ == '__main__':
+    main()
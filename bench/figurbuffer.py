@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler svartiden for toboks_framtid.oppdater_figurer gjennom Flask med og uten
+figurbuffer: ny utregning, treff i minnebufferen og treff i SQLite-bufferen når
+figuren er regnet ut av en annen prosess.
+
+Kjøres fra rotmappen:  python bench/figurbuffer.py
+"""
+import multiprocessing
+import os.path
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask  # noqa: E402
+
+from ebm.figurbuffer import Figurbuffer, SqliteFigurbuffer, bufre_callbacks  # noqa: E402
+
+GJENTAK = 50
+
+FORESPORSEL = {
+    'output': '..paadrivsdata.data...temperaturdata.data..',
+    'outputs': [{'id': 'paadrivsdata', 'property': 'data'}, {'id': 'temperaturdata', 'property': 'data'}],
+    'inputs': [{'id': 'my_checklist', 'property': 'value', 'value': ['SSP1-2.6', 'SSP2-4.5', 'SSP5-8.5']},
+               {'id': 'modellvalg', 'property': 'data', 'value': ['hav', 'lambda']}],
+    'changedPropIds': ['my_checklist.value'],
+}
+
+
+def lag_klient(buffer=None):
+    from modules import toboks_framtid
+    server = Flask('toboks_framtid')
+    toboks_framtid.app.init_app(server, url_base_pathname='toboks_framtid/',
+                                requests_pathname_prefix='/toboks_framtid/')
+    if buffer is not None:
+        bufre_callbacks(server, buffer)
+    klient = server.test_client()
+    klient.get('/')
+    return klient
+
+
+def mal(klient, gjentak=GJENTAK):
+    tider = []
+    for _ in range(gjentak):
+        start = time.perf_counter()
+        svar = klient.post('/_dash-update-component', json=FORESPORSEL)
+        tider.append(time.perf_counter() - start)
+        assert svar.status_code == 200
+    return statistics.median(tider) * 1e3
+
+
+def fyll_sqlite(sti):
+    # kjøres i en egen prosess, som en annen arbeider i WSGI-serveren
+    lag_klient(SqliteFigurbuffer(sti)).post('/_dash-update-component', json=FORESPORSEL)
+
+
+def main():
+    print(f'ny utregning:            {mal(lag_klient(), gjentak=10):8.2f} ms')
+
+    minne = Figurbuffer()
+    print(f'treff i minnet:          {mal(lag_klient(minne)):8.2f} ms  {minne.statistikk()}')
+
+    with tempfile.TemporaryDirectory() as mappe:
+        sti = os.path.join(mappe, 'figurbuffer.sqlite')
+        prosess = multiprocessing.get_context('spawn').Process(target=fyll_sqlite, args=(sti,))
+        prosess.start()
+        prosess.join()
+
+        delt = SqliteFigurbuffer(sti)
+        print(f'treff i SQLite (delt):   {mal(lag_klient(delt)):8.2f} ms  {delt.statistikk()}')
+        assert delt.bom == 0, 'figuren fra den andre prosessen ble ikke funnet'
+
+
+if __name__ == '__main__':
+    main()
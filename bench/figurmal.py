@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU-tid per kall for server-callbackene som tegner figurer, med figurene bygget
+med plotly.express for hvert kall (som før) og med ebm.figurer.Figurmal, der bare
+tallene byttes inn i en kopi av en figur som er bygget før.
+
+For plotly.express byttes figurmal i modulen ut med en som alltid kaller lag,
+så callbacken gir Plotly-figuren fra plotly.express og update_*. Tiden er median
+prosessortid av GJENTAK kall, for selve callbacken og med JSON-en Dash lager av
+svaret (Plotlys json-motor, som på serveren). Til slutt sjekkes det at
+begge gir samme JSON.
+
+Kjøres fra rotmappen:  python bench/figurmal.py
+"""
+import json
+import os
+import os.path
+import statistics
+import sys
+import time
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROT)
+os.chdir(ROT)
+
+import plotly.io.json  # noqa: E402
+from dash._callback import to_json  # noqa: E402
+
+from modules import stralingspadriv, toboks_fokus_drivere, toboks_fokus_tilbakekobling, toboks_framtid  # noqa: E402
+
+GJENTAK = 20
+plotly.io.json.config.default_engine = 'json'
+
+PAADRIV = ['drivhusgasser', 'solinnstråling', 'vulkanisme', 'arealbruk', 'aerosoler']
+BANER = toboks_framtid.utviklingsbaner
+PARAMETRE = {'lambda': [-3.22, -0.5, 1.77, 0.35, 0.42], 'gamma': -0.69}
+
+TILFELLER = [
+    ('stralingspadriv update_graph', stralingspadriv, lambda m: m.update_graph(PAADRIV)),
+    ('stralingspadriv update_side_graph', stralingspadriv,
+     lambda m: m.update_side_graph({'points': [{'x': 1990}]}, PAADRIV)),
+    ('stralingspadriv update_total', stralingspadriv, lambda m: m.update_total(PAADRIV)),
+    ('toboks_fokus_drivere update_graph', toboks_fokus_drivere,
+     lambda m: m.update_graph(m.df[PAADRIV], [])),
+    ('toboks_fokus_drivere tegn_temp_graf', toboks_fokus_drivere, lambda m: m.tegn_temp_graf(PAADRIV)),
+    ('toboks_fokus_tilbakekobling tegn_temp_graf', toboks_fokus_tilbakekobling,
+     lambda m: m.tegn_temp_graf(PAADRIV, PARAMETRE, [])),
+    ('toboks_framtid paadrivsdata', toboks_framtid, lambda m: m.paadrivsdata(m.df[BANER])),
+    ('toboks_framtid temperaturdata', toboks_framtid, lambda m: m.temperaturdata(m.df[BANER], ['hav'])),
+    ('toboks_framtid temperaturdata (lambda)', toboks_framtid,
+     lambda m: m.temperaturdata(m.df[BANER], ['hav', 'lambda'])),
+    ('toboks_framtid temperaturdata (ensemble)', toboks_framtid,
+     lambda m: m.temperaturdata(m.df[BANER], ['hav', 'ensemble'])),
+]
+
+
+def plotly_express(nokkel, lag, kurver, layout=None):
+    # som før: hele figuren bygges med plotly.express for hvert kall
+    return lag()
+
+
+def cpu(kall):
+    tider = []
+    for _ in range(GJENTAK):
+        start = time.process_time()
+        svar = kall()
+        tider.append(time.process_time() - start)
+    return svar, statistics.median(tider) * 1e3
+
+
+def mal(modul, kall, figurmal):
+    modul.figurmal = figurmal
+    kall(modul)  # fyller bufrede responser og Figurmal
+    svar, ms = cpu(lambda: kall(modul))
+    _, ms_json = cpu(lambda: to_json(kall(modul)))
+    return to_json(svar), ms, ms_json
+
+
+def main():
+    print(f'{"":44} {"plotly.express":>18} {"Figurmal":>18} {"raskere":>8}')
+    print(f'{"CPU-tid i ms":44} {"":>8} {"+ JSON":>9} {"":>8} {"+ JSON":>9}')
+    summer = [0.0, 0.0, 0.0, 0.0]
+    ulike = []
+    for navn, modul, kall in TILFELLER:
+        figurmal = modul.figurmal
+        px_json, px_ms, px_ms_json = mal(modul, kall, plotly_express)
+        ny_json, ny_ms, ny_ms_json = mal(modul, kall, figurmal)
+        if json.loads(px_json) != json.loads(ny_json):
+            ulike.append(navn)
+        rad = [px_ms, px_ms_json, ny_ms, ny_ms_json]
+        summer = [a + b for a, b in zip(summer, rad)]
+        print(f'{navn:44} ' + ' '.join(f'{verdi:8.2f} ' for verdi in rad) + f'{px_ms_json / ny_ms_json:7.1f}x')
+    print(f'{"sum":44} ' + ' '.join(f'{verdi:8.2f} ' for verdi in summer) + f'{summer[1] / summer[3]:7.1f}x')
+    print('\nSamme JSON som med plotly.express:', 'ja' if not ulike else 'nei, ' + ', '.join(ulike))
+
+
+if __name__ == '__main__':
+    main()
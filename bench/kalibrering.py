@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler tiden for ebm.kalibrering.kalibrer (rutenett og forfining) uten og med
+skalering av hvert pådriv, og sammenligner med å kjøre calculate_temp_anomalies
+én gang per punkt i rutenettet.
+
+Kjøres fra rotmappen:  python bench/kalibrering.py
+"""
+import os.path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from ebm import kalibrering  # noqa: E402
+from ebm.datasett import les  # noqa: E402
+from ebm.toboks import calculate_temp_anomalies  # noqa: E402
+
+GJENTAK = 5
+UTVALG = 200  # punkter i rutenettet som kjøres ett og ett
+
+
+def main():
+    for skalering in (False, True):
+        tider = []
+        for _ in range(GJENTAK):
+            kalibrering._kalibrert.clear()
+            start = time.perf_counter()
+            resultat = kalibrering.kalibrer(skalering)
+            tider.append(time.perf_counter() - start)
+        print(f'skalering={skalering!s:5}  {statistics.median(tider) * 1e3:8.1f} ms  '
+              f'lambda_sum={resultat["lambda_sum"]:.4f} gamma={resultat["gamma"]:.4f} chi2={resultat["chi2"]:.1f}'
+              f'{" (på grensen)" if resultat["paa_grensen"] else ""}')
+        if resultat['skalering']:
+            print('    ' + ', '.join(f'{navn}: {faktor:.3f}' for navn, faktor in resultat['skalering'].items()))
+
+    # én modellkjøring per punkt, for et utvalg av punktene
+    paadriv = les(kalibrering.PAADRIV).loc[kalibrering.FRA_AAR:].sum(axis=1).to_numpy()
+    punkter = len(kalibrering.LAMBDAER) * len(kalibrering.GAMMAER)
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(UTVALG):
+        calculate_temp_anomalies(paadriv, rng.choice(kalibrering.LAMBDAER), rng.choice(kalibrering.GAMMAER))
+    tid = (time.perf_counter() - start) / UTVALG * punkter
+    print(f'én kjøring per punkt: {tid * 1e3:8.1f} ms for de {punkter} punktene i rutenettet (anslått)')
+
+
+if __name__ == '__main__':
+    main()
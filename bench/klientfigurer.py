@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sjekker at figurene som tegnes i nettleseren (modules/assets/klientfigurer.js)
+er de samme som Python-versjonene i energibalanse_uten_atmosfaere, ettlagsmodell,
+ettlagsmodell_likevektstemperatur, planckkurve og toboks_framtid, for et rutenett av verdier på glidebryterne og
+avkrysningene, og at tekstboksene i toboks_fokus_tilbakekobling tolkes likt.
+JavaScript-funksjonene kjøres med node. Den samme sjekken kjøres av
+tests/test_klientfigurer.py.
+
+Kjøres fra rotmappen:  python bench/klientfigurer.py
+"""
+import itertools
+import json
+import math
+import os.path
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from plotly.utils import PlotlyJSONEncoder  # noqa: E402
+
+from ebm.figurer import figur_til_dict, vis_figur  # noqa: E402
+from modules import (energibalanse_uten_atmosfaere, ettlagsmodell, ettlagsmodell_likevektstemperatur,  # noqa: E402
+                     planckkurve, toboks_fokus_tilbakekobling, toboks_framtid)
+
+KLIENTFIGURER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules', 'assets',
+                             'klientfigurer.js')
+TOLERANSE = 1e-12  # relativ, Math.pow og ** kan skille seg i siste siffer
+
+KJOR = '''
+global.window = {dash_clientside: {no_update: 'no_update'}};
+require(process.argv[1]);
+const tilfeller = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const svar = tilfeller.map(t => window.dash_clientside.ebm[t.funksjon](...t.argumenter));
+process.stdout.write(JSON.stringify(svar));
+'''
+
+
+def data(app):
+    # dcc.Store-en med figurmalene i layouten til appen
+    for komponent in app.layout._traverse():
+        if getattr(komponent, 'id', None) in ('figurmaler', 'figurmal'):
+            return komponent.data
+
+
+def tilfeller():
+    # (JavaScript-funksjon, argumenter, funksjon som gir Python-versjonen)
+    temperaturer = [-50, -30, -12.34, 0, 14, 50]
+    albedoer = [0, 0.001, 0.306, 0.5, 0.99, 1]
+    maler = data(energibalanse_uten_atmosfaere.app)
+    for temp, alfa in itertools.product(temperaturer, albedoer):
+        yield 'uten_atmosfaere_piler', (temp, alfa, maler), lambda t=temp, a=alfa: energibalanse_uten_atmosfaere.piler(t, a)
+        yield 'uten_atmosfaere_soyle', (temp, alfa, maler), lambda t=temp, a=alfa: energibalanse_uten_atmosfaere.soyle(t, a)
+
+    maler = data(ettlagsmodell.app)
+    for argumenter in itertools.product(temperaturer, [-100, -50, 10], albedoer, [0, 0.09, 0.77, 1]):
+        yield 'ettlagsmodell_piler', (*argumenter, maler), lambda a=argumenter: ettlagsmodell.piler(*a)
+        yield 'ettlagsmodell_soyle', (*argumenter, maler), lambda a=argumenter: ettlagsmodell.soyle(*a)
+
+    maler = data(ettlagsmodell_likevektstemperatur.app)
+    for argumenter in itertools.product(['1361', '1000', '3000.5'], ['0', '0.05', '0.306', '0.9', '1'],
+                                        ['0', '0.2', '0.77', '1', '1.5']):
+        yield 'likevektstemperatur_piler', (1, *argumenter, maler), \
+            lambda a=argumenter: ettlagsmodell_likevektstemperatur.piler(1, *a)
+
+    mal = data(planckkurve.app)
+    alle_valg = ['lock', 'LGY', 'LGX', 'VIS', 'GRID']
+    for Temp in [0, 14, 500, 5778 - 273, 6000]:
+        for n in range(len(alle_valg) + 1):
+            for valg in itertools.combinations(alle_valg, n):
+                yield 'planckkurve', (Temp, list(valg), mal), lambda t=Temp, v=list(valg): planckkurve.plot(t, v)
+
+    perioder = [[1750, 2300], [1850, 2100], [1990, 2010], [2000, 2000], [2033, 2097]]
+    for paadriv in (['SSP1-2.6'], ['SSP1-2.6', 'SSP2-4.5', 'SSP5-8.5'], ['SSP3-7.0', 'SSP4-6.0']):
+        dff = toboks_framtid.df[paadriv]
+        data_paadriv = json_rundtur(toboks_framtid.paadrivsdata(dff))
+        for periode in perioder:
+            yield 'framtid_paadriv', (data_paadriv, periode), \
+                lambda d=data_paadriv, p=periode: vis_figur(d['figur'], d['x0'], d, p)
+
+        for n in range(4):
+            for check in itertools.combinations(['hav', '1986:2005', 'lambda', 'ensemble'], n):
+                check = list(check)
+                valg = toboks_framtid.modellvalg(check)
+                yield 'framtid_modellvalg', (check, None), lambda v=valg: v
+                data_temp = json_rundtur(toboks_framtid.temperaturdata(dff, valg))
+                nullnivaa = '1986:2005' if '1986:2005' in check else '1750'
+                for periode in perioder:
+                    yield 'framtid_temperatur', (data_temp, periode, check), \
+                        lambda d=data_temp, p=periode, n=nullnivaa: vis_figur(d['figur'], d['x0'], d['nullnivaa'][n], p)
+
+    # halvskrevne og ugyldige tall, som eleven kan ha i en tekstboks
+    tekster = ['-3.22', '-', '', '0.', '.5', '-.', '1e', '1e-3', '+2', ' 0.42 ', '1,5', '1.2.3', 'abc',
+               'inf', 'nan', '1e999', '0x10', '١', None]
+    standard = ['-3.22', '-0.5', '1.77', '0.35', '0.42', '-0.69']
+    for boks, tekst in itertools.product(range(6), tekster):
+        for med in ([True] * 5, [False] * 5, [True, False, True, False, True]):
+            bokser = standard[:boks] + [tekst] + standard[boks + 1:]
+            yield 'tilbakekobling_parametre', (*bokser, *med, None), \
+                lambda b=bokser, m=med: list(tolket(*toboks_fokus_tilbakekobling.tolk_parametre(b, [True] + m)))
+
+
+def tolket(parametre, ugyldig):
+    return ['no_update' if parametre is None else parametre, *ugyldig]
+
+
+def json_rundtur(verdi):
+    # som Dash sender det til nettleseren: numpy-arrays som lister, NaN som null
+    return json.loads(json.dumps(verdi, cls=PlotlyJSONEncoder))
+
+
+def sammenlign(python, js, sti='figur'):
+    if isinstance(python, dict) and isinstance(js, dict):
+        if set(python) != set(js):
+            return [f'{sti}: nøkler {sorted(set(python) ^ set(js))}']
+        return [feil for nokkel in python for feil in sammenlign(python[nokkel], js[nokkel], f'{sti}.{nokkel}')]
+    if isinstance(python, list) and isinstance(js, list):
+        if len(python) != len(js):
+            return [f'{sti}: lengde {len(python)} != {len(js)}']
+        return [feil for i, (p, j) in enumerate(zip(python, js)) for feil in sammenlign(p, j, f'{sti}[{i}]')]
+    if isinstance(python, (int, float)) and isinstance(js, (int, float)) and not isinstance(python, bool):
+        if math.isclose(python, js, rel_tol=TOLERANSE, abs_tol=1e-300):
+            return []
+    elif python == js:
+        return []
+    return [f'{sti}: {python!r} != {js!r}']
+
+
+def avvik():
+    """Antall figurer, og (funksjon, argumenter, feil) for hver figur der JavaScript og Python er ulike."""
+    liste = list(tilfeller())
+    inn = json.dumps([{'funksjon': navn, 'argumenter': argumenter} for navn, argumenter, _ in liste],
+                     cls=PlotlyJSONEncoder)
+    ut = subprocess.run(['node', '-e', KJOR, os.path.abspath(KLIENTFIGURER)], input=inn,
+                        capture_output=True, text=True, check=True).stdout
+
+    ulike = []
+    for (navn, argumenter, python), js in zip(liste, json.loads(ut)):
+        resultat = python()
+        if hasattr(resultat, 'to_plotly_json'):
+            resultat = figur_til_dict(resultat)
+        feil = sammenlign(json_rundtur(resultat), js)
+        if feil:
+            vist = tuple(a for a in argumenter if not isinstance(a, dict))
+            ulike.append((navn, vist, feil))
+    return len(liste), ulike
+
+
+def main():
+    antall, ulike = avvik()
+    for navn, vist, feil in ulike:
+        print(f'{navn}{vist}:', *feil[:5], sep='\n    ')
+    print(f'{antall - len(ulike)} av {antall} figurer er like')
+    sys.exit(1 if ulike else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler hvor lang tid det tar før figuren for den siste av flere raske endringer i
+toboks_fokus_tilbakekobling er tilbake, med og uten ebm.koalesering, når
+nettleseren sender ett kall per endring mens modellen regner.
+
+Serveren kjøres med tråder (som app_wsgi), og hver serie er SERIE kall med nye
+lambda-verdier, sendt med MELLOMROM sekunders mellomrom fra samme økt.
+
+Kjøres fra rotmappen:  python bench/koalesering.py
+"""
+import itertools
+import json
+import logging
+import os.path
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from ebm.koalesering import KAKE, Koalesering, koalesere_callbacks  # noqa: E402
+
+SERIE = 5
+MELLOMROM = 0.01
+GJENTAK = 10
+
+_lambda = itertools.count()
+
+
+def start_server(koalesering=None):
+    from modules import toboks_fokus_tilbakekobling
+    server = Flask('toboks_fokus_tilbakekobling')
+    toboks_fokus_tilbakekobling.app.init_app(server)
+    if koalesering is not None:
+        koalesere_callbacks(server, koalesering)
+    wsgi = make_server('127.0.0.1', 0, server, threaded=True)
+    threading.Thread(target=wsgi.serve_forever, daemon=True).start()
+    return wsgi
+
+
+def foresporsel(port, planck):
+    innhold = {
+        'output': 'my-graph.figure',
+        'outputs': {'id': 'my-graph', 'property': 'figure'},
+        'inputs': [{'id': 'my_checklist', 'property': 'value', 'value': ['drivhusgasser', 'aerosoler']},
+                   {'id': 'parametre', 'property': 'data', 'value': {'lambda': [planck, -0.5, 1.77], 'gamma': -0.69}},
+                   {'id': 'check_Null', 'property': 'value', 'value': False}],
+        'changedPropIds': ['parametre.data'],
+    }
+    return urllib.request.Request(f'http://127.0.0.1:{port}/_dash-update-component',
+                                  data=json.dumps(innhold).encode('utf-8'),
+                                  headers={'Content-Type': 'application/json', 'Cookie': f'{KAKE}=benk'})
+
+
+def serie(port):
+    # Gir (sekunder til det siste kallet er besvart, antall kall som ble regnet ut)
+    svar = [None] * SERIE
+
+    def send(i, planck):
+        with urllib.request.urlopen(foresporsel(port, planck)) as respons:
+            svar[i] = respons.status
+
+    start = time.perf_counter()
+    traader = []
+    for i in range(SERIE):
+        # nye verdier hver gang, så responsene i ebm.respons ikke er bufret fra før
+        traader.append(threading.Thread(target=send, args=(i, -3.0 - 1e-4 * next(_lambda))))
+        traader[-1].start()
+        time.sleep(MELLOMROM)
+    traader[-1].join()
+    tid = time.perf_counter() - start
+    for traad in traader:
+        traad.join()
+    assert svar[-1] == 200
+    return tid, svar.count(200)
+
+
+def mal(koalesering=None):
+    wsgi = start_server(koalesering)
+    try:
+        serie(wsgi.port)  # oppvarming
+        resultater = [serie(wsgi.port) for _ in range(GJENTAK)]
+    finally:
+        wsgi.shutdown()
+    return statistics.median(tid for tid, _ in resultater) * 1e3, statistics.mean(n for _, n in resultater)
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    print(f'{SERIE} endringer med {MELLOMROM * 1e3:.0f} ms mellomrom, median av {GJENTAK} serier')
+    tid, kjort = mal()
+    print(f'uten koalesering:  {tid:8.1f} ms til siste figur, {kjort:.1f} modellkjøringer per serie')
+    koalesering = Koalesering()
+    tid, kjort = mal(koalesering)
+    print(f'med koalesering:   {tid:8.1f} ms til siste figur, {kjort:.1f} modellkjøringer per serie  '
+          f'{koalesering.statistikk()}')
+
+
+if __name__ == '__main__':
+    main()
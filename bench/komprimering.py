@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler bytes og svartid gjennom app_wsgi for alle server-callbackene i modules/
+(med startverdiene fra layouten) og for filene til én side (med plotly.js), uten
+komprimering (Accept-Encoding: identity, som før) og med gzip og Brotli.
+
+Svartiden er tiden i serveren (median av GJENTAK kall, med treff i
+figurbufferen, så det meste er selve overføringen og komprimeringen).
+«Første» er første kall med Brotli, når svaret må komprimeres. Overføringstiden
+er regnet ut for en linje på BANDBREDDE bit/s.
+
+Kjøres fra rotmappen:  python bench/komprimering.py
+"""
+import json
+import os
+import os.path
+import re
+import statistics
+import sys
+import time
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROT)
+os.chdir(ROT)
+
+from werkzeug.test import Client  # noqa: E402
+
+import app_wsgi  # noqa: E402
+
+GJENTAK = 20
+BANDBREDDE = 10e6  # bit/s, for eksempel delt trådløst nett i et klasserom
+SIDE = '/toboks_framtid'  # siden komponentpakkene måles for
+
+
+def callbacker(klient):
+    """(prefiks, output, forespørsel) for hver server-callback, med startverdiene fra layouten."""
+    for prefiks, modul in sorted(app_wsgi.lazy_modules.items()):
+        klient.get(prefiks + '/')
+        if modul.status != 'loaded':
+            continue
+        layout = sys.modules[app_wsgi.module_dir + '.' + modul.module].app.layout
+        verdier = {komponent.id: komponent for komponent in layout._traverse() if getattr(komponent, 'id', None)}
+        for avhengighet in json.loads(klient.get(prefiks + '/_dash-dependencies').get_data()):
+            if avhengighet.get('clientside_function') or any(i['id'] not in verdier for i in avhengighet['inputs']):
+                continue
+            outputs = [{'id': o.split('.')[0], 'property': o.split('.')[1]}
+                       for o in avhengighet['output'].strip('.').split('...')]
+            yield prefiks, avhengighet['output'], {
+                'output': avhengighet['output'],
+                'outputs': outputs[0] if len(outputs) == 1 else outputs,
+                'changedPropIds': [],
+                'inputs': [{'id': i['id'], 'property': i['property'],
+                            'value': getattr(verdier[i['id']], i['property'], None)} for i in avhengighet['inputs']],
+                'state': [{'id': s['id'], 'property': s['property'],
+                           'value': getattr(verdier[s['id']], s['property'], None)} for s in avhengighet['state']]}
+
+
+def mal(kall, koding):
+    """(bytes, median tid i ms) for kall med Accept-Encoding koding."""
+    tider = []
+    for _ in range(GJENTAK):
+        start = time.perf_counter()
+        svar = kall({'Accept-Encoding': koding})
+        tider.append(time.perf_counter() - start)
+        assert svar.status_code == 200, svar.status_code
+    return len(svar.get_data()), statistics.median(tider) * 1e3
+
+
+def overfort(bytes_):
+    return bytes_ * 8 / BANDBREDDE * 1e3
+
+
+def rad(navn, kall):
+    start = time.perf_counter()
+    kall({'Accept-Encoding': 'br'})
+    forste = (time.perf_counter() - start) * 1e3
+    fra, fra_tid = mal(kall, 'identity')
+    gz, _ = mal(kall, 'gzip')
+    br, br_tid = mal(kall, 'br')
+    print(f'{navn[:44]:44} {fra / 1024:8.1f} {gz / 1024:7.1f} {br / 1024:7.1f} '
+          f'{fra_tid:7.2f} {br_tid:7.2f} {forste:7.2f} {fra_tid + overfort(fra):8.1f} {br_tid + overfort(br):8.1f}')
+    return fra, br, fra_tid + overfort(fra), br_tid + overfort(br)
+
+
+def main():
+    klient = Client(app_wsgi.app)
+    hode = (f'{"":44} {"kB":>8} {"gzip":>7} {"br":>7} {"ms":>7} {"br ms":>7} {"første":>7} '
+            f'{"totalt":>8} {"br tot.":>8}')
+
+    print('Callbacker (bytes, tid i serveren, og med overføring ved %.0f Mbit/s):' % (BANDBREDDE / 1e6))
+    print(hode)
+    summer = [0, 0, 0, 0]
+    for prefiks, output, foresporsel in callbacker(klient):
+        klient.post(prefiks + '/_dash-update-component', json=foresporsel)  # fyller figurbufferen
+        resultat = rad(f'{prefiks} {output}', lambda h: klient.post(prefiks + '/_dash-update-component',
+                                                                     json=foresporsel, headers=h))
+        summer = [a + b for a, b in zip(summer, resultat)]
+    print(f'{"sum":44} {summer[0] / 1024:8.1f} {"":7} {summer[1] / 1024:7.1f} {"":31} {summer[2]:8.1f} {summer[3]:8.1f}')
+
+    print(f'\nFiler for {SIDE}/ med tom nettleserbuffer:')
+    print(hode)
+    html = klient.get(SIDE + '/').get_data(as_text=True)
+    urler = [SIDE + '/'] + [url for url in re.findall(r'(?:src|href)="(/[^"]+)"', html)]
+    # og bitene dcc.Graph laster når siden tegnes, fra samme mappe som dcc-skriptet
+    mappe = [url for url in urler if '/dcc/dash_core_components.' in url][0].rsplit('/', 1)[0]
+    urler += [f'{mappe}/async-graph.js', f'{mappe}/async-plotlyjs.js']
+    summer = [0, 0, 0, 0]
+    for url in urler:
+        resultat = rad(url.split('?')[0].rsplit('/', 1)[-1] or url, lambda h: klient.get(url, headers=h))
+        summer = [a + b for a, b in zip(summer, resultat)]
+    print(f'{"sum":44} {summer[0] / 1024:8.1f} {"":7} {summer[1] / 1024:7.1f} {"":31} {summer[2]:8.1f} {summer[3]:8.1f}')
+    print('\nKomprimerte svar i bufferen:', app_wsgi.komprimeringsbuffer.statistikk())
+
+
+if __name__ == '__main__':
+    main()
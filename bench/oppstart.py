@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler importtid og minnebruk (RSS) for hver app i modules/, hver i en ny prosess,
+med og uten den binære databufferen i ebm.datasett:
+
+  csv:     bufferen er slått av (EBM_DATABUFFER=''), CSV-filene tolkes med pandas
+  buffer:  bufferen finnes fra før, tabellene leses med np.load(mmap_mode='r')
+
+Bibliotekene (dash, plotly, pandas) importeres før klokka startes, så tallene er
+det appen selv koster. Siste linje er alle appene importert i én prosess, som
+med PRELOAD_MODULES='*' i app_wsgi.
+
+Kjøres fra rotmappen:  python bench/oppstart.py
+"""
+import json
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MAAL = '''
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+def rss():
+    with open('/proc/self/statm') as statm:
+        import os
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+import numpy, pandas, plotly.express, plotly.graph_objects, dash, dash_bootstrap_components
+import dash_bootstrap_templates
+foer = rss()
+start = time.perf_counter()
+for modul in sys.argv[1:]:
+    __import__('modules.' + modul)
+print(json.dumps({'sekunder': time.perf_counter() - start, 'rss': rss(), 'rss_app': rss() - foer}))
+'''
+
+
+def mal(moduler, buffer):
+    miljo = dict(os.environ, EBM_DATABUFFER=buffer)
+    ut = subprocess.run([sys.executable, '-c', MAAL, *moduler], cwd=ROT, env=miljo,
+                        capture_output=True, text=True, check=True).stdout
+    return json.loads(ut.splitlines()[-1])
+
+
+def main():
+    moduler = sorted(f.stem for f in Path(ROT, 'modules').glob('*.py'))
+    with tempfile.TemporaryDirectory() as buffer:
+        mal(moduler, buffer)  # fyller bufferen
+
+        print(f'{"app":36s} {"csv":>18s} {"buffer":>18s}')
+        for modul in moduler + ['(alle)']:
+            utvalg = moduler if modul == '(alle)' else [modul]
+            kolonner = []
+            for mappe in ('', buffer):
+                resultat = mal(utvalg, mappe)
+                kolonner.append(f'{resultat["sekunder"] * 1e3:7.0f} ms {resultat["rss_app"] / 2**20:5.1f} MB')
+            print(f'{modul:36s} {kolonner[0]:>18s} {kolonner[1]:>18s}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sammenligner rutenettet i ebm.responsnett med den eksakte løseren i ebm.respons
+for tilfeldige (lambda_sum, gamma) og tilfeldige utvalg av pådriv fra
+historical_IPCC6.csv: tid per oppslag, største avvik der rutenettet brukes, og
+hvor ofte det faller tilbake til løseren.
+
+Kjøres fra rotmappen:  python bench/responsnett.py
+"""
+import os.path
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from ebm import respons, responsnett  # noqa: E402
+from ebm.datasett import sti  # noqa: E402
+
+ANTALL = 500
+
+
+def main():
+    historisk = sti('historical_IPCC6.csv')
+    buffer = responsnett.BUFFER
+    with tempfile.TemporaryDirectory() as mappe:
+        responsnett.BUFFER = mappe
+        start = time.perf_counter()
+        nett = responsnett.responsnett(historisk)
+        print(f'rutenett regnet ut:  {(time.perf_counter() - start) * 1e3:8.1f} ms  '
+              f'{nett["Ts"].nbytes + nett["To"].nbytes + nett["feil"].nbytes} bytes')
+        responsnett._nett.clear()
+        start = time.perf_counter()
+        nett = responsnett.responsnett(historisk)
+        print(f'rutenett lest (mmap):{(time.perf_counter() - start) * 1e3:8.1f} ms')
+    responsnett.BUFFER = buffer
+
+    rng = np.random.default_rng(0)
+    kolonner = nett['kolonner'][:-1]
+    # litt utenfor rutenettet i begge retninger, så tilbakefallet også måles
+    tilfeller = [(rng.uniform(-5.5, 0), rng.uniform(-2.2, 0.2),
+                  [kolonne for kolonne in kolonner if rng.random() < 0.6] or kolonner[:1]) for _ in range(ANTALL)]
+
+    tider_nett, tider_eksakt, avvik = [], [], []
+    for lambda_sum, gamma, valgt in tilfeller:
+        start = time.perf_counter()
+        Ts, To = responsnett.sum_respons(historisk, valgt, lambda_sum, gamma)
+        tid = time.perf_counter() - start
+        brukte_nett = not respons.er_bufret(historisk, lambda_sum, gamma)
+
+        start = time.perf_counter()
+        eksakt_Ts, eksakt_To = respons.sum_respons(historisk, valgt, lambda_sum, gamma)
+        if brukte_nett:
+            tider_nett.append(tid)
+            tider_eksakt.append(time.perf_counter() - start)
+            avvik.append(max(np.nanmax(np.abs(Ts - eksakt_Ts)), np.nanmax(np.abs(To - eksakt_To))))
+
+    print(f'oppslag i rutenettet:{statistics.median(tider_nett) * 1e6:8.1f} µs (median)')
+    print(f'eksakt løser:        {statistics.median(tider_eksakt) * 1e6:8.1f} µs (median)')
+    print(f'rutenettet brukt i {len(avvik)} av {ANTALL} tilfeller, største avvik {max(avvik):.4f} K '
+          f'(toleranse {responsnett.TOLERANSE} K)')
+    sys.exit(1 if max(avvik) > responsnett.TOLERANSE else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sammenligner de deriverte fra calculate_temp_anomalies(..., sensitiviteter=True)
+med sentrale differenser (to ekstra kjøringer per parameter), for pådrivene i
+historical_IPCC6.csv: største relative avvik og tid.
+
+Kjøres fra rotmappen:  python bench/sensitiviteter.py
+"""
+import os.path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+
+from ebm.datasett import les  # noqa: E402
+from ebm.toboks import calculate_temp_anomalies  # noqa: E402
+
+LAMBDA_SUM = -1.3
+GAMMA = -0.69
+STEG = 1e-6
+GJENTAK = 20
+
+
+def differenser(F):
+    # d/d lambda_sum, d/d gamma og d/d skalering av hver kolonne med sentrale differenser
+    def kjor(lambda_sum, gamma, skalering):
+        return np.array(calculate_temp_anomalies(F @ skalering, lambda_sum, gamma))
+
+    en = np.ones(F.shape[1])
+    deriverte = {'lambda_sum': (kjor(LAMBDA_SUM + STEG, GAMMA, en) - kjor(LAMBDA_SUM - STEG, GAMMA, en)) / (2 * STEG),
+                 'gamma': (kjor(LAMBDA_SUM, GAMMA + STEG, en) - kjor(LAMBDA_SUM, GAMMA - STEG, en)) / (2 * STEG)}
+    paadriv = []
+    for k in range(F.shape[1]):
+        opp, ned = en.copy(), en.copy()
+        opp[k] += STEG
+        ned[k] -= STEG
+        paadriv.append((kjor(LAMBDA_SUM, GAMMA, opp) - kjor(LAMBDA_SUM, GAMMA, ned)) / (2 * STEG))
+    deriverte['paadriv'] = np.stack(paadriv, axis=1)  # (2, kolonner, år)
+    return deriverte
+
+
+def median_tid(funksjon):
+    tider = []
+    for _ in range(GJENTAK):
+        start = time.perf_counter()
+        funksjon()
+        tider.append(time.perf_counter() - start)
+    return statistics.median(tider) * 1e3
+
+
+def main():
+    df = les('historical_IPCC6.csv')
+    F = df.to_numpy()
+
+    _, _, sensitiviteter = calculate_temp_anomalies(F, LAMBDA_SUM, GAMMA, sensitiviteter=True)
+    fasit = differenser(F)
+    for navn in ('lambda_sum', 'gamma', 'paadriv'):
+        analytisk = np.array(sensitiviteter[navn])
+        avvik = np.abs(analytisk - fasit[navn]).max() / np.abs(fasit[navn]).max()
+        print(f'{navn:12} største relative avvik fra differensene: {avvik:.2e}')
+
+    en_kjoring = median_tid(lambda: calculate_temp_anomalies(F.sum(axis=1), LAMBDA_SUM, GAMMA))
+    print(f'én kjøring:                     {en_kjoring:8.2f} ms')
+    print(f'med sensitiviteter:             {median_tid(lambda: calculate_temp_anomalies(F, LAMBDA_SUM, GAMMA, sensitiviteter=True)):8.2f} ms')
+    print(f'sentrale differenser ({2 * (2 + F.shape[1])} kjøringer): {median_tid(lambda: differenser(F)):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
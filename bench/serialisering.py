@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sammenligner Plotlys JSON (to_json i dash, det Dash 2.5.1 bruker) med
+ebm.figurer.til_json, uten avrunding og med SIFFER gjeldende siffer, for
+layouten og alle server-callbackene i modules/ (med startverdiene fra layouten).
+
+For hver variant vises bytes, bytes med Brotli og tiden det tar å lage JSON-en
+(median av GJENTAK). Største relative avvik er for tallene i kurvene, regnet mot
+det største tallet i samme array, siden det er det som synes i figuren.
+
+Plotly bruker orjson hvis det er installert. Det er ikke med i requirements.txt,
+så her brukes Plotlys json-motor, som på serveren.
+
+Kjøres fra rotmappen:  python bench/serialisering.py
+"""
+import json
+import os
+import os.path
+import statistics
+import sys
+import time
+
+import brotli
+import numpy as np
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROT)
+os.chdir(ROT)
+
+import dash._callback  # noqa: E402
+import plotly.io.json  # noqa: E402
+from werkzeug.test import Client  # noqa: E402
+
+import app_wsgi  # noqa: E402
+from ebm.figurer import KURVEDATA, til_json  # noqa: E402
+from komprimering import callbacker  # noqa: E402
+
+GJENTAK = 20
+SIFFER = (6, 4, 3)
+plotly_json = dash._callback.to_json
+plotly.io.json.config.default_engine = 'json'
+
+
+def svarverdier(klient):
+    """(navn, verdi) for layouten til hver modul og svaret fra hver server-callback, før JSON."""
+    verdier = []
+
+    def husk(verdi):
+        verdier.append(verdi)
+        return plotly_json(verdi)
+
+    dash._callback.to_json = husk
+    try:
+        for prefiks, output, foresporsel in callbacker(klient):
+            del verdier[:]
+            klient.post(prefiks + '/_dash-update-component', json=foresporsel)
+            if verdier:
+                yield f'{prefiks} {output}', verdier[-1]
+    finally:
+        dash._callback.to_json = plotly_json
+    for prefiks, modul in sorted(app_wsgi.lazy_modules.items()):
+        if modul.status == 'loaded':
+            yield f'{prefiks} layout', sys.modules[app_wsgi.module_dir + '.' + modul.module].app.layout
+
+
+def tid(funksjon, verdi):
+    tider = []
+    for _ in range(GJENTAK):
+        start = time.perf_counter()
+        tekst = funksjon(verdi)
+        tider.append(time.perf_counter() - start)
+    return tekst, statistics.median(tider) * 1e3
+
+
+def kurver(verdi):
+    # tallarrayene under KURVEDATA-nøkler, i rekkefølge
+    if isinstance(verdi, dict):
+        for nokkel, under in verdi.items():
+            if nokkel in KURVEDATA and isinstance(under, list) and under and all(
+                    isinstance(tall, (int, float)) or tall is None for tall in under):
+                yield np.array([np.nan if tall is None else tall for tall in under], dtype=float)
+            else:
+                yield from kurver(under)
+    elif isinstance(verdi, list):
+        for under in verdi:
+            yield from kurver(under)
+
+
+def avvik(fasit, tekst):
+    storst = 0.0
+    for a, b in zip(kurver(json.loads(fasit)), kurver(json.loads(tekst))):
+        skala = np.nanmax(np.abs(a)) if np.isfinite(a).any() else 0.0
+        if skala > 0 and len(a) == len(b):
+            storst = max(storst, np.nanmax(np.abs(a - b)) / skala)
+    return storst
+
+
+def main():
+    klient = Client(app_wsgi.app)
+    varianter = [('plotly', plotly_json), ('til_json', til_json)]
+    varianter += [(f'{siffer} siffer', lambda verdi, siffer=siffer: til_json(verdi, siffer)) for siffer in SIFFER]
+    print(f'{"":46} ' + ' '.join(f'{navn:>22}' for navn, _ in varianter))
+    print(f'{"":46} ' + ' '.join(f'{"kB":>6} {"br":>6} {"ms":>8}' for _ in varianter))
+    summer = [[0, 0, 0.0] for _ in varianter]
+    storst = [0.0 for _ in varianter]
+    for navn, verdi in svarverdier(klient):
+        fasit = None
+        rad = []
+        for i, (_, funksjon) in enumerate(varianter):
+            tekst, ms = tid(funksjon, verdi)
+            fasit = fasit or tekst
+            storst[i] = max(storst[i], avvik(fasit, tekst))
+            data = tekst.encode()
+            resultat = [len(data), len(brotli.compress(data)), ms]
+            summer[i] = [a + b for a, b in zip(summer[i], resultat)]
+            rad.append(f'{resultat[0] / 1024:6.1f} {resultat[1] / 1024:6.1f} {resultat[2]:8.2f}')
+        print(f'{navn[:46]:46} ' + ' '.join(rad))
+    print(f'{"sum":46} ' + ' '.join(f'{b / 1024:6.1f} {br / 1024:6.1f} {ms:8.2f}' for b, br, ms in summer))
+    print(f'{"største relative avvik i kurvene":46} ' + ' '.join(f'{verdi:22.1e}' for verdi in storst))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Måler python -m ebm.sveip for sveip av økende størrelse (historiske pådriv,
+lambda_sum x gamma), som .npy-bolker og som CSV: medlemmer per sekund og største
+minnebruk (RSS) blant prosessene. Minnet skal holde seg omtrent likt når sveipet
+vokser, siden bare noen få bolker er underveis om gangen.
+
+Kjøres fra rotmappen:  python bench/sveip.py
+"""
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SVEIP = [(100, 100), (300, 100), (1000, 100)]  # (lambdaer, gammaer)
+
+
+def kjor(argumenter, ut):
+    start = time.perf_counter()
+    prosess = subprocess.Popen([sys.executable, '-m', 'ebm.sveip', *argumenter, '--ut', ut],
+                               cwd=ROT, stderr=subprocess.DEVNULL)
+    # wait4 gir ressursbruken for denne kjøringen alene (med arbeidsprosessene); ru_maxrss er i kB
+    _, status, bruk = os.wait4(prosess.pid, 0)
+    prosess.returncode = os.waitstatus_to_exitcode(status)
+    assert prosess.returncode == 0, prosess.returncode
+    return time.perf_counter() - start, bruk.ru_maxrss / 1024
+
+
+def main():
+    print(f'{"medlemmer":>10} {"format":>6} {"medlemmer/s":>12} {"maks RSS (MB)":>14} {"MB ut":>8}')
+    with tempfile.TemporaryDirectory() as mappe:
+        for lambdaer, gammaer in SVEIP:
+            antall = lambdaer * gammaer
+            sveip = [f'--lambda=-3:-0.5:{lambdaer}', f'--gamma=-1.5:0:{gammaer}', '--nullnivaa', '1986:2005']
+            for format_ in ('npy', 'csv'):
+                ut = os.path.join(mappe, f'{antall}-{format_}')
+                tid, rss = kjor(sveip + ['--format', format_] + (['--float32'] if format_ == 'npy' else []), ut)
+                if os.path.isdir(ut):
+                    storrelse = sum(os.path.getsize(os.path.join(ut, navn)) for navn in os.listdir(ut))
+                    shutil.rmtree(ut)
+                else:
+                    storrelse = os.path.getsize(ut)
+                    os.remove(ut)
+                print(f'{antall:10d} {format_:>6} {antall / tid:12.0f} {rss:14.0f} {storrelse / 1e6:8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sammenligner løserne i ebm/toboks.py mot løkkeversjonen og måler kjøretid.
+
+Kjøres fra rotmappen:  python bench/toboks_losere.py
+"""
+import os.path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.toboks import (calculate_temp_anomalies, calculate_temp_anomalies_batch,  # noqa: E402
+                        calculate_temp_anomalies_filter)
+
+TOLERANSE = 1e-9  # relativt til største temperatur i hver serie (minst 1 K)
+
+df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data', 'futureForcing_IPCC6.csv'),
+                 index_col=0, sep=',', encoding="utf-8")
+
+
+def tid(funksjon, *args, gjentak=3):
+    beste = np.inf
+    for _ in range(gjentak):
+        start = time.perf_counter()
+        resultat = funksjon(*args)
+        beste = min(beste, time.perf_counter() - start)
+    return beste, resultat
+
+
+def avvik(a, b):
+    # Med positiv tilbakekobling vokser løsningen eksponentielt, så avviket måles
+    # relativt til størrelsen på hver serie.
+    skala = np.maximum(1, np.max(np.abs(b[0]), axis=1, keepdims=True))
+    return max(np.max(np.abs(a[0] - b[0]) / skala), np.max(np.abs(a[1] - b[1]) / skala))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    pådriv = df['SSP5-8.5'].to_numpy()
+
+    # Samme svar som løkken for et rutenett av parametre, med og uten dyphav
+    lambdaer = np.repeat(np.linspace(-3, 0.5, 15), 6)
+    gammaer = np.tile(np.linspace(-1.5, 0, 6), 15)
+    fasit = np.array([calculate_temp_anomalies(pådriv, l, g) for l, g in zip(lambdaer, gammaer)])
+    fasit = fasit[:, 0], fasit[:, 1]
+    for navn, losar in [('batch', calculate_temp_anomalies_batch), ('filter', calculate_temp_anomalies_filter)]:
+        feil = avvik(losar(pådriv, lambdaer, gammaer), fasit)
+        print(f'{navn:>7}: største relative avvik fra løkken {feil:.2e}')
+        assert feil < TOLERANSE, navn
+
+    print()
+    print(f'{"medlemmer":>10} {"år":>7} {"løkke":>10} {"batch":>10} {"filter":>10}')
+    for n_medlem, n_gjentak in [(1, 1), (1, 20), (100, 1), (10000, 1)]:
+        F = np.tile(pådriv, n_gjentak)
+        lam = rng.normal(-1.18, 0.4, n_medlem)
+        gam = rng.normal(-0.69, 0.1, n_medlem)
+        if n_medlem <= 100:
+            t_lokke, _ = tid(lambda: [calculate_temp_anomalies(F, l, g) for l, g in zip(lam, gam)])
+            t_lokke = f'{t_lokke * 1e3:8.1f}ms'
+        else:
+            t_lokke = '-'
+        t_batch, _ = tid(calculate_temp_anomalies_batch, F, lam, gam)
+        t_filter, _ = tid(calculate_temp_anomalies_filter, F, lam, gam)
+        print(f'{n_medlem:>10} {len(F):>7} {t_lokke:>10} {t_batch * 1e3:8.1f}ms {t_filter * 1e3:8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sammenligner de to måtene app_wsgi kan sette opp Dash-appene på:
+HOST_MODE=dispatcher (én Flask-server per modul bak DispatcherMiddleware) og
+HOST_MODE=single (alle modulene på én Flask-server med felles rute for
+komponentpakkene og modules/assets).
+
+For hver modus startes en ny Python-prosess som laster alle modulene og måler
+minnet (RSS og PSS), antall Flask-servere og URL-regler. Deretter besøker en
+tenkt nettleser modulene etter tur og teller bytes som overføres før første
+tegning: HTML-siden, skriptene og stilarkene den lenker til, _dash-layout,
+_dash-dependencies og de asynkrone dcc-bitene komponentene i layouten laster
+(for eksempel plotly.js for dcc.Graph). «Tom buffer» er første besøk med tom
+nettleserbuffer, «etter forrige» er med det nettleseren har bufret fra
+modulene før i lista. Eksterne stilark (Bootstrap-temaet fra CDN) er ikke med.
+
+Kjøres fra rotmappen:  python bench/vertsmodus.py
+"""
+import json
+import os
+import os.path
+import re
+import subprocess
+import sys
+
+ROT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# asynkrone bitene (dcc/async-<navn>.js) som hver komponenttype laster
+ASYNKRONE = {'Graph': ['graph', 'plotlyjs'], 'Slider': ['slider'], 'RangeSlider': ['slider'],
+             'Dropdown': ['dropdown'], 'Markdown': ['markdown', 'highlight'], 'Upload': ['upload'],
+             'DatePickerSingle': ['datepicker'], 'DatePickerRange': ['datepicker']}
+
+
+def ressurser(html):
+    """Lokale skript og stilark som HTML-siden lenker til."""
+    return [url for url in re.findall(r'<(?:script|link)[^>]*?(?:src|href)="([^"]+)"', html) if url.startswith('/')]
+
+
+def asynkrone(dash_app, html):
+    # URL-ene til de asynkrone bitene ligger ved siden av dash_core_components-skriptet
+    dcc = [url for url in ressurser(html) if '/dcc/dash_core_components.' in url]
+    if not dcc:
+        return []
+    mappe = dcc[0].rsplit('/', 1)[0]
+    typer = {type(komponent).__name__ for komponent in dash_app.layout._traverse()}
+    navn = sorted({bit for typ in typer for bit in ASYNKRONE.get(typ, [])})
+    return [f'{mappe}/async-{bit}.js' for bit in navn]
+
+
+def mal():
+    # kjøres i en egen prosess, med HOST_MODE satt
+    os.environ['PRELOAD_MODULES'] = '*'
+    sys.path.insert(0, ROT)
+    os.chdir(ROT)
+    from werkzeug.test import Client
+
+    import app_wsgi
+
+    lastet = app_wsgi.memory_usage()
+    if app_wsgi.host_mode == 'single':
+        servere = [app_wsgi.server]
+    else:
+        servere = [app_wsgi.server] + [modul.local_server for modul in app_wsgi.lazy_modules.values()
+                                       if modul.local_server is not None]
+    klient = Client(app_wsgi.app)
+    bufret = set()
+    moduler = {}
+    for prefiks, modul in sorted(app_wsgi.lazy_modules.items()):
+        if modul.status != 'loaded':
+            continue
+        svar = klient.get(prefiks + '/')
+        html = svar.get_data(as_text=True)
+        dash_app = sys.modules[app_wsgi.module_dir + '.' + modul.module].app
+        urler = ressurser(html) + [prefiks + '/_dash-layout', prefiks + '/_dash-dependencies'] + asynkrone(dash_app, html)
+        kald = varm = len(svar.get_data())
+        for url in urler:
+            svar = klient.get(url)
+            assert svar.status_code == 200, (url, svar.status_code)
+            bytes_ = len(svar.get_data())
+            kald += bytes_
+            # bare det som er bufret fra før: lag og avhengigheter endres ikke mellom moduler
+            if url not in bufret:
+                varm += bytes_
+                if '_dash-layout' not in url and '_dash-dependencies' not in url:
+                    bufret.add(url)
+        moduler[prefiks] = {'kald': kald, 'varm': varm, 'filer': len(urler) + 1}
+    print(json.dumps({'lastet': lastet, 'besokt': app_wsgi.memory_usage(),
+                      'servere': len(servere), 'regler': sum(len(list(s.url_map.iter_rules())) for s in servere),
+                      'moduler': moduler}))
+
+
+def main():
+    resultater = {}
+    for modus in ('dispatcher', 'single'):
+        utskrift = subprocess.run([sys.executable, os.path.abspath(__file__), '--mal'], cwd=ROT, check=True,
+                                  env={**os.environ, 'HOST_MODE': modus}, capture_output=True, text=True).stdout
+        resultater[modus] = json.loads(utskrift.strip().splitlines()[-1])
+
+    mb = 2 ** 20
+    print(f'{"":28} {"dispatcher":>12} {"single":>12}')
+    for navn, nokkel in (('RSS lastet (MB)', ('lastet', 'rss_bytes')), ('PSS lastet (MB)', ('lastet', 'pss_bytes')),
+                         ('RSS etter besøk (MB)', ('besokt', 'rss_bytes')), ('PSS etter besøk (MB)', ('besokt', 'pss_bytes'))):
+        verdier = [resultater[modus][nokkel[0]].get(nokkel[1]) for modus in ('dispatcher', 'single')]
+        print(f'{navn:28} ' + ' '.join(f'{v / mb:12.1f}' if v is not None else f'{"?":>12}' for v in verdier))
+    print(f'{"Flask-servere":28} {resultater["dispatcher"]["servere"]:12d} {resultater["single"]["servere"]:12d}')
+    print(f'{"URL-regler":28} {resultater["dispatcher"]["regler"]:12d} {resultater["single"]["regler"]:12d}')
+
+    print(f'\nkB før første tegning   {"tom buffer":>22} {"etter forrige":>22}')
+    print(f'{"":36} {"dispatcher":>10} {"single":>10} {"dispatcher":>10} {"single":>10}')
+    summer = [0, 0, 0, 0]
+    for prefiks in resultater['dispatcher']['moduler']:
+        d, s = resultater['dispatcher']['moduler'][prefiks], resultater['single']['moduler'][prefiks]
+        rad = [d['kald'], s['kald'], d['varm'], s['varm']]
+        summer = [a + b for a, b in zip(summer, rad)]
+        print(f'{prefiks:36} ' + ' '.join(f'{verdi / 1024:10.0f}' for verdi in rad))
+    print(f'{"sum":36} ' + ' '.join(f'{verdi / 1024:10.0f}' for verdi in summer))
+
+
+if __name__ == '__main__':
+    if '--mal' in sys.argv:
+        mal()
+    else:
+        main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parametersveip med toboksmodellen fra kommandolinjen, for eksempel
+
+    python code/sveip.py --lambda=-3:-0.5:50 --gamma=-1.5:0:20 > sveip.csv
+
+Se ebm/sveip.py for alle valgene.
+"""
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.sveip import main  # noqa: E402
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+"""
+Felles beregningskode for Dash-appene i modules/ og skriptene i code/.
+"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP-grensesnitt for å kjøre toboksmodellen i bolker, uten Plotly-figurer.
+
+POST /kjor med en JSON-kropp som
+
+    {"kjoringer": [{"paadriv": ["drivhusgasser", "aerosoler"], "lambda_sum": -1.3, "gamma": -0.69},
+                   {"paadriv": "SSP2-4.5", "lambda_sum": -1.3, "gamma": -0.69, "nullnivaa": [1986, 2005]}],
+     "format": "json"}
+
+paadriv er en liste med kolonner fra historical_IPCC6.csv (også 'total'), eller
+navnet på en utviklingsbane (SSP) fra futureForcing_IPCC6.csv. Uten paadriv
+brukes alle de historiske pådrivene. nullnivaa er et valgfritt par årstall
+(begge med) som temperaturene måles relativt til. Med "desimaler" rundes
+temperaturene av.
+
+Svaret strømmes i bolker på BOLK kjøringer, og hver bolk kjøres med ett kall til
+calculate_temp_anomalies_batch:
+
+  json: {"kjoringer": [{"fra_aar": 1750, "Ts": [...], "To": [...]}, ...]}
+  csv:  kjoring,aar,Ts,To med én linje per kjøring og år
+
+Feil i forespørselen gir 400 med {"feil": "..."} før noe regnes ut. Det gjelder
+også lambda_sum og gamma som gir en ustabil modell (ebm.toboks.stabil), der
+temperaturene ville blitt uendelige eller NaN, som ikke kan skrives i JSON.
+"""
+import json
+import math
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+from ebm.datasett import delt
+from ebm.toboks import calculate_temp_anomalies_batch, stabil
+
+MAKS_KJORINGER = 10000  # per forespørsel
+BOLK = 500  # kjøringer per kall til modellen
+
+app = Flask('ebm.api')
+
+
+class Foresporselsfeil(ValueError):
+    pass
+
+
+def _tall(spesifikasjon, navn):
+    verdi = spesifikasjon.get(navn)
+    if isinstance(verdi, bool) or not isinstance(verdi, (int, float)) or not math.isfinite(verdi):
+        raise Foresporselsfeil(f'{navn} må være et endelig tall')
+    return float(verdi)
+
+
+def _paadriv(spesifikasjon, paadrivsserier):
+    # Pådrivet (år,) for en kjøring, uten manglende år til slutt. Seriene huskes i
+    # paadrivsserier, siden mange kjøringer i en bolk ofte bruker samme pådriv.
+    valg = spesifikasjon.get('paadriv')
+    if valg is None:
+        valg = ['total']
+    if isinstance(valg, str) and valg.startswith('SSP'):
+        tabell, kolonner = 'framtid', (valg,)
+    elif isinstance(valg, str):
+        tabell, kolonner = 'historisk', (valg,)
+    elif isinstance(valg, list) and valg and all(isinstance(kolonne, str) for kolonne in valg):
+        tabell, kolonner = 'historisk', tuple(valg)
+    else:
+        raise Foresporselsfeil('paadriv må være en liste med pådriv eller navnet på en utviklingsbane')
+
+    nokkel = (tabell, kolonner)
+    if nokkel not in paadrivsserier:
+        df = delt(tabell)
+        ukjente = [kolonne for kolonne in kolonner if kolonne not in df.columns]
+        if ukjente:
+            raise Foresporselsfeil(f'ukjent pådriv: {", ".join(ukjente)}')
+        serie = df[list(kolonner)].sum(axis=1, min_count=len(kolonner))
+        serie = serie.loc[:serie.last_valid_index()]
+        paadrivsserier[nokkel] = (int(serie.index[0]), serie.to_numpy())
+    return paadrivsserier[nokkel]
+
+
+def tolk(innhold):
+    """
+    Kjøringene i forespørselen som en liste med (fra_aar, pådriv, lambda_sum, gamma,
+    nullnivaa), der nullnivaa er et par indekser (til er ikke med) eller None.
+    """
+    if not isinstance(innhold, dict) or not isinstance(innhold.get('kjoringer'), list):
+        raise Foresporselsfeil('forventet {"kjoringer": [...]}')
+    if len(innhold['kjoringer']) > MAKS_KJORINGER:
+        raise Foresporselsfeil(f'høyst {MAKS_KJORINGER} kjøringer per forespørsel')
+
+    paadrivsserier = {}
+    kjoringer = []
+    for nummer, spesifikasjon in enumerate(innhold['kjoringer']):
+        try:
+            if not isinstance(spesifikasjon, dict):
+                raise Foresporselsfeil('hver kjøring må være et objekt')
+            fra_aar, paadriv = _paadriv(spesifikasjon, paadrivsserier)
+            nullnivaa = spesifikasjon.get('nullnivaa')
+            if nullnivaa is not None:
+                if (not isinstance(nullnivaa, list) or len(nullnivaa) != 2
+                        or not all(isinstance(aar, int) and not isinstance(aar, bool) for aar in nullnivaa)
+                        or not fra_aar <= nullnivaa[0] <= nullnivaa[1] < fra_aar + len(paadriv)):
+                    raise Foresporselsfeil(f'nullnivaa må være [fra, til] mellom {fra_aar} og '
+                                           f'{fra_aar + len(paadriv) - 1}')
+                nullnivaa = (nullnivaa[0] - fra_aar, nullnivaa[1] - fra_aar + 1)
+            lambda_sum, gamma = _tall(spesifikasjon, 'lambda_sum'), _tall(spesifikasjon, 'gamma')
+            if not stabil(lambda_sum, gamma):
+                raise Foresporselsfeil('lambda_sum og gamma gir en ustabil modell (krever lambda_sum < 0, '
+                                       'gamma <= 0 og at modellen er stabil med ett års steg)')
+            kjoringer.append((fra_aar, paadriv, lambda_sum, gamma, nullnivaa))
+        except Foresporselsfeil as feil:
+            raise Foresporselsfeil(f'kjøring {nummer}: {feil}') from None
+    return kjoringer
+
+
+def kjor(kjoringer):
+    """
+    Kjører modellen for kjøringene fra tolk, BOLK om gangen, og gir (fra_aar, Ts, To)
+    for hver kjøring i samme rekkefølge. Kjøringer med like lange pådriv kjøres sammen.
+    """
+    for start in range(0, len(kjoringer), BOLK):
+        bolk = kjoringer[start:start + BOLK]
+        resultater = [None] * len(bolk)
+        lengder = {}
+        for i, kjoring in enumerate(bolk):
+            lengder.setdefault(len(kjoring[1]), []).append(i)
+        for indekser in lengder.values():
+            Ts, To = calculate_temp_anomalies_batch(np.stack([bolk[i][1] for i in indekser]),
+                                                    [bolk[i][2] for i in indekser],
+                                                    [bolk[i][3] for i in indekser])
+            for rad, i in enumerate(indekser):
+                ts, to = Ts[rad], To[rad]
+                nullnivaa = bolk[i][4]
+                if nullnivaa is not None:
+                    ts = ts - ts[nullnivaa[0]:nullnivaa[1]].mean()
+                    to = to - to[nullnivaa[0]:nullnivaa[1]].mean()
+                resultater[i] = (bolk[i][0], ts, to)
+        yield from resultater
+
+
+def _json(kjoringer, desimaler):
+    yield '{"kjoringer":['
+    for nummer, (fra_aar, Ts, To) in enumerate(kjor(kjoringer)):
+        if desimaler is not None:
+            Ts, To = np.round(Ts, desimaler), np.round(To, desimaler)
+        yield (',' if nummer else '') + json.dumps({'fra_aar': fra_aar, 'Ts': Ts.tolist(), 'To': To.tolist()},
+                                                   separators=(',', ':'))
+    yield ']}'
+
+
+def _csv(kjoringer, desimaler):
+    tall = '{:.%df}' % desimaler if desimaler is not None else '{!r}'
+    yield 'kjoring,aar,Ts,To\n'
+    for nummer, (fra_aar, Ts, To) in enumerate(kjor(kjoringer)):
+        yield ''.join(f'{nummer},{fra_aar + i},{tall.format(ts)},{tall.format(to)}\n'
+                      for i, (ts, to) in enumerate(zip(Ts.tolist(), To.tolist())))
+
+
+@app.errorhandler(Foresporselsfeil)
+def _foresporselsfeil(feil):
+    return jsonify({'feil': str(feil)}), 400
+
+
+@app.route('/kjor', methods=['POST'])
+def kjor_bolk():
+    innhold = request.get_json(silent=True)
+    kjoringer = tolk(innhold)
+    format_ = innhold.get('format', 'json')
+    desimaler = innhold.get('desimaler')
+    if desimaler is not None and (isinstance(desimaler, bool) or not isinstance(desimaler, int)
+                                  or not 0 <= desimaler <= 17):
+        raise Foresporselsfeil('desimaler må være et heltall fra 0 til 17')
+    if format_ == 'json':
+        return Response(_json(kjoringer, desimaler), mimetype='application/json')
+    if format_ == 'csv':
+        return Response(_csv(kjoringer, desimaler), mimetype='text/csv')
+    raise Foresporselsfeil('format må være "json" eller "csv"')
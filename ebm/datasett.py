@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Felles tilgang til tabellene i data/.
+
+Hver CSV-fil leses bare én gang per prosess, uansett hvor mange apper som bruker
+den. Etter første lesing lagres verdiene, indeksen og kolonnenavnene i en binær
+buffer (.npy og .json) i BUFFER (som standard under ~/.cache/ebm), nøklet på SHA-256 av innholdet i CSV-fila.
+Senere prosesser (nye arbeidere i WSGI-serveren, omstart) leser bufferen med
+np.load(mmap_mode='r') i stedet for å tolke CSV-fila på nytt.
+
+les gir en ny DataFrame for hvert kall, men alle deler de samme skrivebeskyttede
+arrayene. Apper kan legge til kolonner (df['total'] = ...) uten at det påvirker
+andre apper, mens forsøk på å endre de innleste verdiene gir ValueError.
+
+De avledede tabellene appene faktisk bruker (pådriv med totalsum, GISS-anomalien
+med Max/Min) lages én gang og lagres samlet i én fil i BUFFER, som alle
+prosessene på maskinen åpner med np.memmap. Med en WSGI-server med flere
+arbeidere ligger tabellene da bare én gang i minnet (i sidebufferen til
+operativsystemet), i stedet for én privat pandas-kopi per arbeider. Hver kolonne
+ligger sammenhengende i fila.
+"""
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def _buffermappe():
+    # $XDG_CACHE_HOME/ebm (eller ~/.cache/ebm, og temp-mappa uten hjemmemappe), ikke i
+    # kildetreet, som kan være skrivebeskyttet. Én undermappe per data/-mappe, så to
+    # utsjekkinger med ulike versjoner av en CSV-fil ikke sletter hverandres buffere.
+    hjem = os.path.expanduser('~')
+    mappe = os.environ.get('XDG_CACHE_HOME') or (os.path.join(hjem, '.cache') if hjem != '~' else None)
+    if mappe is None:
+        mappe = tempfile.gettempdir()
+    return os.path.join(mappe, 'ebm', hashlib.sha256(DATA.encode('utf-8')).hexdigest()[:16])
+
+
+# Mappe for den binære bufferen. EBM_DATABUFFER=<mappe> velger en annen, og EBM_DATABUFFER='' slår den av.
+BUFFER = os.environ.get('EBM_DATABUFFER', _buffermappe())
+
+# Argumenter til pd.read_csv for hver fil. Filer som ikke står her leses med index_col=0.
+FORMATER = {
+    'historical_IPCC6.csv': dict(index_col=0, sep=',', encoding="utf-8"),
+    'futureForcing_IPCC6.csv': dict(index_col=0, sep=',', encoding="utf-8"),
+    'graph.csv': dict(skiprows=1, index_col=0),
+    'totalCI_ERA.csv': dict(index_col=0),
+    'Albedo_med_filter.csv': dict(sep=';', decimal=',', index_col=0),
+    'Albedo_uten_filter.csv': dict(sep=';', decimal=',', index_col=0),
+}
+
+_tabeller = {}  # absolutt sti -> ((endringstid, størrelse), tabell)
+_delt = {}  # 'versjon' -> (endringstid, størrelse) for kildene, 'tabeller' -> navn -> tabell
+
+
+def sti(navn):
+    """Absolutt sti til navn, som enten er et filnavn i data/ eller en sti."""
+    return os.path.abspath(os.path.join(DATA, navn))
+
+
+def sjekksum(sti):
+    """SHA-256 av innholdet i fila sti, som heksadesimal tekst."""
+    sha = hashlib.sha256()
+    with open(sti, 'rb') as fil:
+        for blokk in iter(lambda: fil.read(1 << 20), b''):
+            sha.update(blokk)
+    return sha.hexdigest()
+
+
+def midlertidig_sti(sti):
+    """
+    Midlertidig navn for fila sti, som skrives ferdig der og flyttes på plass med
+    os.replace. Navnet er unikt for prosessen og tråden, så flere tråder som skriver
+    samme fil samtidig ikke skriver i hverandres filer.
+    """
+    return f'{sti}.{os.getpid()}.{threading.get_ident()}'
+
+
+def _les_csv(sti):
+    df = pd.read_csv(sti, **FORMATER.get(os.path.basename(sti), dict(index_col=0)))
+    return {'indeks': df.index.to_numpy(),
+            'indeksnavn': df.index.name,
+            'kolonner': list(df.columns),
+            'verdier': df.to_numpy(dtype=float)}
+
+
+def _les_buffer(prefiks):
+    try:
+        with open(prefiks + '.json', encoding='utf-8') as fil:
+            meta = json.load(fil)
+        return {'indeks': np.load(prefiks + '.indeks.npy', mmap_mode='r'),
+                'indeksnavn': meta['indeksnavn'],
+                'kolonner': meta['kolonner'],
+                'verdier': np.load(prefiks + '.verdier.npy', mmap_mode='r')}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _skriv_buffer(prefiks, tabell):
+    # Hver fil skrives ferdig under et midlertidig navn og flyttes på plass, og
+    # .json skrives sist, så en annen prosess ser enten hele bufferen eller ingenting.
+    mappe, navn = os.path.split(prefiks)
+    try:
+        os.makedirs(mappe, exist_ok=True)
+        for ending, array in (('.indeks.npy', tabell['indeks']), ('.verdier.npy', tabell['verdier'])):
+            midlertidig = midlertidig_sti(prefiks + ending)
+            with open(midlertidig, 'wb') as fil:
+                np.save(fil, np.ascontiguousarray(array))
+            os.replace(midlertidig, prefiks + ending)
+        midlertidig = midlertidig_sti(prefiks + '.json')
+        with open(midlertidig, 'w', encoding='utf-8') as fil:
+            json.dump({'indeksnavn': tabell['indeksnavn'], 'kolonner': tabell['kolonner']}, fil, ensure_ascii=False)
+        os.replace(midlertidig, prefiks + '.json')
+
+        # fjern buffere fra tidligere versjoner av CSV-fila
+        kilde = navn.rsplit('-', 1)[0] + '-'
+        for gammel in os.listdir(mappe):
+            if gammel.startswith(kilde) and not gammel.startswith(navn):
+                os.remove(os.path.join(mappe, gammel))
+    except OSError:
+        pass  # skrivebeskyttet mappe e.l.: tabellen fra CSV-fila brukes som den er
+
+
+def tabell(navn):
+    """
+    Indeks, kolonnenavn og verdier (rader, kolonner) for tabellen i navn, som
+    skrivebeskyttede arrays. Brukes av les, og direkte der en DataFrame ikke trengs.
+    """
+    fil = sti(navn)
+    status = os.stat(fil)
+    versjon = status.st_mtime_ns, status.st_size
+    lest = _tabeller.get(fil)
+    if lest is not None and lest[0] == versjon:
+        return lest[1]
+
+    resultat = None
+    prefiks = None
+    if BUFFER:
+        prefiks = os.path.join(BUFFER, f'{os.path.basename(fil)}-{sjekksum(fil)[:16]}')
+        resultat = _les_buffer(prefiks)
+    if resultat is None:
+        resultat = _les_csv(fil)
+        if prefiks is not None:
+            _skriv_buffer(prefiks, resultat)
+        for array in (resultat['indeks'], resultat['verdier']):
+            array.flags.writeable = False
+
+    _tabeller[fil] = (versjon, resultat)
+    return resultat
+
+
+def les(navn):
+    """
+    Tabellen i navn som en DataFrame uten kopiering av verdiene, se modulbeskrivelsen.
+    """
+    lest = tabell(navn)
+    indeks = pd.Index(lest['indeks'], name=lest['indeksnavn'])
+    return pd.DataFrame(lest['verdier'], index=indeks, columns=lest['kolonner'], copy=False)
+
+
+# _____________________________________________________________________________
+# Avledede tabeller i en delt fil
+
+DELT_VERSJON = 1  # økes når innholdet i AVLEDET endres, slik at fila lages på nytt
+
+
+def _historisk():
+    df = les('historical_IPCC6.csv')
+    df['total'] = df.sum(axis=1)
+    return df
+
+
+def _giss():
+    data = les('graph.csv')
+    error = les('totalCI_ERA.csv')
+    data['Max'] = data['No_Smoothing'] + error['ci95']
+    data['Min'] = data['No_Smoothing'] - error['ci95']
+    return data
+
+
+# navn -> (CSV-filer tabellen lages fra, funksjon som lager den)
+AVLEDET = {
+    'historisk': (('historical_IPCC6.csv',), _historisk),
+    'framtid': (('futureForcing_IPCC6.csv',), lambda: les('futureForcing_IPCC6.csv')),
+    'giss': (('graph.csv', 'totalCI_ERA.csv'), _giss),
+}
+
+
+def _kilder():
+    return sorted({kilde for kilder, _ in AVLEDET.values() for kilde in kilder})
+
+
+def _som_tabell(df):
+    return {'indeks': df.index.to_numpy(),
+            'indeksnavn': df.index.name,
+            'kolonner': list(df.columns),
+            # (kolonner, rader), så hver kolonne ligger sammenhengende
+            'verdier': np.ascontiguousarray(df.to_numpy(dtype=float).T)}
+
+
+def _skriv_delt(prefiks, tabeller):
+    meta = {}
+    deler = []
+    posisjon = 0
+    for navn, innhold in tabeller.items():
+        meta[navn] = {'indeksnavn': innhold['indeksnavn'], 'kolonner': innhold['kolonner']}
+        for del_ in ('indeks', 'verdier'):
+            array = innhold[del_]
+            posisjon = -(-posisjon // 64) * 64  # hver array starter på en hel cachelinje
+            meta[navn][del_] = {'posisjon': posisjon, 'dtype': array.dtype.str, 'form': array.shape}
+            deler.append((posisjon, array))
+            posisjon += array.nbytes
+
+    mappe = os.path.dirname(prefiks)
+    try:
+        os.makedirs(mappe, exist_ok=True)
+        midlertidig = midlertidig_sti(prefiks + '.bin')
+        with open(midlertidig, 'wb') as fil:
+            for start, array in deler:
+                fil.seek(start)
+                fil.write(array.tobytes())
+        os.replace(midlertidig, prefiks + '.bin')
+        midlertidig = midlertidig_sti(prefiks + '.json')
+        with open(midlertidig, 'w', encoding='utf-8') as fil:
+            json.dump(meta, fil, ensure_ascii=False)
+        os.replace(midlertidig, prefiks + '.json')
+
+        navn = os.path.basename(prefiks)
+        for gammel in os.listdir(mappe):
+            if gammel.startswith('delt-') and not gammel.startswith(navn):
+                os.remove(os.path.join(mappe, gammel))
+    except OSError:
+        return False
+    return True
+
+
+def _les_delt(prefiks):
+    try:
+        with open(prefiks + '.json', encoding='utf-8') as fil:
+            meta = json.load(fil)
+        fil = np.memmap(prefiks + '.bin', dtype=np.uint8, mode='r')
+    except (OSError, ValueError):
+        return None
+
+    tabeller = {}
+    for navn, deler in meta.items():
+        innhold = {'indeksnavn': deler['indeksnavn'], 'kolonner': deler['kolonner']}
+        for del_ in ('indeks', 'verdier'):
+            dtype, form = np.dtype(deler[del_]['dtype']), tuple(deler[del_]['form'])
+            innhold[del_] = np.frombuffer(fil, dtype=dtype, count=int(np.prod(form)),
+                                          offset=deler[del_]['posisjon']).reshape(form)
+        tabeller[navn] = innhold
+    return tabeller
+
+
+def delte_tabeller():
+    """
+    Alle tabellene i AVLEDET som skrivebeskyttede arrays, lest fra den delte fila
+    (som lages første gang). Uten BUFFER, eller hvis fila ikke kan skrives, lages
+    tabellene i minnet til denne prosessen.
+    """
+    kilder = _kilder()
+    versjon = [(os.stat(sti(kilde)).st_mtime_ns, os.stat(sti(kilde)).st_size) for kilde in kilder]
+    if _delt.get('versjon') == versjon:
+        return _delt['tabeller']
+
+    tabeller = None
+    if BUFFER:
+        summen = hashlib.sha256(json.dumps([DELT_VERSJON] + [sjekksum(sti(kilde)) for kilde in kilder])
+                                .encode('utf-8')).hexdigest()
+        prefiks = os.path.join(BUFFER, f'delt-{summen[:16]}')
+        tabeller = _les_delt(prefiks)
+        if tabeller is None and _skriv_delt(prefiks, {navn: _som_tabell(lag()) for navn, (_, lag) in AVLEDET.items()}):
+            tabeller = _les_delt(prefiks)
+    if tabeller is None:
+        tabeller = {navn: _som_tabell(lag()) for navn, (_, lag) in AVLEDET.items()}
+        for innhold in tabeller.values():
+            innhold['indeks'].flags.writeable = False
+            innhold['verdier'].flags.writeable = False
+
+    _delt.update(versjon=versjon, tabeller=tabeller)
+    return tabeller
+
+
+def delt(navn):
+    """
+    Den avledede tabellen navn (se AVLEDET) som en DataFrame over den delte fila,
+    uten kopiering av verdiene.
+    """
+    innhold = delte_tabeller()[navn]
+    indeks = pd.Index(innhold['indeks'], name=innhold['indeksnavn'])
+    return pd.DataFrame(innhold['verdier'].T, index=indeks, columns=innhold['kolonner'], copy=False)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo-ensemble av toboksmodellen for usikkerhet i tilbakekoblingene.
+
+I stedet for å kjøre modellen for lambda +- ett standardavvik trekkes tusenvis av
+kombinasjoner av tilbakekoblinger (og gamma), alle medlemmene integreres samtidig,
+og resultatet reduseres til persentiler år for år. Integrasjonen går i blokker av
+år, slik at bare (blokk, medlemmer) temperaturer ligger i minnet om gangen.
+"""
+import numpy as np
+
+from ebm.toboks import CEFF_M, CEFF_D, Dt
+
+PERSENTILER = (5, 17, 50, 83, 95)
+BLOKK = 64  # antall år som holdes i minnet før de reduseres til persentiler
+
+
+def standardavvik(usikkerhet):
+    # (gjennomsnitt, min, maks, ...) der min og maks ligger to standardavvik fra
+    # gjennomsnittet, samme konvensjon som Std i toboks_framtid
+    return (usikkerhet[2] - usikkerhet[1]) / 4
+
+
+def trekk_parametre(antall, tilbakekoblinger, gamma=None, seed=None):
+    """
+    Trekker antall verdier av lambda_sum og gamma.
+
+    tilbakekoblinger er en liste med (gjennomsnitt, min, maks, ...) for hver
+    tilbakekobling, som lambda_planck i toboks_framtid. Hver tilbakekobling trekkes
+    uavhengig fra en normalfordeling og summeres. gamma er enten et tall (samme for
+    alle medlemmene) eller en (gjennomsnitt, min, maks)-tuppel på samme form.
+    """
+    rng = np.random.default_rng(seed)
+    lambda_sum = np.zeros(antall)
+    for usikkerhet in tilbakekoblinger:
+        lambda_sum += rng.normal(usikkerhet[0], standardavvik(usikkerhet), antall)
+
+    if gamma is None:
+        gamma = np.zeros(antall)
+    elif np.ndim(gamma) == 0:
+        gamma = np.full(antall, float(gamma))
+    else:
+        gamma = rng.normal(gamma[0], standardavvik(gamma), antall)
+    return lambda_sum, gamma
+
+
+def _integrer(radiative_forcing, lambda_sum, gamma, til_aar, blokk):
+    # Går gjennom årene 0..til_aar-1 og gir (start, Ts-blokk) med form (år i blokka, medlemmer).
+    # Eulerskjemaet skrives som x[t] = A x[t-1] + g F[t], med buffere som gjenbrukes.
+    a11 = 1 + Dt * (lambda_sum + gamma) / CEFF_M
+    a12 = -Dt * gamma / CEFF_M
+    a21 = -Dt * gamma / CEFF_D
+    a22 = 1 + Dt * gamma / CEFF_D
+    g = Dt / CEFF_M
+
+    ts = np.zeros(len(lambda_sum))
+    to = np.zeros(len(lambda_sum))
+    ny_to = np.empty_like(to)
+    mellom = np.empty_like(ts)
+    Ts = np.empty((blokk, len(lambda_sum)))
+
+    Ts[0] = 0
+    i = 1
+    start = 0
+    for t in range(1, til_aar):
+        if i == blokk:
+            yield start, Ts
+            start, i = t, 0
+        np.multiply(a21, ts, out=ny_to)
+        np.multiply(a22, to, out=mellom)
+        ny_to += mellom
+        ts *= a11
+        np.multiply(a12, to, out=mellom)
+        ts += mellom
+        ts += g * radiative_forcing[t]
+        to, ny_to = ny_to, to
+        Ts[i] = ts
+        i += 1
+    yield start, Ts[:i]
+
+
+def _persentiler(Ts, persentiler):
+    # Som _persentiler(Ts, persentiler) (lineær interpolasjon), men med
+    # np.partition på bare de ordensstatistikkene som trengs, i stedet for å sortere
+    q = np.asarray(persentiler, dtype=float) / 100 * (Ts.shape[1] - 1)
+    lav = np.floor(q).astype(int)
+    hoy = np.minimum(lav + 1, Ts.shape[1] - 1)
+    delt = np.partition(Ts, np.union1d(lav, hoy), axis=1)
+    vekt = q - lav
+    return (delt[:, lav] * (1 - vekt) + delt[:, hoy] * vekt).T
+
+
+def _etter_folsomhet(lambda_sum, gamma, aar=70):
+    # Rekkefølgen av medlemmene etter temperaturen etter aar år med konstant pådriv.
+    # Persentilene avhenger ikke av rekkefølgen, men med medlemmene sortert slik er
+    # hvert år nesten sortert (eller omvendt sortert), og np.partition går da omtrent
+    # dobbelt så fort.
+    *_, (_, Ts) = _integrer(np.ones(aar + 1), lambda_sum, gamma, aar + 1, aar + 1)
+    return np.argsort(Ts[-1], kind='stable')
+
+
+def ensemble_persentiler(radiative_forcing, lambda_sum, gamma, persentiler=PERSENTILER, nullnivaa=None,
+                         blokk=BLOKK):
+    """
+    Persentilene av overflatetemperaturen til ensemblet, år for år.
+
+    radiative_forcing er én pådrivsserie (år,) eller flere (serier, år), som alle
+    kjøres med de samme medlemmene. lambda_sum og gamma er vektorer (medlemmer,),
+    f.eks. fra trekk_parametre. nullnivaa er et valgfritt (fra, til)-par med
+    indekser (til er ikke med) som hvert medlem måles relativt til, før
+    persentilene regnes ut.
+
+    Returnerer en array med form (persentiler, år), eller (serier, persentiler, år).
+    """
+    radiative_forcing = np.asarray(radiative_forcing, dtype=float)
+    rader = np.atleast_2d(radiative_forcing)
+    lambda_sum, gamma = np.broadcast_arrays(np.asarray(lambda_sum, dtype=float), np.asarray(gamma, dtype=float))
+    orden = _etter_folsomhet(lambda_sum, gamma)
+    lambda_sum, gamma = lambda_sum[orden], gamma[orden]
+
+    resultat = np.empty((len(rader), len(persentiler), rader.shape[1]))
+    for r, F in enumerate(rader):
+        referanse = 0
+        if nullnivaa is not None:
+            # Første gang gjennom: bare gjennomsnittet over referanseperioden for hvert medlem
+            fra, til = nullnivaa
+            referanse = np.zeros(len(lambda_sum))
+            for start, Ts in _integrer(F, lambda_sum, gamma, til, blokk):
+                lav, hoy = max(fra - start, 0), min(til - start, len(Ts))
+                if lav < hoy:
+                    referanse += Ts[lav:hoy].sum(axis=0)
+            referanse /= til - fra
+
+        for start, Ts in _integrer(F, lambda_sum, gamma, len(F), blokk):
+            Ts -= referanse
+            resultat[r, :, start:start + len(Ts)] = _persentiler(Ts, persentiler)
+
+    if radiative_forcing.ndim == 1:
+        return resultat[0]
+    return resultat
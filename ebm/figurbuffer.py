@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Buffer for svarene fra Dash-callbackene.
+
+Alle callbackene i modules/ er rene funksjoner av inputverdiene (sjekklister,
+glidebrytere, tekstfelt), men Dash regner ut og serialiserer hele Plotly-figuren
+på nytt for hvert kall. Når en hel klasse bruker de samme standardvalgene er
+det bortkastet arbeid.
+
+bufre_callbacks kobler en Figurbuffer på Flask-serveren til en Dash-app.
+Forespørsler til /_dash-update-component nøkles på den normaliserte listen av
+output, input og state, og det ferdig serialiserte JSON-svaret lagres. Ved treff
+sendes det lagrede svaret uten at callbacken kjøres.
+
+Figurbuffer ligger i minnet til én prosess. Med en WSGI-server med flere
+prosesser kan SqliteFigurbuffer brukes i stedet: den lagrer svarene i en
+SQLite-fil som alle prosessene på maskinen deler, slik at en figur som er regnet
+ut i én prosess kan sendes fra alle de andre.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+MAKS_BYTES = 64 * 1024 * 1024  # samlet størrelse på lagrede svar
+LEVETID = 60 * 60  # sekunder før et lagret svar regnes som utgått
+
+
+class Figurbuffer:
+    """
+    LRU-buffer for serialiserte callback-svar, begrenset av samlet størrelse i
+    bytes og en levetid (TTL) per oppføring. Teller treff og bom.
+    """
+
+    def __init__(self, maks_bytes=MAKS_BYTES, levetid=LEVETID):
+        self.maks_bytes = maks_bytes
+        self.levetid = levetid
+        self.treff = 0
+        self.bom = 0
+        self.utkastet = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._laas = threading.Lock()
+
+    def hent(self, nokkel):
+        with self._laas:
+            oppforing = self._data.get(nokkel)
+            if oppforing is not None and oppforing[0] < time.monotonic():
+                self._fjern(nokkel)
+                oppforing = None
+            if oppforing is None:
+                self.bom += 1
+                return None
+            self._data.move_to_end(nokkel)
+            self.treff += 1
+            return oppforing[1]
+
+    def lagre(self, nokkel, data):
+        if len(data) > self.maks_bytes:
+            return
+        with self._laas:
+            if nokkel in self._data:
+                self._fjern(nokkel)
+            self._data[nokkel] = (time.monotonic() + self.levetid, data)
+            self.bytes += len(data)
+            while self.bytes > self.maks_bytes:
+                self._fjern(next(iter(self._data)))
+                self.utkastet += 1
+
+    def _fjern(self, nokkel):
+        self.bytes -= len(self._data.pop(nokkel)[1])
+
+    def statistikk(self):
+        with self._laas:
+            return {'treff': self.treff,
+                    'bom': self.bom,
+                    'utkastet': self.utkastet,
+                    'oppforinger': len(self._data),
+                    'bytes': self.bytes}
+
+
+class SqliteFigurbuffer:
+    """
+    Samme grensesnitt som Figurbuffer, men lagret i en SQLite-fil som deles av alle
+    prosessene på maskinen. Hver skriving er en egen transaksjon, så andre prosesser
+    ser enten hele svaret eller ingenting. Treff og bom telles per prosess.
+    """
+
+    def __init__(self, sti, maks_bytes=MAKS_BYTES, levetid=LEVETID):
+        self.sti = sti
+        self.maks_bytes = maks_bytes
+        self.levetid = levetid
+        self.treff = 0
+        self.bom = 0
+        self.utkastet = 0
+        self._lokal = threading.local()
+        with self._tilkobling() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS figurer (nokkel TEXT PRIMARY KEY, data BLOB NOT NULL, '
+                       'storrelse INTEGER NOT NULL, utloper REAL NOT NULL, brukt REAL NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS figurer_brukt ON figurer (brukt)')
+
+    def _tilkobling(self):
+        # sqlite3-tilkoblinger kan ikke deles mellom tråder eller arves gjennom fork,
+        # så hver tråd i hver prosess får sin egen.
+        db = getattr(self._lokal, 'db', None)
+        if db is None or self._lokal.pid != os.getpid():
+            db = sqlite3.connect(self.sti, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._lokal.db, self._lokal.pid = db, os.getpid()
+        return db
+
+    def hent(self, nokkel):
+        db = self._tilkobling()
+        naa = time.time()
+        rad = db.execute('SELECT data, utloper FROM figurer WHERE nokkel = ?', (nokkel,)).fetchone()
+        if rad is None or rad[1] < naa:
+            self.bom += 1
+            return None
+        with db:
+            db.execute('UPDATE figurer SET brukt = ? WHERE nokkel = ?', (naa, nokkel))
+        self.treff += 1
+        return bytes(rad[0])
+
+    def lagre(self, nokkel, data):
+        if len(data) > self.maks_bytes:
+            return
+        naa = time.time()
+        with self._tilkobling() as db:
+            db.execute('INSERT OR REPLACE INTO figurer VALUES (?, ?, ?, ?, ?)',
+                       (nokkel, data, len(data), naa + self.levetid, naa))
+            db.execute('DELETE FROM figurer WHERE utloper < ?', (naa,))
+            totalt = db.execute('SELECT COALESCE(SUM(storrelse), 0) FROM figurer').fetchone()[0]
+            while totalt > self.maks_bytes:
+                eldste, storrelse = db.execute('SELECT nokkel, storrelse FROM figurer ORDER BY brukt LIMIT 1').fetchone()
+                db.execute('DELETE FROM figurer WHERE nokkel = ?', (eldste,))
+                totalt -= storrelse
+                self.utkastet += 1
+
+    def statistikk(self):
+        antall, storrelse = self._tilkobling().execute(
+            'SELECT COUNT(*), COALESCE(SUM(storrelse), 0) FROM figurer').fetchone()
+        return {'treff': self.treff,
+                'bom': self.bom,
+                'utkastet': self.utkastet,
+                'oppforinger': antall,
+                'bytes': storrelse}
+
+
+def callback_nokkel(prefiks, innhold):
+    """
+    Nøkkel for et kall til /_dash-update-component. Bare output, input og state tas
+    med, og JSON-en skrives med sorterte nøkler slik at samme valg gir samme nøkkel.
+    Callbacker med flere output kan svare med no_update for noen av dem avhengig av
+    hvilken input som ble endret, så changedPropIds er også med.
+    """
+    normalisert = {'app': prefiks,
+                   'output': innhold.get('output'),
+                   'endret': sorted(innhold.get('changedPropIds') or []),
+                   'inputs': [(i.get('id'), i.get('property'), i.get('value')) for i in innhold.get('inputs', [])],
+                   'state': [(s.get('id'), s.get('property'), s.get('value')) for s in innhold.get('state', [])]}
+    tekst = json.dumps(normalisert, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(tekst.encode('utf-8')).hexdigest()
+
+
+def app_prefiks():
+    """
+    URL-prefikset til Dash-appen som fikk kallet til /_dash-update-component. Det
+    er det samme om appen har sin egen Flask-server bak DispatcherMiddleware (da
+    ligger prefikset i script_root) eller deler serveren med de andre appene.
+    """
+    return request.script_root + request.path[:-len('/_dash-update-component')]
+
+
+def bufre_callbacks(server, buffer):
+    """Kobler buffer på alle callback-kall til Flask-serveren til en eller flere Dash-apper."""
+
+    @server.before_request
+    def _hent_fra_buffer():
+        if request.method != 'POST' or not request.path.endswith('/_dash-update-component'):
+            return None
+        innhold = request.get_json(silent=True)
+        if innhold is None:
+            return None
+        g.figurbuffer_nokkel = callback_nokkel(app_prefiks(), innhold)
+        data = buffer.hent(g.figurbuffer_nokkel)
+        if data is None:
+            return None
+        g.figurbuffer_treff = True
+        return Response(data, mimetype='application/json')
+
+    @server.after_request
+    def _lagre_i_buffer(respons):
+        # Nøkkelen blir liggende i g, så ebm.komprimering kan bruke den
+        nokkel = g.get('figurbuffer_nokkel')
+        if nokkel is not None and not g.get('figurbuffer_treff', False) and respons.status_code == 200:
+            buffer.lagre(nokkel, respons.get_data())
+        return respons
+
+    return server
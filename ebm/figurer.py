@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hjelpefunksjoner for Plotly-figurer som sendes til nettleseren.
+"""
+import base64
+import copy
+import datetime
+import json
+import math
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+OMHYLLING_BLOKK = 32  # antall år i hver blokk i omhylling
+MALER = 64  # antall figuroppsett Figurmal husker
+KURVEDATA = {'x', 'y', 'z', 'r', 'theta', 'base', 'lat', 'lon', 'open', 'high', 'low', 'close'}
+_ENKLE = (str, int, float, bool, type(None))
+
+
+def figur_til_dict(fig):
+    """
+    Figuren som rene ordbøker, lister og tall, uten numpy-arrays. Brukes for figurmaler
+    som legges i dcc.Store og leses av clientside callbacks i nettleseren.
+    """
+    return _til_json(fig.to_plotly_json())
+
+
+class Figurmal:
+    """
+    Figurer med samme oppsett og nye tall. lag bygger figuren med plotly.express og
+    update_*, og går gjennom Plotlys validering for hver egenskap. Figurmal gjør det
+    bare første gang en nøkkel (utvalget av kurver og det som ellers bestemmer
+    oppsettet) brukes, og husker figuren som rene ordbøker (figur_til_dict). Senere
+    kall med samme nøkkel gir en figur der bare verdiene i kurver (for eksempel x og y
+    for hver kurve, i samme rekkefølge som i figuren) og layout er byttet ut.
+    Ordbøkene i malen deles mellom figurene og må ikke endres.
+    """
+
+    def __init__(self, maks=MALER):
+        self.maks = maks
+        self.bygget = 0
+        self.gjenbrukt = 0
+        self._maler = OrderedDict()
+        self._laas = threading.Lock()
+
+    def __call__(self, nokkel, lag, kurver, layout=None):
+        with self._laas:
+            mal = self._maler.get(nokkel)
+            if mal is not None:
+                self._maler.move_to_end(nokkel)
+                self.gjenbrukt += 1
+        if mal is None:
+            mal = figur_til_dict(lag())
+            with self._laas:
+                self._maler[nokkel] = mal
+                self.bygget += 1
+                while len(self._maler) > self.maks:
+                    self._maler.popitem(last=False)
+        if len(kurver) != len(mal['data']):
+            raise ValueError(f'{len(kurver)} kurver, men figuren har {len(mal["data"])}')
+        nytt_oppsett = dict(mal['layout'])
+        for nokkel_, verdi in (layout or {}).items():
+            if isinstance(verdi, dict) and isinstance(nytt_oppsett.get(nokkel_), dict):
+                verdi = {**nytt_oppsett[nokkel_], **verdi}
+            nytt_oppsett[nokkel_] = verdi
+        return {'data': [{**kurve, **nytt} for kurve, nytt in zip(mal['data'], kurver)],
+                'layout': nytt_oppsett}
+
+    def statistikk(self):
+        with self._laas:
+            return {'bygget': self.bygget, 'gjenbrukt': self.gjenbrukt, 'maler': len(self._maler)}
+
+
+def _fra_bdata(verdi):
+    # nyere plotly koder numpy-arrays som base64 ("typed arrays")
+    array = np.frombuffer(base64.b64decode(verdi['bdata']), dtype=verdi['dtype'])
+    if 'shape' in verdi:
+        array = array.reshape([int(n) for n in str(verdi['shape']).split(',')])
+    return array
+
+
+def _til_json(verdi):
+    if isinstance(verdi, dict):
+        if 'bdata' in verdi and 'dtype' in verdi:
+            return _fra_bdata(verdi).tolist()
+        return {nokkel: _til_json(v) for nokkel, v in verdi.items()}
+    if isinstance(verdi, (list, tuple)):
+        return [_til_json(v) for v in verdi]
+    if isinstance(verdi, np.ndarray):
+        return verdi.tolist()
+    if isinstance(verdi, np.generic):
+        return verdi.item()
+    return verdi
+
+
+def avrund(verdier, siffer):
+    """
+    Verdiene (array) avrundet til siffer gjeldende siffer av den minste av største
+    absoluttverdi og spennet (største minus minste), så kurver langt fra null, som
+    temperaturer i kelvin, beholder formen. Avrundede tall blir korte desimaltall i
+    JSON. Heltall (som årstall) returneres uendret.
+    """
+    verdier = np.asarray(verdier)
+    if verdier.dtype.kind != 'f':
+        return verdier
+    endelige = verdier[np.isfinite(verdier)]
+    if endelige.size == 0 or np.array_equal(endelige, np.round(endelige)):
+        return verdier
+    skala = np.abs(endelige).max()
+    spenn = endelige.max() - endelige.min()
+    if 0 < spenn < skala:
+        skala = spenn
+    return np.round(verdier, siffer - 1 - int(np.floor(np.log10(skala))))
+
+
+def til_json(verdi, siffer=None):
+    """
+    verdi (for eksempel et callback-svar fra Dash, med Plotly-figurer, Dash-komponenter
+    og numpy-arrays) som kompakt JSON, uten PlotlyJSONEncoder. Med siffer avrundes
+    tallene i kurvene (KURVEDATA) med avrund, og hele tall i dem sendes uten
+    desimaler. NaN og uendelig blir null, som med Plotly. Ukjente typer gir TypeError.
+    """
+    try:
+        return _dumps(verdi, siffer, False)
+    except ValueError:
+        # NaN eller uendelig i vanlige Python-tall: gå gjennom alt en gang til og bytt dem ut
+        return _dumps(verdi, siffer, True)
+
+
+def _dumps(verdi, siffer, streng):
+    if siffer is None and not streng:
+        # json går gjennom ordbøker og lister selv, og spør _enkel om resten
+        return json.dumps(verdi, separators=(',', ':'), ensure_ascii=False, allow_nan=False, default=_enkel)
+    # Lister med enkle verdier går rett til json, og typer json ikke kjenner
+    # (arrays og figurer inne i slike lister) gjøres om med default
+    return json.dumps(_forenkle(verdi, siffer, streng), separators=(',', ':'), ensure_ascii=False,
+                      allow_nan=False, default=lambda v: _forenkle(v, siffer, streng))
+
+
+def _enkel(verdi):
+    # verdi som noe json kjenner, ett nivå ned
+    if isinstance(verdi, np.ndarray):
+        return _liste(verdi) if verdi.dtype.kind in 'biuf' else verdi.tolist()
+    if isinstance(verdi, np.generic):
+        return verdi.item()
+    if isinstance(verdi, (datetime.date, datetime.time)):
+        return verdi.isoformat()
+    if hasattr(verdi, 'to_plotly_json'):
+        return verdi.to_plotly_json()
+    if hasattr(verdi, 'to_numpy'):
+        return verdi.to_numpy()
+    raise TypeError(f'{type(verdi).__name__} kan ikke gjøres om til JSON')
+
+
+def _forenkle(verdi, siffer, streng, nokkel=None):
+    # verdi som ordbøker, lister og enkle verdier; med streng byttes NaN og uendelig med None
+    if isinstance(verdi, dict):
+        if 'bdata' in verdi and 'dtype' in verdi:
+            return _forenkle(_fra_bdata(verdi), siffer, streng, nokkel)
+        return {k: _forenkle(v, siffer, streng, k) for k, v in verdi.items()}
+    if isinstance(verdi, (list, tuple)):
+        if (siffer is not None and nokkel in KURVEDATA and verdi
+                and all(type(v) in (float, int) or v is None for v in verdi)):
+            return _liste(avrund(np.array(verdi, dtype=float), siffer), heltall=True)
+        if not streng and verdi and type(verdi[0]) in _ENKLE:
+            return verdi
+        return [_forenkle(v, siffer, streng) for v in verdi]
+    if isinstance(verdi, np.ndarray):
+        if siffer is not None and nokkel in KURVEDATA:
+            return _liste(avrund(verdi, siffer), heltall=True)
+        if verdi.dtype.kind in 'biuf':
+            return _liste(verdi)
+        return [_forenkle(v, siffer, streng) for v in verdi.tolist()]
+    if isinstance(verdi, float):
+        return None if streng and not math.isfinite(verdi) else verdi
+    if isinstance(verdi, _ENKLE):
+        return verdi
+    if isinstance(verdi, np.generic):
+        return _forenkle(verdi.item(), siffer, streng, nokkel)
+    if isinstance(verdi, (datetime.date, datetime.time)):
+        return verdi.isoformat()
+    if hasattr(verdi, 'to_plotly_json'):  # Plotly-figurer og Dash-komponenter
+        return _forenkle(verdi.to_plotly_json(), siffer, streng, nokkel)
+    if hasattr(verdi, 'to_numpy'):  # pandas
+        return _forenkle(verdi.to_numpy(), siffer, streng, nokkel)
+    raise TypeError(f'{type(verdi).__name__} kan ikke gjøres om til JSON')
+
+
+def _liste(array, heltall=False):
+    # array som (nøstede) lister, med NaN og uendelig som None, og med heltall=True
+    # hele tall som int
+    if array.dtype.kind != 'f':
+        return array.tolist()
+    endelig = np.isfinite(array)
+    if endelig.all():
+        if heltall and array.size and np.abs(array).max() < 2 ** 53 and np.array_equal(array, np.round(array)):
+            return array.astype(np.int64).tolist()
+        return array.tolist()
+    objekter = array.astype(object)
+    objekter[~endelig] = None
+    return objekter.tolist()
+
+
+def _tall(verdier):
+    # JSON har ikke NaN, og manglende verdier sendes som None (null)
+    return [None if np.isnan(verdi) else float(verdi) for verdi in verdier]
+
+
+def omhylling(serier, blokk=OMHYLLING_BLOKK):
+    """
+    Største og minste verdi over alle seriene (rader i serier) for hvert år, og for
+    hver blokk av blokk år. Med disse finner ekstrema største og minste verdi i et
+    vilkårlig tidsrom ved å se på høyst 2 * blokk enkeltår, og på resten som hele
+    blokker, uten å gå gjennom seriene på nytt. NaN hoppes over.
+    """
+    serier = np.atleast_2d(np.asarray(serier, dtype=float))
+    n_blokker = -(-serier.shape[1] // blokk)
+    utvidet = np.full((serier.shape[0], n_blokker * blokk), np.nan)
+    utvidet[:, :serier.shape[1]] = serier
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # år der alle seriene mangler
+        ovre = np.nanmax(utvidet, axis=0)
+        nedre = np.nanmin(utvidet, axis=0)
+        blokk_ovre = np.nanmax(ovre.reshape(n_blokker, blokk), axis=1)
+        blokk_nedre = np.nanmin(nedre.reshape(n_blokker, blokk), axis=1)
+    return {'blokk': blokk,
+            'ovre': _tall(ovre[:serier.shape[1]]),
+            'nedre': _tall(nedre[:serier.shape[1]]),
+            'blokk_ovre': _tall(blokk_ovre),
+            'blokk_nedre': _tall(blokk_nedre)}
+
+
+def ekstrema(omhyllingen, fra, til):
+    """
+    (minste, største) verdi i omhyllingen fra og med indeks fra til og med indeks til.
+    Python-versjonen av ekstrema i modules/assets/klientfigurer.js.
+    """
+    blokk = omhyllingen['blokk']
+    fra, til = max(fra, 0), min(til, len(omhyllingen['ovre']) - 1)
+    nedre, ovre = [], []
+    i = fra
+    while i <= til:
+        if i % blokk == 0 and i + blokk - 1 <= til:
+            nedre.append(omhyllingen['blokk_nedre'][i // blokk])
+            ovre.append(omhyllingen['blokk_ovre'][i // blokk])
+            i += blokk
+        else:
+            nedre.append(omhyllingen['nedre'][i])
+            ovre.append(omhyllingen['ovre'][i])
+            i += 1
+    nedre = [verdi for verdi in nedre if verdi is not None]
+    ovre = [verdi for verdi in ovre if verdi is not None]
+    if not nedre:
+        return None, None
+    return min(nedre), max(ovre)
+
+
+def vis_figur(figur, x0, visning, periode):
+    """
+    Figuren (fra figur_til_dict) slik den vises for periode: hver kurve forskjøvet med
+    visning['forskyvning'] (hvis den finnes), x-aksen satt til perioden og y-aksen
+    til største og minste verdi i perioden fra visning['omhylling'], + 5 %. x0 er
+    årstallet til første punkt. Python-versjonen av vis_figur i klientfigurer.js.
+    """
+    figur = copy.deepcopy(figur)
+    for kurve, forskyvning in zip(figur['data'], visning.get('forskyvning', [])):
+        if forskyvning:
+            kurve['y'] = [None if y is None else y - forskyvning for y in kurve['y']]
+
+    ymin, ymax = ekstrema(visning['omhylling'], periode[0] - x0, periode[1] - x0)
+    figur['layout']['xaxis']['range'] = [periode[0], periode[1]]
+    if ymin is not None:
+        figur['layout']['yaxis']['range'] = [ymin * 1.05, ymax * 1.05]
+    return figur
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tilpasning av toboksmodellen til GISS-temperaturene (graph.csv).
+
+lambda_sum og gamma (og eventuelt en skaleringsfaktor for hvert pådriv) velges
+slik at overflatetemperaturen fra modellen, med nullnivå 1951-1980 som GISS,
+ligger nærmest No_Smoothing, vektet med usikkerheten ci95 fra totalCI_ERA.csv:
+
+    chi2 = sum over år av ((modell - GISS) / sigma)^2,  sigma = ci95 / 1.96
+
+chi2 alene har ikke noe minimum for lambda < 0: tilpasningen går mot lambda = 0
+(uendelig klimafølsomhet), uansett hvor vidt rutenettet er. Derfor legges det
+til en normalfordelt prior på lambda_sum, LAMBDA_PRIOR, fra tilbakekoblingene i
+toboks_framtid. For at prioren ikke skal drukne i chi2 når modellen ikke passer
+innenfor usikkerheten til GISS, skaleres chi2 først med minste chi2 per
+frihetsgrad (og aldri opp):
+
+    maal = chi2 / s2 + ((lambda_sum - mu) / sd)^2,  s2 = max(1, min chi2 / (år - parametre))
+
+Først regnes maal ut for hele rutenettet LAMBDAER x GAMMAER med ett kall til
+modellen (ebm.respons.responstabell), deretter forfines minimumet med finere
+rutenett rundt det beste punktet. Med prioren ligger minimumet inne i
+rutenettet, både med og uten skalering. Modellen er lineær i pådrivet, så uten
+skalering kjøres den bare for summen av pådrivene, og med skalering finnes de
+beste faktorene for hvert punkt i rutenettet med vektede minste kvadraters metode.
+"""
+import os
+
+import numpy as np
+
+from ebm.datasett import les, sti
+from ebm.respons import responstabell
+
+PAADRIV = 'historical_IPCC6.csv'
+FRA_AAR = 1850  # modellen startes her, som i toboks_giss
+NULLNIVAA = (1951, 1980)  # samme nullnivå som GISS
+# Stabile og fysisk rimelige verdier. Uten grenser går tilpasningen mot lambda >= 0.
+LAMBDAER = np.linspace(-4.0, -0.3, 75)  # W m-2 K-1, steg 0.05
+GAMMAER = np.linspace(-3.0, 0.0, 61)  # W m-2 K-1, steg 0.05
+# Summen av tilbakekoblingene og standardavviket, som lambda_sum og Std i toboks_framtid
+LAMBDA_PRIOR = (-1.18, 0.33)  # W m-2 K-1
+FORFININGER = 3  # antall finere rutenett rundt minimumet
+PUNKTER = 11  # punkter langs hver akse i de finere rutenettene
+
+_kalibrert = {}  # (skalering, versjon av filene) -> resultat
+
+
+def observasjoner():
+    """Årstall, GISS-anomalien og sigma for årene som finnes både i GISS og i pådrivet."""
+    giss = les('graph.csv')['No_Smoothing']
+    ci95 = les('totalCI_ERA.csv')['ci95']
+    aar = np.intersect1d(np.intersect1d(giss.index, ci95.index), les(PAADRIV).loc[FRA_AAR:].index)
+    return aar, giss.loc[aar].to_numpy(), ci95.loc[aar].to_numpy() / 1.96
+
+
+def _chi2(lambdaer, gammaer, skalering):
+    # chi2 med form (gamma, lambda), og skaleringsfaktorene (gamma, lambda, kolonner) eller None
+    paadriv = les(PAADRIV).loc[FRA_AAR:]
+    if not skalering:
+        paadriv = paadriv.sum(axis=1).to_frame('total')
+    aar, giss, sigma = observasjoner()
+    vekt = 1 / sigma ** 2
+
+    Ts, _ = responstabell(paadriv, lambdaer, gammaer)  # (kolonner, gamma, lambda, år)
+    alle_aar = paadriv.index.to_numpy()
+    nullnivaa = (alle_aar >= NULLNIVAA[0]) & (alle_aar <= NULLNIVAA[1])
+    Ts = Ts[..., np.searchsorted(alle_aar, aar)] - Ts[..., nullnivaa].mean(axis=-1, keepdims=True)
+
+    if not skalering:
+        return (((Ts[0] - giss) ** 2) * vekt).sum(axis=-1), None
+    # normallikningene (A W A^T) s = A W giss for hvert punkt
+    A_W_AT = np.einsum('kglt,t,jglt->glkj', Ts, vekt, Ts)
+    A_W_y = np.einsum('kglt,t->glk', Ts, vekt * giss)
+    faktorer = np.linalg.solve(A_W_AT, A_W_y[..., np.newaxis])[..., 0]
+    modell = np.einsum('glk,kglt->glt', faktorer, Ts)
+    return (((modell - giss) ** 2) * vekt).sum(axis=-1), faktorer
+
+
+def kalibrer(skalering=False):
+    """
+    Beste lambda_sum og gamma mot GISS, med prioren på lambda_sum (se over). Med
+    skalering=True tilpasses også en faktor for hvert pådriv. Returnerer en ordbok
+    med 'lambda_sum', 'gamma', 'chi2' (uten prioren), 's2' (skaleringen av chi2),
+    'prior' (LAMBDA_PRIOR), antall år ('n_aar', fra 'fra_aar' til 'til_aar'),
+    'skalering' (kolonne -> faktor, eller None), 'paa_grensen' (True hvis det beste
+    punktet ligger på kanten av LAMBDAER x GAMMAER, og ikke er et ekte minimum) og
+    rutenettet ('flate' med 'lambdaer', 'gammaer', og 'chi2' og 'maal' med form
+    (gamma, lambda)). Resultatet huskes til en av datafilene endres.
+    """
+    versjon = tuple((os.stat(sti(navn)).st_mtime_ns, os.stat(sti(navn)).st_size)
+                    for navn in (PAADRIV, 'graph.csv', 'totalCI_ERA.csv'))
+    nokkel = (bool(skalering), versjon)
+    if nokkel in _kalibrert:
+        return _kalibrert[nokkel]
+
+    aar, _, _ = observasjoner()
+    kolonner = list(les(PAADRIV).columns)
+    flate, faktorer = _chi2(LAMBDAER, GAMMAER, skalering)
+    parametre = 2 + (len(kolonner) if skalering else 0)
+    s2 = max(1.0, flate.min() / (len(aar) - parametre))
+
+    def maal(chi2, lambdaer):
+        return chi2 / s2 + ((lambdaer - LAMBDA_PRIOR[0]) / LAMBDA_PRIOR[1]) ** 2
+
+    maal_flate = maal(flate, LAMBDAER)
+    j, i = np.unravel_index(np.argmin(maal_flate), maal_flate.shape)
+    beste = (maal_flate[j, i], LAMBDAER[i], GAMMAER[j], None if faktorer is None else faktorer[j, i], flate[j, i])
+
+    steg_l, steg_g = LAMBDAER[1] - LAMBDAER[0], GAMMAER[1] - GAMMAER[0]
+    for _ in range(FORFININGER):
+        # rutenett over ett steg på hver side av det beste punktet, innenfor grensene
+        lambdaer = np.clip(np.linspace(beste[1] - steg_l, beste[1] + steg_l, PUNKTER), LAMBDAER[0], LAMBDAER[-1])
+        gammaer = np.clip(np.linspace(beste[2] - steg_g, beste[2] + steg_g, PUNKTER), GAMMAER[0], GAMMAER[-1])
+        chi2, fin = _chi2(lambdaer, gammaer, skalering)
+        verdi = maal(chi2, lambdaer)
+        j, i = np.unravel_index(np.argmin(verdi), verdi.shape)
+        if verdi[j, i] < beste[0]:
+            beste = (verdi[j, i], lambdaer[i], gammaer[j], None if fin is None else fin[j, i], chi2[j, i])
+        steg_l, steg_g = 2 * steg_l / (PUNKTER - 1), 2 * steg_g / (PUNKTER - 1)
+    # etter forfiningen, siden den kan flytte minimumet til (eller fra) kanten
+    paa_grensen = (np.isclose(beste[1], LAMBDAER[[0, -1]]).any()
+                   or np.isclose(beste[2], GAMMAER[[0, -1]]).any())
+
+    resultat = {'lambda_sum': float(beste[1]),
+                'gamma': float(beste[2]),
+                'chi2': float(beste[4]),
+                's2': float(s2),
+                'prior': LAMBDA_PRIOR,
+                'n_aar': len(aar),
+                'fra_aar': int(aar[0]),
+                'til_aar': int(aar[-1]),
+                'skalering': None if beste[3] is None else dict(zip(kolonner, beste[3].tolist())),
+                'paa_grensen': bool(paa_grensen),
+                'flate': {'lambdaer': LAMBDAER, 'gammaer': GAMMAER, 'chi2': flate, 'maal': maal_flate}}
+    _kalibrert[nokkel] = resultat
+    return resultat
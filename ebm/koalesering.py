@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Samler callback-kall fra samme økt, slik at bare det nyeste kjøres.
+
+Når en elev endrer et tall flere ganger raskt etter hverandre, sender nettleseren
+et nytt kall til /_dash-update-component for hver endring, mens modellen fortsatt
+regner på det forrige. Svarene på de eldre kallene vises aldri (nettleseren
+venter på det nyeste), men uten koalesering kjøres alle sammen etter tur.
+
+koalesere_callbacks kobler en Koalesering på Flask-serveren til en Dash-app.
+Kall med samme økt (informasjonskapselen KAKE), app og output kjøres ett om
+gangen. Et kall som venter på tur, og som har fått et nyere kall bak seg, får
+svaret 204 (som PreventUpdate) uten at callbacken kjøres. Kallet som allerede
+regner får gjøre seg ferdig.
+
+Koaleseringen virker innenfor én prosess, og bare når serveren tar imot flere
+kall samtidig (tråder). Kobles på etter bufre_callbacks, slik at treff i
+figurbufferen sendes uten å vente.
+"""
+import secrets
+import threading
+
+from flask import Response, g, request
+
+from ebm.figurbuffer import app_prefiks
+
+KAKE = 'ebm_okt'  # informasjonskapsel med en tilfeldig id for økta
+KAKE_LEVETID = 7 * 24 * 60 * 60  # sekunder
+
+
+class Koalesering:
+    """
+    Kø per (økt, app, output) der bare det nyeste ventende kallet slippes inn.
+    Teller kjørte og forkastede kall.
+    """
+
+    def __init__(self):
+        self.kjort = 0
+        self.forkastet = 0
+        self._koer = {}  # nøkkel -> [lås for kjøringen, nummeret til det nyeste kallet, antall kall]
+        self._laas = threading.Lock()
+
+    def slipp_inn(self, nokkel):
+        """
+        Venter til ingen andre kall med samme nøkkel kjører. Gir True hvis kallet skal
+        kjøres (og ferdig(nokkel) må kalles etterpå), og False hvis et nyere kall har
+        kommet i mellomtiden.
+        """
+        with self._laas:
+            ko = self._koer.get(nokkel)
+            if ko is None:
+                ko = self._koer[nokkel] = [threading.Lock(), 0, 0]
+            ko[1] += 1
+            ko[2] += 1
+            nummer = ko[1]
+
+        ko[0].acquire()
+        with self._laas:
+            if ko[1] == nummer:
+                self.kjort += 1
+                return True
+            self.forkastet += 1
+        self.ferdig(nokkel)
+        return False
+
+    def ferdig(self, nokkel):
+        with self._laas:
+            ko = self._koer[nokkel]
+            ko[0].release()
+            ko[2] -= 1
+            if ko[2] == 0:
+                del self._koer[nokkel]
+
+    def statistikk(self):
+        with self._laas:
+            return {'kjort': self.kjort,
+                    'forkastet': self.forkastet,
+                    'venter': sum(ko[2] for ko in self._koer.values())}
+
+
+def koalesere_callbacks(server, koalesering):
+    """Kobler koalesering på alle callback-kall til Flask-serveren til en eller flere Dash-apper."""
+
+    @server.before_request
+    def _vent_paa_tur():
+        if request.method != 'POST' or not request.path.endswith('/_dash-update-component'):
+            return None
+        okt = request.cookies.get(KAKE)
+        innhold = request.get_json(silent=True)
+        if okt is None or innhold is None:
+            return None
+        nokkel = (okt, app_prefiks(), innhold.get('output'))
+        if not koalesering.slipp_inn(nokkel):
+            return Response(status=204)
+        g.koalesering_nokkel = nokkel
+        return None
+
+    @server.after_request
+    def _gi_okt(respons):
+        # bare på callback-svar og HTML-sider, ikke på statiske filer og komponentpakker,
+        # som kan bufres (og deles) med informasjonskapselen
+        if KAKE in request.cookies:
+            return respons
+        if request.path.endswith('/_dash-update-component') or respons.mimetype == 'text/html':
+            respons.set_cookie(KAKE, secrets.token_hex(16), max_age=KAKE_LEVETID, httponly=True, samesite='Lax')
+        return respons
+
+    @server.teardown_request
+    def _slipp_neste(_feil):
+        nokkel = g.pop('koalesering_nokkel', None)
+        if nokkel is not None:
+            koalesering.ferdig(nokkel)
+
+    return server
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Komprimering og hurtigbufferhoder for svarene fra Flask-serverne i app_wsgi.
+
+komprimere kobler Flask-Compress på en Flask-server. Svar med en teksttype (HTML,
+JSON, JavaScript, CSS) som er større enn MIN_BYTES komprimeres med Brotli eller
+gzip, etter hva nettleseren tar imot (Accept-Encoding). Strømmede svar, som fra
+ebm.api, sendes som før.
+
+Når innholdet bare avhenger av URL-en og Accept-Encoding (komponentpakkene til
+Dash, versjonerte filer i assets/ og callback-svar med en nøkkel i
+figurbufferen) huskes det komprimerte svaret i en Figurbuffer. Da komprimeres
+for eksempel plotly.js én gang per prosess, og ikke for hver ny besøkende.
+
+versjonerte_filer gir filer med versjonen i URL-en (Dash-pakker med
+fingeravtrykk, assets/...?m=<tid> og _favicon.ico?v=<versjon>) hodet
+Cache-Control: public, max-age=<ett år>, immutable, så nettleseren ikke spør
+etter dem igjen, heller ikke når siden lastes på nytt.
+
+Koble komprimere på før bufre_callbacks, slik at figurbufferen lagrer svaret
+før det komprimeres (after_request-funksjonene kjøres i motsatt rekkefølge).
+"""
+from flask import g, request
+from flask_compress import Compress
+
+MIN_BYTES = 1400  # mindre svar får plass i én TCP-pakke uansett
+ETT_AAR = 365 * 24 * 60 * 60  # samme max-age som Dash gir pakker med fingeravtrykk
+TYPER = ['text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json',
+         'image/svg+xml', 'image/x-icon']
+
+
+class _Buffer:
+    # En Figurbuffer med get og set, som Flask-Compress bruker (COMPRESS_CACHE_BACKEND).
+    # Svar uten nøkkel (None) huskes ikke.
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def get(self, nokkel):
+        return None if nokkel is None else self.buffer.hent(nokkel)
+
+    def set(self, nokkel, data):
+        if nokkel is not None:
+            self.buffer.lagre(nokkel, data)
+
+
+def _nokkel(foresporsel):
+    # Nøkkel for det komprimerte svaret, eller None hvis innholdet kan endre seg
+    figur = g.get('figurbuffer_nokkel')
+    if figur is not None:
+        grunnlag = 'figur ' + figur
+    elif ('/_dash-component-suites/' in foresporsel.path
+          or ('/assets/' in foresporsel.path and foresporsel.query_string)):
+        grunnlag = foresporsel.script_root + foresporsel.full_path
+    else:
+        return None
+    return grunnlag + ' ' + foresporsel.headers.get('Accept-Encoding', '')
+
+
+def komprimere(server, buffer):
+    """Komprimerer svarene fra Flask-serveren, og husker de komprimerte svarene i buffer."""
+    server.config.update(COMPRESS_ALGORITHM=['br', 'gzip'],
+                         COMPRESS_MIN_SIZE=MIN_BYTES,
+                         COMPRESS_MIMETYPES=TYPER,
+                         COMPRESS_CACHE_BACKEND=lambda: _Buffer(buffer),
+                         COMPRESS_CACHE_KEY=_nokkel)
+    Compress(server)
+    return server
+
+
+def versjonerte_filer(server):
+    """Lange hurtigbufferhoder for filer med versjonen i URL-en."""
+
+    @server.after_request
+    def _uforanderlig(respons):
+        if request.method != 'GET' or respons.status_code != 200:
+            return respons
+        sti = request.path
+        if '/_dash-component-suites/' in sti:
+            # Dash gir bare pakker med fingeravtrykk max-age
+            versjonert = respons.cache_control.max_age == ETT_AAR
+        else:
+            versjonert = (('/assets/' in sti and 'm' in request.args)
+                          or (sti.endswith('/_favicon.ico') and 'v' in request.args))
+        if versjonert:
+            respons.headers['Cache-Control'] = f'public, max-age={ETT_AAR}, immutable'
+            if respons.direct_passthrough:
+                # send_file strømmer filen, og strømmede svar komprimeres ikke. Filene
+                # i assets/ er små, så de leses inn her.
+                respons.direct_passthrough = False
+                respons.make_sequence()
+        return respons
+
+    return server
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Buffer for toboksmodellens respons på hvert enkelt strålingspådriv.
+
+Modellen er lineær i pådrivet, så responsen på en sum av pådriv er summen av
+responsene på hvert enkelt pådriv. Appene som lar brukeren hukke av pådriv
+(historical_IPCC6.csv) kan derfor svare med en sum over kolonner i stedet for
+å kjøre modellen på nytt for hver endring i sjekklisten.
+
+Bufferen er nøklet på fil, startår, lambda og gamma, og hver oppføring husker
+hvilken versjon (endringstid og størrelse) av fila den ble regnet ut fra, slik at
+den regnes ut på nytt hvis CSV-fila endres.
+"""
+import os.path
+from collections import OrderedDict
+
+import numpy as np
+
+from ebm.datasett import les
+from ebm.toboks import calculate_temp_anomalies_batch
+
+MAKS_OPPFORINGER = 128  # antall (fil, startår, lambda, gamma) som huskes
+
+_respons = OrderedDict()
+
+
+def _versjon(sti):
+    status = os.stat(sti)
+    return status.st_mtime_ns, status.st_size
+
+
+def forvarm_respons(sti, parametre, fra_aar=None):
+    """
+    Regner ut og bufrer responsen på hver kolonne i sti for alle (lambda_sum, gamma)
+    i parametre som ikke allerede ligger i bufferen, med ett kall til modellen.
+    """
+    sti = os.path.abspath(sti)
+    versjon = _versjon(sti)
+    df = les(sti).loc[fra_aar:]
+
+    mangler = []
+    for lambda_sum, gamma in parametre:
+        nokkel = (sti, fra_aar, float(lambda_sum), float(gamma))
+        treff = _respons.get(nokkel)
+        if treff is not None and treff[0] == versjon:
+            _respons.move_to_end(nokkel)
+        elif nokkel not in mangler:
+            mangler.append(nokkel)
+
+    if mangler:
+        n_kol = len(df.columns)
+        lambdaer = np.repeat([nokkel[2] for nokkel in mangler], n_kol)
+        gammaer = np.repeat([nokkel[3] for nokkel in mangler], n_kol)
+        Ts, To = calculate_temp_anomalies_batch(np.tile(df.to_numpy().T, (len(mangler), 1)), lambdaer, gammaer)
+        for i, nokkel in enumerate(mangler):
+            respons = {'aar': df.index,
+                       'kolonner': list(df.columns),
+                       'Ts': Ts[i * n_kol:(i + 1) * n_kol],
+                       'To': To[i * n_kol:(i + 1) * n_kol]}
+            _respons[nokkel] = (versjon, respons)
+
+    while len(_respons) > MAKS_OPPFORINGER:
+        _respons.popitem(last=False)
+
+
+def er_bufret(sti, lambda_sum, gamma, fra_aar=None):
+    """Om responsen for (lambda_sum, gamma) allerede ligger i bufferen."""
+    sti = os.path.abspath(sti)
+    treff = _respons.get((sti, fra_aar, float(lambda_sum), float(gamma)))
+    return treff is not None and treff[0] == _versjon(sti)
+
+
+def kolonnerespons(sti, lambda_sum, gamma, fra_aar=None):
+    """
+    Responsen på hver kolonne i pådrivsfila sti, fra og med fra_aar.
+
+    Returnerer en ordbok med årstallene ('aar'), kolonnenavnene ('kolonner') og
+    temperaturanomaliene i overflaten ('Ts') og dyphavet ('To') med form (kolonner, år).
+    """
+    sti = os.path.abspath(sti)
+    nokkel = (sti, fra_aar, float(lambda_sum), float(gamma))
+    treff = _respons.get(nokkel)
+    if treff is None or treff[0] != _versjon(sti):
+        forvarm_respons(sti, [(lambda_sum, gamma)], fra_aar)
+        treff = _respons[nokkel]
+    _respons.move_to_end(nokkel)
+    return treff[1]
+
+
+def sum_respons(sti, kolonner, lambda_sum, gamma, fra_aar=None):
+    """
+    Ts og To for summen av pådrivene i kolonner, som calculate_temp_anomalies ville
+    gitt for df[kolonner].sum(axis=1) (innenfor avrundingsfeil).
+    """
+    respons = kolonnerespons(sti, lambda_sum, gamma, fra_aar)
+    valgt = [respons['kolonner'].index(kolonne) for kolonne in kolonner]
+    return respons['Ts'][valgt].sum(axis=0), respons['To'][valgt].sum(axis=0)
+
+
+def responstabell(paadriv, lambdaer, gammaer):
+    """
+    Responsen på hver kolonne i paadriv (DataFrame med årstall som indeks) for alle
+    kombinasjoner av lambdaer og gammaer, regnet ut med ett kall til modellen.
+
+    Returnerer Ts og To med form (kolonner, gamma, lambda, år).
+    """
+    n_kol, n_gamma, n_lambda = len(paadriv.columns), len(gammaer), len(lambdaer)
+    Ts, To = calculate_temp_anomalies_batch(np.repeat(paadriv.to_numpy().T, n_gamma * n_lambda, axis=0),
+                                            np.tile(lambdaer, n_kol * n_gamma),
+                                            np.tile(np.repeat(gammaer, n_lambda), n_kol))
+    form = (n_kol, n_gamma, n_lambda, len(paadriv.index))
+    return Ts.reshape(form), To.reshape(form)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Forhåndsberegnet rutenett av toboksmodellens respons over (lambda_sum, gamma).
+
+I toboks_fokus_tilbakekobling endrer elevene summen av tilbakekoblingene og gamma
+fritt. I stedet for å kjøre modellen for hver ny kombinasjon regnes responsen på
+hver kolonne i pådrivsfila (og på summen av dem, 'total') ut én gang for alle
+punktene i LAMBDAER x GAMMAER, og lagres som float32. Verdier mellom punktene
+interpoleres bilineært.
+
+For hver celle i rutenettet estimeres interpolasjonsfeilen ved å sammenligne med
+modellen i midten av cellen. sum_respons bruker rutenettet bare når det estimerte
+avviket fra modellen er mindre enn TOLERANSE. Utenfor rutenettet, eller når
+feilen blir for stor, brukes den eksakte løseren (ebm.respons.sum_respons).
+
+Rutenettet lagres i BUFFER (se ebm.datasett) som .npy-filer som leses med
+np.load(mmap_mode='r'), slik at alle prosessene på maskinen deler det.
+"""
+import hashlib
+import json
+import os
+import os.path
+
+import numpy as np
+
+from ebm import respons
+from ebm.datasett import BUFFER, les, midlertidig_sti, sjekksum
+
+NETT_VERSJON = 1  # økes når rutenettet regnes ut på en annen måte
+LAMBDAER = np.linspace(-5.0, -0.3, 48)  # W m-2 K-1, steg 0.1
+GAMMAER = np.linspace(-2.0, 0.0, 21)  # W m-2 K-1, steg 0.1
+TOLERANSE = 0.01  # største tillatte estimerte avvik fra modellen [K]
+
+_nett = {}  # absolutt sti -> (endringstid, størrelse) for fila og rutenettet
+statistikk = {'nett': 0, 'eksakt': 0}  # antall kall til sum_respons som brukte hver vei
+
+
+def _lag_nett(sti):
+    paadriv = les(sti)
+    paadriv['total'] = paadriv.sum(axis=1)
+    Ts, To = respons.responstabell(paadriv, LAMBDAER, GAMMAER)
+    nett = {'aar': paadriv.index.to_numpy(),
+            'kolonner': list(paadriv.columns),
+            'Ts': Ts.astype(np.float32),
+            'To': To.astype(np.float32)}
+
+    # Modellen i midten av hver celle mot interpolasjonen fra de fire hjørnene
+    midt_Ts, midt_To = respons.responstabell(paadriv, (LAMBDAER[1:] + LAMBDAER[:-1]) / 2,
+                                             (GAMMAER[1:] + GAMMAER[:-1]) / 2)
+    feil = np.zeros(midt_Ts.shape[:3])
+    for navn, midt in (('Ts', midt_Ts), ('To', midt_To)):
+        hjorner = nett[navn].astype(float)
+        interpolert = (hjorner[:, :-1, :-1] + hjorner[:, :-1, 1:] + hjorner[:, 1:, :-1] + hjorner[:, 1:, 1:]) / 4
+        feil = np.maximum(feil, np.nanmax(np.abs(interpolert - midt), axis=3, initial=0))
+    nett['feil'] = feil.astype(np.float32)  # (kolonner, gamma-celler, lambda-celler)
+    return nett
+
+
+def _les_nett(prefiks):
+    try:
+        with open(prefiks + '.json', encoding='utf-8') as fil:
+            meta = json.load(fil)
+        nett = {'aar': np.asarray(meta['aar']), 'kolonner': meta['kolonner']}
+        for navn in ('Ts', 'To', 'feil'):
+            nett[navn] = np.load(f'{prefiks}.{navn}.npy', mmap_mode='r')
+        return nett
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _skriv_nett(prefiks, nett):
+    # Samme fremgangsmåte som i ebm.datasett: midlertidige navn, og .json sist
+    mappe, navn = os.path.split(prefiks)
+    try:
+        os.makedirs(mappe, exist_ok=True)
+        for del_ in ('Ts', 'To', 'feil'):
+            midlertidig = midlertidig_sti(f'{prefiks}.{del_}.npy')
+            with open(midlertidig, 'wb') as fil:
+                np.save(fil, nett[del_])
+            os.replace(midlertidig, f'{prefiks}.{del_}.npy')
+        midlertidig = midlertidig_sti(prefiks + '.json')
+        with open(midlertidig, 'w', encoding='utf-8') as fil:
+            json.dump({'aar': nett['aar'].tolist(), 'kolonner': nett['kolonner']}, fil, ensure_ascii=False)
+        os.replace(midlertidig, prefiks + '.json')
+
+        kilde = navn.rsplit('-', 1)[0] + '-'
+        for gammel in os.listdir(mappe):
+            if gammel.startswith(kilde) and not gammel.startswith(navn):
+                os.remove(os.path.join(mappe, gammel))
+    except OSError:
+        pass
+
+
+def responsnett(sti):
+    """
+    Rutenettet for pådrivsfila sti: årstallene ('aar'), kolonnenavnene ('kolonner',
+    med 'total' til slutt), responsen i overflaten ('Ts') og dyphavet ('To') med
+    form (kolonner, gamma, lambda, år) som float32, og estimert interpolasjonsfeil
+    per celle ('feil') med form (kolonner, gamma - 1, lambda - 1).
+    """
+    sti = os.path.abspath(sti)
+    status = os.stat(sti)
+    versjon = status.st_mtime_ns, status.st_size
+    lest = _nett.get(sti)
+    if lest is not None and lest[0] == versjon:
+        return lest[1]
+
+    nett = None
+    prefiks = None
+    if BUFFER:
+        parametre = json.dumps([NETT_VERSJON, LAMBDAER.tolist(), GAMMAER.tolist(), sjekksum(sti)])
+        prefiks = os.path.join(BUFFER, f'responsnett-{os.path.basename(sti)}-'
+                                       f'{hashlib.sha256(parametre.encode("utf-8")).hexdigest()[:16]}')
+        nett = _les_nett(prefiks)
+    if nett is None:
+        nett = _lag_nett(sti)
+        if prefiks is not None:
+            _skriv_nett(prefiks, nett)
+        for navn in ('Ts', 'To', 'feil'):
+            nett[navn].flags.writeable = False
+
+    _nett[sti] = (versjon, nett)
+    return nett
+
+
+def _celle(verdier, verdi):
+    # (indeks til cella, andel av veien til neste punkt), eller None utenfor rutenettet
+    if not verdier[0] <= verdi <= verdier[-1]:
+        return None
+    i = min(int((verdi - verdier[0]) / (verdier[1] - verdier[0])), len(verdier) - 2)
+    return i, (verdi - verdier[i]) / (verdier[i + 1] - verdier[i])
+
+
+def interpoler(sti, kolonner, lambda_sum, gamma):
+    """
+    Ts og To for summen av pådrivene i kolonner, interpolert i rutenettet, og
+    estimert største avvik fra modellen [K]. Gir None utenfor rutenettet.
+    """
+    nett = responsnett(sti)
+    celle_l, celle_g = _celle(LAMBDAER, lambda_sum), _celle(GAMMAER, gamma)
+    if celle_l is None or celle_g is None:
+        return None
+    (i, fl), (j, fg) = celle_l, celle_g
+
+    if set(kolonner) == set(nett['kolonner'][:-1]):
+        valgt = [len(nett['kolonner']) - 1]  # alle pådrivene: 'total'
+    else:
+        valgt = [nett['kolonner'].index(kolonne) for kolonne in kolonner]
+    vekter = np.array([[(1 - fg) * (1 - fl), (1 - fg) * fl], [fg * (1 - fl), fg * fl]])
+
+    resultat = []
+    for navn in ('Ts', 'To'):
+        hjorner = nett[navn][valgt, j:j + 2, i:i + 2].astype(float).sum(axis=0)  # (2, 2, år)
+        resultat.append(np.einsum('ab,abt->t', vekter, hjorner))
+    return resultat[0], resultat[1], float(nett['feil'][valgt, j, i].sum())
+
+
+def sum_respons(sti, kolonner, lambda_sum, gamma):
+    """
+    Som ebm.respons.sum_respons, men fra rutenettet når det estimerte avviket fra
+    modellen er mindre enn TOLERANSE. Responser som allerede ligger i bufferen til
+    ebm.respons brukes som de er, og utenfor rutenettet kjøres modellen.
+    """
+    if not respons.er_bufret(sti, lambda_sum, gamma):
+        interpolert = interpoler(sti, kolonner, lambda_sum, gamma)
+        if interpolert is not None and interpolert[2] < TOLERANSE:
+            statistikk['nett'] += 1
+            return interpolert[0], interpolert[1]
+    statistikk['eksakt'] += 1
+    return respons.sum_respons(sti, kolonner, lambda_sum, gamma)
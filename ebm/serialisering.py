@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rask og kompakt JSON for svarene fra Dash, med bytes og tid per callback.
+
+Dash 2.5.1 gjør callback-svar og layout om til JSON med to_json i dash._callback
+og dash.dash, som bruker PlotlyJSONEncoder. Der prøves en lang rekke metoder for
+hver numpy-array og figur (to_plotly_json, sage, numpy, pandas, ...), og et svar
+med NaN kodes, leses og kodes på nytt. Alle tallene sendes med full presisjon,
+også når figuren bare viser to eller tre gjeldende siffer.
+
+serialisere_callbacks bytter ut to_json med en Serialisering, som bruker
+ebm.figurer.til_json: én gjennomgang, og med siffer avrundes
+tallene i kurvene (x, y, z, ...) til siffer gjeldende siffer. Svar med typer
+til_json ikke kjenner, sendes med Plotly som før. Serialisering teller kall,
+bytes og tid for hver app og callback (output), og for layouten.
+
+Plotly kan også sende arrays som base64 (typed arrays, {"dtype", "bdata"}), men
+plotly.js 2.12 i dash 2.5.1 kan ikke lese dem, så det brukes ikke her.
+"""
+import threading
+import time
+
+from flask import has_request_context, request
+
+from ebm.figurer import til_json
+
+
+class Serialisering:
+    """
+    Gjør verdier om til JSON med til_json(verdi, siffer), og Plotlys to_json (reserve)
+    for typer til_json ikke kjenner. Teller per app og callback.
+    """
+
+    def __init__(self, siffer=None, reserve=None):
+        self.siffer = siffer
+        self.reserve = reserve
+        self._tellere = {}  # (app, callback) -> [kall, bytes, sekunder, med reserve]
+        self._laas = threading.Lock()
+
+    def __call__(self, verdi):
+        start = time.perf_counter()
+        try:
+            tekst = til_json(verdi, self.siffer)
+            reserve = 0
+        except TypeError:
+            if self.reserve is None:
+                raise
+            tekst = self.reserve(verdi)
+            reserve = 1
+        sekunder = time.perf_counter() - start
+        nokkel = _hva()
+        with self._laas:
+            teller = self._tellere.setdefault(nokkel, [0, 0, 0.0, 0])
+            teller[0] += 1
+            teller[1] += len(tekst)
+            teller[2] += sekunder
+            teller[3] += reserve
+        return tekst
+
+    def statistikk(self):
+        with self._laas:
+            return {'siffer': self.siffer,
+                    'callbacker': {f'{app} {callback}': {'kall': kall,
+                                                         'bytes': bytes_ // kall,
+                                                         'ms': sekunder / kall * 1e3,
+                                                         'med_plotly': reserve}
+                                   for (app, callback), (kall, bytes_, sekunder, reserve)
+                                   in sorted(self._tellere.items())}}
+
+
+def _hva():
+    # (app, callback) for forespørselen som serialiseres: output for callbacker,
+    # ellers siste del av stien (_dash-layout, _dash-dependencies, ...)
+    if not has_request_context():
+        return ('', '')
+    app, _, del_ = (request.script_root + request.path).rpartition('/')
+    if del_ == '_dash-update-component':
+        innhold = request.get_json(silent=True) or {}
+        return (app, str(innhold.get('output')))
+    return (app, del_ or 'index')
+
+
+def serialisere_callbacks(serialisering):
+    """
+    Lar serialisering gjøre callback-svarene og layouten til alle Dash-appene i
+    prosessen om til JSON. Plotlys to_json brukes som reserve.
+
+    to_json byttes ut i dash._callback og dash.dash, som ikke er en del av Dashs
+    API. Finnes ikke to_json der, eller er den ikke lenger dash._utils.to_json
+    (en annen Dash-versjon, eller allerede byttet ut), gir det RuntimeError i
+    stedet for at svarene stille sendes med Plotly.
+    """
+    import dash
+    import dash._callback
+    import dash._utils
+    import dash.dash
+
+    plotly_json = getattr(dash._utils, 'to_json', None)
+    for modul in (dash._callback, dash.dash):
+        if plotly_json is None or getattr(modul, 'to_json', None) is not plotly_json:
+            raise RuntimeError(f'{modul.__name__}.to_json er ikke dash._utils.to_json i dash {dash.__version__}, '
+                               'så ebm.serialisering kan ikke brukes (skrevet for dash 2.5.1)')
+    if serialisering.reserve is None:
+        serialisering.reserve = plotly_json
+    dash._callback.to_json = serialisering
+    dash.dash.to_json = serialisering
+    return serialisering
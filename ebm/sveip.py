@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kjører toboksmodellen for store parametersveip fra kommandolinjen.
+
+Sveipet er alle kombinasjoner av pådrivsserier, lambda_sum og gamma. Det deles i
+bolker på --bolk medlemmer (med CSV som standard så mange at hver bolk har
+CSV_TALL temperaturer), som kjøres med calculate_temp_anomalies_batch i en
+gruppe prosesser, og hver bolk skrives ut så snart den er ferdig (i rekkefølge).
+Bare noen få bolker ligger i minnet om gangen, så sveipet kan ha millioner av
+medlemmer.
+
+Eksempler, fra rotmappen:
+
+    # alle historiske pådriv samlet, 50 x 20 parametre, som CSV på stdout
+    python -m ebm.sveip --lambda=-3:-0.5:50 --gamma=-1.5:0:20 > sveip.csv
+
+    # hver utviklingsbane for seg og to utvalg av historiske pådriv, som .npy-bolker
+    python -m ebm.sveip --paadriv futureForcing_IPCC6.csv --kolonner 'SSP*' \\
+        --lambda=-3:-0.5:1000 --gamma=-1.5:0:100 --nullnivaa 1986:2005 --format npy --ut sveip/
+    python -m ebm.sveip --kolonner drivhusgasser,drivhusgasser+aerosoler --lambda=-1.3 --gamma=-0.69,0
+
+    # pådriv fra stdin (CSV med årstall i første kolonne)
+    cat mitt_paadriv.csv | python -m ebm.sveip --paadriv - --lambda=-2:-1:11 --gamma=-0.69
+
+Negative verdier må skrives med likhetstegn (--lambda=-3:-0.5:50), ellers tar
+argparse dem for et nytt valg.
+
+CSV har én linje per medlem: paadriv,lambda_sum,gamma,Ts_<år>...,To_<år>...
+Med --format npy skrives Ts-NNNNN.npy, To-NNNNN.npy og parametre-NNNNN.npy
+(pådrivsindeks, lambda_sum, gamma) for hver bolk i mappa --ut, og sveip.json
+beskriver pådrivsseriene, årene og antall bolker.
+"""
+import argparse
+import collections
+import fnmatch
+import json
+import os
+import os.path
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ebm.datasett import les
+from ebm.toboks import calculate_temp_anomalies_batch
+
+BOLK = 4096  # medlemmer per kall til modellen
+# Temperaturer (Ts og To) per bolk med CSV, omtrent 10 MB tekst. Hver bolk sendes som
+# tekst fra arbeidsprosessen, og opptil to per prosess er underveis, så med CSV velges
+# antall medlemmer per bolk etter antall år i stedet for BOLK.
+CSV_TALL = 1 << 19
+
+
+def verdier(tekst):
+    """'fra:til:antall' (som np.linspace) eller en kommaseparert liste med tall."""
+    if ':' in tekst:
+        fra, til, antall = tekst.split(':')
+        return np.linspace(float(fra), float(til), int(antall))
+    return np.array([float(verdi) for verdi in tekst.split(',')])
+
+
+def les_paadriv(kilde):
+    """Pådrivstabellen: '-' for stdin, en sti, eller navnet på en fil i data/."""
+    if kilde == '-':
+        return pd.read_csv(sys.stdin, index_col=0, sep=None, engine='python')
+    return les(os.path.abspath(kilde) if os.path.exists(kilde) else kilde)
+
+
+def paadrivsserier(df, kolonner):
+    """
+    Navn og pådriv (serier, år) for hver serie i kolonner: kommaseparert, der hver
+    serie er en kolonne, et mønster ('SSP*', én serie per kolonne som passer) eller
+    en sum av kolonner ('drivhusgasser+aerosoler'). Uten kolonner velges som i
+    ebm.api: 'total' hvis den finnes, én serie per utviklingsbane ('SSP*') for
+    framtidig pådriv, og ellers summen av alle kolonnene (historisk pådriv).
+    """
+    if not kolonner:
+        if 'total' in df.columns:
+            kolonner = 'total'
+        elif any(str(kolonne).startswith('SSP') for kolonne in df.columns):
+            kolonner = 'SSP*'
+        else:
+            return ['+'.join(map(str, df.columns))], df.to_numpy(dtype=float).sum(axis=1)[np.newaxis]
+    navn, serier = [], []
+    for serie in kolonner.split(','):
+        if any(tegn in serie for tegn in '*?['):
+            treff = fnmatch.filter(map(str, df.columns), serie)
+            if not treff:
+                raise SystemExit(f'ingen kolonner passer til {serie!r}')
+            navn += treff
+            serier += [df[kolonne].to_numpy(dtype=float) for kolonne in treff]
+            continue
+        deler = serie.split('+')
+        ukjente = [kolonne for kolonne in deler if kolonne not in df.columns]
+        if ukjente:
+            raise SystemExit(f'ukjente kolonner: {", ".join(ukjente)}')
+        navn.append(serie)
+        serier.append(df[deler].to_numpy(dtype=float).sum(axis=1))
+    return navn, np.array(serier)
+
+
+class Sveip:
+    """Alle kombinasjoner av pådrivsserier, lambdaer og gammaer, nummerert fra 0."""
+
+    def __init__(self, aar, navn, serier, lambdaer, gammaer, nullnivaa=None, bolk=BOLK, float32=False):
+        self.aar = np.asarray(aar)
+        self.navn = navn
+        self.serier = serier
+        self.lambdaer = lambdaer
+        self.gammaer = gammaer
+        self.bolk = bolk
+        self.dtype = np.float32 if float32 else np.float64
+        self.nullnivaa = None
+        if nullnivaa is not None:
+            self.nullnivaa = (self.aar >= nullnivaa[0]) & (self.aar <= nullnivaa[1])
+            if not self.nullnivaa.any():
+                raise SystemExit('nullnivået er utenfor årene i pådriv')
+        self.antall = len(serier) * len(lambdaer) * len(gammaer)
+        self.bolker = -(-self.antall // bolk)
+
+    def parametre(self, nummer):
+        """(pådrivsindeks, lambda_sum, gamma) for medlemmene i bolk nummer."""
+        medlemmer = np.arange(nummer * self.bolk, min((nummer + 1) * self.bolk, self.antall))
+        p, l, g = np.unravel_index(medlemmer, (len(self.serier), len(self.lambdaer), len(self.gammaer)))
+        return p, self.lambdaer[l], self.gammaer[g]
+
+    def kjor(self, nummer):
+        """Parametrene og (Ts, To) med form (medlemmer, år) for bolk nummer."""
+        p, lambda_sum, gamma = self.parametre(nummer)
+        Ts, To = calculate_temp_anomalies_batch(self.serier[p], lambda_sum, gamma)
+        if self.nullnivaa is not None:
+            Ts -= Ts[:, self.nullnivaa].mean(axis=1, keepdims=True)
+            To -= To[:, self.nullnivaa].mean(axis=1, keepdims=True)
+        return (p, lambda_sum, gamma), Ts.astype(self.dtype, copy=False), To.astype(self.dtype, copy=False)
+
+    def csv_hode(self):
+        return ','.join(['paadriv', 'lambda_sum', 'gamma'] + [f'Ts_{aar}' for aar in self.aar]
+                        + [f'To_{aar}' for aar in self.aar]) + '\n'
+
+    def csv(self, nummer):
+        (p, lambda_sum, gamma), Ts, To = self.kjor(nummer)
+        navn = [self.navn[i] for i in p]
+        return ''.join(f'{n},{l!r},{g!r},' + ','.join(map(repr, ts + to)) + '\n'
+                       for n, l, g, ts, to in zip(navn, lambda_sum.tolist(), gamma.tolist(),
+                                                  Ts.tolist(), To.tolist()))
+
+    def npy(self, nummer, mappe):
+        (p, lambda_sum, gamma), Ts, To = self.kjor(nummer)
+        for navn, array in (('Ts', Ts), ('To', To), ('parametre', np.column_stack([p, lambda_sum, gamma]))):
+            np.save(os.path.join(mappe, f'{navn}-{nummer:05d}.npy'), array)
+        return len(p)
+
+
+# Sveipet i hver arbeidsprosess, satt én gang av _start i stedet for å sendes med hver bolk
+_sveip = None
+
+
+def _start(sveip):
+    global _sveip
+    _sveip = sveip
+
+
+def _csv(nummer):
+    return _sveip.csv(nummer)
+
+
+def _npy(nummer, mappe):
+    return _sveip.npy(nummer, mappe)
+
+
+def i_rekkefolge(sveip, funksjon, *argumenter, prosesser=None):
+    """
+    funksjon(nummer, *argumenter) for hver bolk, fordelt på prosesser, med resultatene
+    i rekkefølge. Høyst to bolker per prosess er underveis om gangen.
+    """
+    _start(sveip)
+    if prosesser == 1:
+        for nummer in range(sveip.bolker):
+            yield funksjon(nummer, *argumenter)
+        return
+    prosesser = prosesser or os.cpu_count() or 1
+    with ProcessPoolExecutor(prosesser, initializer=_start, initargs=(sveip,)) as pool:
+        underveis = collections.deque()
+        neste = 0
+        grense = 2 * prosesser
+        while underveis or neste < sveip.bolker:
+            while neste < sveip.bolker and len(underveis) < grense:
+                underveis.append(pool.submit(funksjon, neste, *argumenter))
+                neste += 1
+            yield underveis.popleft().result()
+
+
+def main(argumenter=None):
+    parser = argparse.ArgumentParser(prog='python -m ebm.sveip',
+                                     description='Parametersveip med toboksmodellen.')
+    parser.add_argument('--paadriv', default='historical_IPCC6.csv',
+                        help="pådrivsfil (sti eller navn i data/), eller '-' for CSV på stdin")
+    parser.add_argument('--kolonner', help="pådrivsserier: 'a,b+c,SSP*' (standard: 'total', 'SSP*' for framtidig "
+                             "pådriv, ellers summen av alle kolonnene)")
+    parser.add_argument('--lambda', dest='lambdaer', required=True, type=verdier,
+                        help="lambda_sum: 'fra:til:antall' eller 'a,b,c'")
+    parser.add_argument('--gamma', dest='gammaer', required=True, type=verdier,
+                        help="gamma: 'fra:til:antall' eller 'a,b,c'")
+    parser.add_argument('--nullnivaa', help="temperaturene relativt til årene 'fra:til' (begge med)")
+    parser.add_argument('--format', choices=['csv', 'npy'], default='csv')
+    parser.add_argument('--ut', help='CSV-fil (standard: stdout), eller mappe for npy')
+    parser.add_argument('--bolk', type=int, default=None,
+                        help=f'medlemmer per bolk (standard: {BOLK} for npy, {CSV_TALL} temperaturer for CSV)')
+    parser.add_argument('--prosesser', type=int, default=None, help='antall prosesser (standard: alle kjernene)')
+    parser.add_argument('--float32', action='store_true', help='lagre temperaturene som float32 (npy)')
+    valg = parser.parse_args(argumenter)
+
+    df = les_paadriv(valg.paadriv)
+    navn, serier = paadrivsserier(df, valg.kolonner)
+    nullnivaa = None if valg.nullnivaa is None else [int(aar) for aar in valg.nullnivaa.split(':')]
+    bolk = valg.bolk
+    if bolk is None:
+        bolk = max(1, CSV_TALL // (2 * len(df.index))) if valg.format == 'csv' else BOLK
+    sveip = Sveip(df.index, navn, serier, valg.lambdaer, valg.gammaer, nullnivaa, bolk, valg.float32)
+    print(f'{sveip.antall} medlemmer i {sveip.bolker} bolker', file=sys.stderr)
+
+    if valg.format == 'csv':
+        ut = sys.stdout if valg.ut is None else open(valg.ut, 'w', encoding='utf-8', newline='')
+        try:
+            ut.write(sveip.csv_hode())
+            for tekst in i_rekkefolge(sveip, _csv, prosesser=valg.prosesser):
+                ut.write(tekst)
+                ut.flush()
+        finally:
+            if ut is not sys.stdout:
+                ut.close()
+        return
+
+    if valg.ut is None:
+        parser.error('--format npy krever --ut MAPPE')
+    os.makedirs(valg.ut, exist_ok=True)
+    with open(os.path.join(valg.ut, 'sveip.json'), 'w', encoding='utf-8') as fil:
+        json.dump({'paadriv': navn, 'aar': sveip.aar.tolist(), 'medlemmer': sveip.antall, 'bolker': sveip.bolker,
+                   'bolk': sveip.bolk, 'nullnivaa': nullnivaa}, fil, ensure_ascii=False)
+    ferdig = 0
+    for antall in i_rekkefolge(sveip, _npy, valg.ut, prosesser=valg.prosesser):
+        ferdig += antall
+        print(f'\r{ferdig} av {sveip.antall}', end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Toboksmodellen: et blandingslag (overflate) og et dyphav.
+Strålingspådrivet, sammen med tilbakekoblingseffekter og
+varmeutveksling med dyphavet brukes til å beregne hvordan temperaturanomaliene
+(temperaturendringer fra start verdi) utvikler seg.
+
+Alle toboks-appene i modules/ og code/toboks.py bruker denne løseren.
+"""
+import numpy as np
+
+H_MIX = 100  # tykkelse av blandingslaget [m]
+H_DEEP = 3700 - H_MIX  # gjennomsnitts tykkelse av dyphavet [m]
+RHO = 1000  # vannets tetthet (kg m-3)
+CPO = 4200  # spesifikk varmekapasitet for vann(J kg-1 K-1)
+f_o = 0.7  # andel av jordens overflate dekket av vann
+
+Dt = 365 * 24 * 60 * 60  # steglenge i modellen - 1 år i sekund
+
+# effektiv varmekapasitet for atmosfære-hav-systemet [J m-2 K-1]
+# Hvor mye energi skal til for å heve en vannsøyle med grunnflate en kvadratmeter og høyde
+# tilsvarende havdybden en grad.
+CEFF_M = f_o * H_MIX * CPO * RHO
+CEFF_D = f_o * H_DEEP * CPO * RHO
+
+
+def calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma, sensitiviteter=False):
+    """
+    Overflate- og dyphavstemperaturen (Ts, To) for pådrivet radiative_forcing (år,).
+
+    Med sensitiviteter=True returneres (Ts, To, sensitiviteter), der sensitiviteter
+    har de deriverte av Ts og To, regnet ut i samme løkke: 'lambda_sum' og 'gamma'
+    er (dTs, dTo) med form (år,), og 'paadriv' er (dTs, dTo) med form (kolonner, år)
+    med hensyn på en faktor hvert pådriv ganges med (ved faktor 1). radiative_forcing
+    kan da også ha form (år, kolonner), som df[kolonner].to_numpy(), og modellen
+    drives av summen av kolonnene.
+    """
+    if sensitiviteter:
+        return _sensitiviteter(radiative_forcing, lambda_sum, gamma)
+    radiative_forcing = np.asarray(radiative_forcing, dtype=float)
+
+    # Temperaturseriene lages med full lengde med en gang og starter på 0 første år.
+    # Som før gir et tomt pådriv serier med bare startåret, [0].
+    Ts = np.zeros(max(len(radiative_forcing), 1))
+    To = np.zeros(max(len(radiative_forcing), 1))
+
+    ts = 0.0
+    to = 0.0
+    for t in range(1, len(radiative_forcing)):
+        # --------------
+        # Temperatur tendenser (den deriverte) [K/s]
+        #     dTs/dt, dTo/dt
+        # --------------
+        dTs_dt = (radiative_forcing[t] + (lambda_sum * ts) + (gamma * (ts - to))) / CEFF_M
+        dTo_dt = -gamma * (ts - to) / CEFF_D
+
+        # ----------------------------------------------------------------------
+        # Antar konstant temperaturendring i løpet av et år, regner ut ny temperatur
+        # ved hjelp av Eulermetoden og oppdaterer temperaturarrayene
+        # ----------------------------------------------------------------------
+        ts = ts + dTs_dt * Dt
+        to = to + dTo_dt * Dt
+        Ts[t] = ts
+        To[t] = to
+    return Ts, To
+
+
+def _sensitiviteter(radiative_forcing, lambda_sum, gamma):
+    # Fremovermodus: de deriverte av Eulerskjemaet (ikke av differensiallikningene) følger
+    # samme rekursjon som temperaturene, med en ekstra kilde, og integreres i samme løkke.
+    # Løkken går over vanlige tall som i calculate_temp_anomalies, fordi numpy-kall på så
+    # små arrays koster mer enn selve regningen.
+    radiative_forcing = np.asarray(radiative_forcing, dtype=float)
+    kolonner = radiative_forcing.reshape(len(radiative_forcing), -1)
+    F = (kolonner.sum(axis=1) if radiative_forcing.ndim == 2 else radiative_forcing).tolist()
+    F_kol = kolonner.tolist()
+    n_aar, n_kol = kolonner.shape
+    a = Dt / CEFF_M
+    b = Dt / CEFF_D
+
+    Ts, To = np.zeros(n_aar), np.zeros(n_aar)
+    Ts_l, To_l = np.zeros(n_aar), np.zeros(n_aar)  # d/d lambda_sum
+    Ts_g, To_g = np.zeros(n_aar), np.zeros(n_aar)  # d/d gamma
+    Ts_k, To_k = np.zeros((n_kol, n_aar)), np.zeros((n_kol, n_aar))  # d/d skalering av hver kolonne
+
+    ts = to = 0.0
+    ls = lo = gs = go = 0.0
+    ks = [0.0] * n_kol
+    ko = [0.0] * n_kol
+    for t in range(1, n_aar):
+        forskjell = ts - to
+        dTs_dt = (F[t] + (lambda_sum * ts) + (gamma * forskjell)) / CEFF_M
+        dTo_dt = -gamma * forskjell / CEFF_D
+
+        # d(lambda_sum * ts)/d lambda_sum = ts og d(gamma * (ts - to))/d gamma = ts - to
+        d = ls - lo
+        ls, lo = ls + (ts + lambda_sum * ls + gamma * d) * a, lo - gamma * d * b
+        d = gs - go
+        gs, go = gs + (forskjell + lambda_sum * gs + gamma * d) * a, go - (forskjell + gamma * d) * b
+        rad = F_kol[t]
+        for k in range(n_kol):
+            d = ks[k] - ko[k]
+            ks[k], ko[k] = ks[k] + (rad[k] + lambda_sum * ks[k] + gamma * d) * a, ko[k] - gamma * d * b
+
+        ts = ts + dTs_dt * Dt
+        to = to + dTo_dt * Dt
+        Ts[t], To[t] = ts, to
+        Ts_l[t], To_l[t] = ls, lo
+        Ts_g[t], To_g[t] = gs, go
+        Ts_k[:, t], To_k[:, t] = ks, ko
+
+    return Ts, To, {'lambda_sum': (Ts_l, To_l), 'gamma': (Ts_g, To_g), 'paadriv': (Ts_k, To_k)}
+
+
+def stabil(lambda_sum, gamma):
+    """
+    True hvis parametrene er fysiske (lambda_sum < 0 og gamma <= 0) og Eulerskjemaet
+    med ett års steg er stabilt: ingen av egenverdiene til A (se impulse_response) har
+    absoluttverdi over 1. Med gamma = 0 er dyphavet koblet fra, og den ene er 1.
+    Ellers vokser temperaturene uten grense, og blir til slutt uendelige eller NaN.
+    """
+    if not (lambda_sum < 0 and gamma <= 0):
+        return False
+    A = [[1 + Dt * (lambda_sum + gamma) / CEFF_M, -Dt * gamma / CEFF_M],
+         [-Dt * gamma / CEFF_D, 1 + Dt * gamma / CEFF_D]]
+    return bool(np.abs(np.linalg.eigvals(A)).max() <= 1)
+
+
+def calculate_temp_anomalies_batch(radiative_forcing, lambda_sum, gamma):
+    """
+    Kjører toboksmodellen for mange medlemmer samtidig.
+
+    radiative_forcing er enten én pådrivsserie (år,) som brukes for alle medlemmene,
+    eller en matrise (medlemmer, år). lambda_sum og gamma kan være tall eller
+    vektorer (medlemmer,). Returnerer Ts og To med form (medlemmer, år), og hver rad
+    er lik det calculate_temp_anomalies gir for samme pådriv og parametre.
+    """
+    radiative_forcing = np.atleast_2d(np.asarray(radiative_forcing, dtype=float))
+    lambda_sum = np.asarray(lambda_sum, dtype=float)
+    gamma = np.asarray(gamma, dtype=float)
+
+    n_aar = radiative_forcing.shape[1]
+    n_medlem = np.broadcast_shapes(radiative_forcing.shape[:1], lambda_sum.shape, gamma.shape)[0]
+
+    # Tiden ligger langs første akse under integrasjonen slik at hvert steg leser og
+    # skriver sammenhengende minne, og snus til (medlemmer, år) til slutt.
+    F = np.broadcast_to(radiative_forcing.T, (n_aar, n_medlem))
+    lambda_sum = np.broadcast_to(lambda_sum, (n_medlem,))
+    gamma = np.broadcast_to(gamma, (n_medlem,))
+
+    Ts = np.zeros((n_aar, n_medlem))
+    To = np.zeros((n_aar, n_medlem))
+
+    for t in range(1, n_aar):
+        ts = Ts[t - 1]
+        to = To[t - 1]
+        dTs_dt = (F[t] + (lambda_sum * ts) + (gamma * (ts - to))) / CEFF_M
+        dTo_dt = -gamma * (ts - to) / CEFF_D
+
+        Ts[t] = ts + dTs_dt * Dt
+        To[t] = to + dTo_dt * Dt
+    return np.ascontiguousarray(Ts.T), np.ascontiguousarray(To.T)
+
+
+def _fft_lengde(n):
+    # Minste 2^a * 3^b som er minst n. Slike lengder er raske for np.fft, og gir mindre
+    # nullutfylling enn å runde opp til nærmeste toerpotens.
+    beste = 1 << (n - 1).bit_length()
+    p3 = 3
+    while p3 < beste:
+        beste = min(beste, p3 << (-(-n // p3) - 1).bit_length())
+        p3 *= 3
+    return beste
+
+
+def impulse_response(lambda_sum, gamma, n_aar):
+    """
+    Responsen i overflate og dyphav, hver med form (medlemmer, år), på et pådriv
+    på 1 W/m2 i ett enkelt år.
+
+    Eulerskjemaet i calculate_temp_anomalies er et lineært system x[t] = A x[t-1] + g F[t]
+    med konstant 2x2-matrise A, så responsen etter j år er A^j g. Potensene regnes ved
+    dobling (A, A^2, A^4, ...) slik at det trengs omtrent log2(n_aar) steg i stedet
+    for en løkke over årene.
+    """
+    lambda_sum, gamma = np.broadcast_arrays(np.atleast_1d(np.asarray(lambda_sum, dtype=float)),
+                                            np.atleast_1d(np.asarray(gamma, dtype=float)))
+
+    # Elementene i A, som kolonnevektorer slik at de virker på alle år i h samtidig
+    a11 = (1 + Dt * (lambda_sum + gamma) / CEFF_M)[:, np.newaxis]
+    a12 = (-Dt * gamma / CEFF_M)[:, np.newaxis]
+    a21 = (-Dt * gamma / CEFF_D)[:, np.newaxis]
+    a22 = (1 + Dt * gamma / CEFF_D)[:, np.newaxis]
+
+    hs = np.zeros((len(lambda_sum), n_aar))
+    ho = np.zeros((len(lambda_sum), n_aar))
+    hs[:, 0] = Dt / CEFF_M
+    k = 1
+    while k < n_aar:
+        # år k..2k-1 er A^k ganger år 0..k-1
+        m = min(k, n_aar - k)
+        hs[:, k:k + m] = a11 * hs[:, :m] + a12 * ho[:, :m]
+        ho[:, k:k + m] = a21 * hs[:, :m] + a22 * ho[:, :m]
+        a11, a12, a21, a22 = (a11 * a11 + a12 * a21, a11 * a12 + a12 * a22,
+                              a21 * a11 + a22 * a21, a21 * a12 + a22 * a22)
+        k *= 2
+    return hs, ho
+
+
+def calculate_temp_anomalies_filter(radiative_forcing, lambda_sum, gamma):
+    """
+    Samme svar som calculate_temp_anomalies_batch (innenfor avrundingsfeil), men uten
+    løkke over årene: temperaturene er foldingen av pådrivet med impulsresponsen,
+    og foldingen gjøres med FFT.
+
+    Tar imot og returnerer arrays med samme form som calculate_temp_anomalies_batch.
+    """
+    radiative_forcing = np.atleast_2d(np.asarray(radiative_forcing, dtype=float))
+    n_aar = radiative_forcing.shape[1]
+    if n_aar == 0:
+        n_medlem = np.broadcast_shapes(radiative_forcing.shape[:1], np.shape(lambda_sum), np.shape(gamma))[0]
+        return np.zeros((n_medlem, 0)), np.zeros((n_medlem, 0))
+
+    hs, ho = impulse_response(lambda_sum, gamma, n_aar)
+
+    # Pådrivet det første året brukes ikke av Eulerskjemaet (temperaturen starter på 0).
+    # Manglende pådriv gir NaN i Ts fra og med det året i løkken, mens FFT-en ville spredd
+    # NaN til alle år, så de settes til 0 her og maskeres etterpå.
+    F = radiative_forcing.copy()
+    F[:, 0] = 0
+    mangler = np.logical_or.accumulate(np.isnan(F), axis=1)
+    F[mangler] = 0
+
+    n_fft = _fft_lengde(2 * n_aar - 1)
+    F_fft = np.fft.rfft(F, n_fft, axis=1)
+    Ts = np.fft.irfft(np.fft.rfft(hs, n_fft, axis=1) * F_fft, n_fft, axis=1)[:, :n_aar]
+    To = np.fft.irfft(np.fft.rfft(ho, n_fft, axis=1) * F_fft, n_fft, axis=1)[:, :n_aar]
+    if mangler.any():
+        # To året etter avhenger bare av temperaturene året før, så den blir NaN ett år senere
+        To[:, 1:][np.broadcast_to(mangler[:, :-1], To[:, 1:].shape)] = np.nan
+        Ts[np.broadcast_to(mangler, Ts.shape)] = np.nan
+    return Ts, To
@@ -10,16 +10,22 @@
 #bjarte.ursin@vlfk.no
 #############################
 
-import pandas as pd
 import plotly.graph_objects as go
-import os.path
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
-Albedo_med = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data','Albedo_med_filter.csv'), sep=';', decimal=',', index_col=0)
-Albedo_uten = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)),'../data','Albedo_uten_filter.csv'), sep=';', decimal=',', index_col=0)
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.datasett import les
+
+Albedo_med = les('Albedo_med_filter.csv')
+Albedo_uten = les('Albedo_uten_filter.csv')
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -107,4 +113,6 @@ def plot(valg):
 
 
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=82)
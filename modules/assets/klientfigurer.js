@@ -0,0 +1,384 @@
+// Figurer som tegnes i nettleseren, uten en runde til serveren for hver
+// bevegelse av en glidebryter. Alt som ikke avhenger av inputverdiene ligger i
+// en figurmal som appen legger i en dcc.Store (se piler_mal, soyle_mal og
+// plot_mal i modules/). Funksjonene her kopierer malen og legger til
+// pilene, søylene og kurven, på samme måte som Python-funksjonene med samme
+// navn. bench/klientfigurer.py sjekker at de to versjonene gir samme figur.
+
+(function () {
+    function kopi(mal) {
+        return JSON.parse(JSON.stringify(mal));
+    }
+
+    function soyle(x0, y0, x1, y1, linjefarge, fyllfarge) {
+        return {type: 'rect', x0: x0, y0: y0, x1: x1, y1: y1,
+                line: {color: linjefarge, width: 2}, fillcolor: fyllfarge};
+    }
+
+    function stralingstetthet(sigma, temp) {
+        return sigma * Math.pow(temp + 273, 4);
+    }
+
+    // ebm.figurer.ekstrema: [minste, største] verdi i omhyllingen fra indeks fra til indeks til
+    function ekstrema(omhylling, fra, til) {
+        var blokk = omhylling.blokk;
+        var nedre = null, ovre = null;
+        fra = Math.max(fra, 0);
+        til = Math.min(til, omhylling.ovre.length - 1);
+
+        function ta_med(lav, hoy) {
+            if (lav !== null && (nedre === null || lav < nedre)) {
+                nedre = lav;
+            }
+            if (hoy !== null && (ovre === null || hoy > ovre)) {
+                ovre = hoy;
+            }
+        }
+
+        var i = fra;
+        while (i <= til) {
+            if (i % blokk === 0 && i + blokk - 1 <= til) {
+                ta_med(omhylling.blokk_nedre[i / blokk], omhylling.blokk_ovre[i / blokk]);
+                i += blokk;
+            } else {
+                ta_med(omhylling.nedre[i], omhylling.ovre[i]);
+                i += 1;
+            }
+        }
+        return [nedre, ovre];
+    }
+
+    // ebm.figurer.vis_figur: forskyver kurvene og setter aksene for perioden
+    function vis_figur(figur, x0, visning, periode) {
+        var fig = kopi(figur);
+        var forskyvning = visning.forskyvning || [];
+        fig.data.forEach(function (kurve, i) {
+            var f = forskyvning[i];
+            if (f) {
+                kurve.y = kurve.y.map(function (y) {
+                    return y === null ? null : y - f;
+                });
+            }
+        });
+
+        var grenser = ekstrema(visning.omhylling, periode[0] - x0, periode[1] - x0);
+        fig.layout.xaxis.range = [periode[0], periode[1]];
+        if (grenser[0] !== null) {
+            fig.layout.yaxis.range = [grenser[0] * 1.05, grenser[1] * 1.05];
+        }
+        return fig;
+    }
+
+    function toboks_framtid_modellvalg(check) {
+        // nullnivået er bare et valg på serveren når ensemblet vises
+        var ensemble = check.indexOf('ensemble') >= 0;
+        return check.filter(function (valg) {
+            return valg !== '1986:2005' || ensemble;
+        });
+    }
+
+    // toboks_fokus_tilbakekobling.les_tall: tallet i tekstboksen, eller null hvis teksten
+    // ikke er et endelig tall (f.eks. halvskrevne tall som '-' og '1e')
+    var TALL = /^ *[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)? *$/;
+
+    function les_tall(tekst) {
+        if (typeof tekst !== 'string' || !TALL.test(tekst)) {
+            return null;
+        }
+        var tall = Number(tekst);
+        return isFinite(tall) ? tall : null;
+    }
+
+    // toboks_fokus_tilbakekobling.tolk_parametre: [parametre eller null, ugyldige bokser]
+    function tolk_parametre(tekster, med) {
+        var tall = tekster.map(les_tall);
+        var ugyldig = tall.map(function (verdi) { return verdi === null; });
+        for (var i = 0; i < tall.length; i++) {
+            if (ugyldig[i] && med[i]) {
+                return [null, ugyldig];
+            }
+        }
+        var lambda = [];
+        for (var j = 0; j < 5; j++) {
+            if (med[j]) {
+                lambda.push(tall[j]);
+            }
+        }
+        return [{lambda: lambda, gamma: med[5] ? tall[5] : 0}, ugyldig];
+    }
+
+    // str(round(x, 1)) i Python: toFixed runder den eksakte verdien som round, men
+    // midt mellom to desimaler velger round det like sifferet. Bare x = j/4 med j
+    // oddetall (x * 4 er eksakt) ligger nøyaktig midt mellom.
+    function en_desimal(x) {
+        if (Number.isInteger(x * 4) && Math.abs(x * 4) % 2 === 1) {
+            var n = Math.floor(x * 10);
+            return ((n % 2 === 0 ? n : n + 1) / 10).toFixed(1);
+        }
+        return x.toFixed(1);
+    }
+
+    var ebm = {
+        // energibalanse_uten_atmosfaere.piler
+        uten_atmosfaere_piler: function (temp, alfa, maler) {
+            var fig = kopi(maler.piler);
+            var tyk = maler.tyk;
+            var U = stralingstetthet(maler.sigma, temp);
+            var skala = (4 * U / maler.I_sol) * tyk;
+            var piler = fig.layout.annotations;
+
+            if (tyk * (1 - alfa) > 0.1) {
+                piler.push({ax: 0.7 + alfa * 0.025, axref: 'x', ay: 0.9, ayref: 'y',
+                            x: 0.7 + alfa * 0.025, xref: 'x', y: 0.2, yref: 'y',
+                            arrowwidth: tyk * (1 - alfa), startarrowhead: 6, arrowhead: 4, arrowsize: 0.3,
+                            arrowcolor: 'gold'});
+            }
+            if (alfa * tyk > 0.1) {
+                piler.push({ax: 0.5, axref: 'x', ay: 1.78, ayref: 'y',
+                            x: 0.71, xref: 'x', y: 0.54, yref: 'y', arrowside: 'start',
+                            arrowwidth: alfa * tyk, arrowhead: 6, startarrowhead: 4, startarrowsize: 0.3,
+                            text: 'Reflektert sollys', arrowcolor: 'gold', align: 'left'});
+            }
+            if (skala > 0.1) {
+                piler.push({ax: 1, axref: 'x', ay: 1.7, ayref: 'y',
+                            x: 1, xref: 'x', y: 0.2, yref: 'y', arrowside: 'start',
+                            arrowwidth: skala, startarrowhead: 4, startarrowsize: 0.3, text: 'Varmestråling',
+                            arrowcolor: 'red'});
+            }
+            return fig;
+        },
+
+        // energibalanse_uten_atmosfaere.soyle
+        uten_atmosfaere_soyle: function (temp, alfa, maler) {
+            var fig = kopi(maler.soyle);
+            var U_jord = stralingstetthet(maler.sigma, temp);
+            var I_max = maler.I_sol / 4;
+            var I_abs = I_max * (1 - alfa);
+            var grenser = [-8, I_abs - U_jord, I_max];
+
+            fig.layout.shapes = [
+                soyle(0, I_abs, 1, I_max, 'snow', 'lightgrey'),
+                soyle(0, 0, 1, I_abs, 'orange', 'gold'),
+                soyle(1.5, I_abs, 2.5, I_abs - U_jord, 'Maroon', 'Red'),
+                soyle(3, 0, 4, I_abs - U_jord, 'RoyalBlue', 'LightSkyBlue')
+            ];
+            fig.layout.yaxis.range = [1.2 * Math.min.apply(null, grenser), 1.15 * Math.max.apply(null, grenser)];
+            return fig;
+        },
+
+        // ettlagsmodell.piler
+        ettlagsmodell_piler: function (temp, temp2, alfa, epsilon, maler) {
+            var fig = kopi(maler.piler);
+            var tyk = maler.tyk;
+            var U = stralingstetthet(maler.sigma, temp);
+            var U_atm = epsilon * stralingstetthet(maler.sigma, temp2);
+            var skala = (4 * U / maler.I_sol) * tyk;
+            var skala2 = skala * (1 - epsilon);
+            skala = skala * epsilon;
+            var skala3 = (4 * U_atm / maler.I_sol) * tyk;
+            var piler = fig.layout.annotations;
+
+            if ((1 - alfa) > 0.1) {
+                piler.push({ax: 0.7 + alfa * 0.025, axref: 'x', ay: 0.9, ayref: 'y',
+                            x: 0.7 + alfa * 0.025, xref: 'x', y: 0.2, yref: 'y',
+                            arrowwidth: tyk * (1 - alfa), startarrowhead: 6, arrowhead: 4, arrowsize: 0.3,
+                            arrowcolor: 'gold'});
+            }
+            if (alfa > 0.1) {
+                piler.push({ax: 0.5, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 0.69, xref: 'x', y: 0.60, yref: 'y', arrowside: 'start',
+                            arrowwidth: alfa * tyk, arrowhead: 6, startarrowhead: 4, startarrowsize: 0.3,
+                            text: 'Reflektert <br> sollys', arrowcolor: 'gold', align: 'left'});
+            }
+            if (skala > 0.1) {
+                piler.push({ax: 0.99, axref: 'x', ay: 1.2, ayref: 'y',
+                            x: 0.99, xref: 'x', y: 0.2, yref: 'y', arrowside: 'start',
+                            arrowwidth: skala, startarrowhead: 4, startarrowsize: 0.3, arrowcolor: 'red',
+                            text: 'Varmestråling<br>absorbert<br>i atm.'});
+            }
+            if (skala2 > 0.1) {
+                piler.push({ax: 1.12, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 1.01, xref: 'x', y: 0.2, yref: 'y', arrowside: 'start',
+                            arrowwidth: skala2, startarrowhead: 4, startarrowsize: 0.3,
+                            text: 'Varmestråling<br>mot verdens-<br>rommet', arrowcolor: 'red'});
+            }
+            if (skala3 > 0.1) {
+                piler.push({ax: 1.35, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 1.35, xref: 'x', y: 0.2, yref: 'y', arrowside: 'end+start',
+                            arrowwidth: skala3, arrowhead: 4, startarrowhead: 4, startarrowsize: 0.3, arrowsize: 0.3,
+                            text: 'Atmosfæren<br>sender ut<br>varmestråling', arrowcolor: 'FireBrick'});
+            }
+            return fig;
+        },
+
+        // ettlagsmodell.soyle
+        ettlagsmodell_soyle: function (temp, temp2, alfa, epsilon, maler) {
+            var fig = kopi(maler.soyle);
+            var U_jord = stralingstetthet(maler.sigma, temp);
+            var I_max = maler.I_sol / 4;
+            var I_abs = I_max * (1 - alfa);
+            var U_atm = epsilon * stralingstetthet(maler.sigma, temp2);
+            var grenser = [-8, I_abs + U_atm, I_abs + U_atm - U_jord, epsilon * U_jord - 2 * U_atm];
+
+            // søylene tegnes før nullinjen i malen
+            fig.layout.shapes = [
+                // bakken
+                soyle(0, I_abs, 1, I_abs + U_atm, 'DarkRed', 'FireBrick'),
+                soyle(0, 0, 1, I_abs, 'orange', 'gold'),
+                soyle(1.5, I_abs + U_atm, 2.5, I_abs + U_atm - U_jord, 'Maroon', 'Red'),
+                soyle(3, 0, 4, I_abs + U_atm - U_jord, 'RoyalBlue', 'LightSkyBlue'),
+                // atmosfæren
+                soyle(5.5, 0, 6.5, epsilon * U_jord, 'Maroon', 'Red'),
+                soyle(7, epsilon * U_jord, 8, epsilon * U_jord - 2 * U_atm, 'DarkRed', 'FireBrick'),
+                soyle(8.5, 0, 9.5, epsilon * U_jord - 2 * U_atm, 'RoyalBlue', 'LightSkyBlue')
+            ].concat(fig.layout.shapes || []);
+            fig.layout.yaxis.range = [1.2 * Math.min.apply(null, grenser), 1.15 * Math.max.apply(null, grenser)];
+            return fig;
+        },
+
+        // ettlagsmodell_likevektstemperatur.piler, med tallene fra tekstboksene
+        likevektstemperatur_piler: function (klikk, omega, alfa, epsilon, maler) {
+            omega = les_tall(omega);
+            alfa = les_tall(alfa);
+            epsilon = les_tall(epsilon);
+            if (omega === null || alfa === null || epsilon === null) {
+                return window.dash_clientside.no_update;
+            }
+            var sigma = maler.sigma, tyk = maler.tyk;
+            var temp = Math.pow(((1 - alfa) * omega) / (4 * sigma * (1 - (epsilon / 2))), 1 / 4);
+            if (!isFinite(temp)) {
+                return window.dash_clientside.no_update;
+            }
+            var temp2 = temp / Math.pow(2, 0.25);
+            var u = sigma * Math.pow(temp, 4);
+            var u_atm = epsilon * sigma * Math.pow(temp2, 4);
+            var skala = (4 * u / omega) * tyk;
+            var skala2 = skala * (1 - epsilon);
+            skala = skala * epsilon;
+            var skala3 = (4 * u_atm / omega) * tyk;
+
+            var fig = kopi(maler.piler);
+            // pilene legges mellom tekstene fra malen, i samme rekkefølge som i piler
+            var tekster = fig.layout.annotations;
+            var piler = fig.layout.annotations = tekster.slice(0, 2);
+            // sol
+            if ((1 - alfa) > 0.1) {
+                piler.push({ax: 0.7 + alfa * 0.025, axref: 'x', ay: 0.9, ayref: 'y',
+                            x: 0.7 + alfa * 0.025, xref: 'x', y: 0.2, yref: 'y',
+                            arrowwidth: tyk * (1 - alfa), startarrowhead: 6, arrowhead: 4, arrowsize: 0.3,
+                            font: {size: 12}, arrowcolor: 'gold'});
+            }
+            if (alfa > 0.1) {
+                piler.push({ax: 0.5, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 0.69, xref: 'x', y: 0.60, yref: 'y', arrowside: 'start',
+                            arrowwidth: alfa * tyk, arrowhead: 6, startarrowhead: 4, startarrowsize: 0.3,
+                            font: {size: 12}, text: '$\\frac{\\alpha \\Omega}{4}$', arrowcolor: 'gold', align: 'left'});
+            }
+            // jord
+            if (skala > 0.1) {
+                piler.push({ax: 0.99, axref: 'x', ay: 1.2, ayref: 'y',
+                            x: 0.99, xref: 'x', y: 0.2, yref: 'y', arrowside: 'start',
+                            arrowwidth: skala, startarrowhead: 4, startarrowsize: 0.3, font: {size: 12},
+                            arrowcolor: 'red', text: '$\\epsilon\\sigma T_{j}^4$'});
+            }
+            if (skala2 > 0.1) {
+                piler.push({ax: 1.12, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 1.01, xref: 'x', y: 0.2, yref: 'y', arrowside: 'start',
+                            arrowwidth: skala2, startarrowhead: 4, startarrowsize: 0.3, font: {size: 12},
+                            text: "'$(1-\\epsilon)\\sigma T_{j}^4$'", arrowcolor: 'red'});
+            }
+            piler.push(tekster[2]);
+            // atmosfære
+            if (skala3 > 0.1) {
+                piler.push({ax: 1.35, axref: 'x', ay: 2.2, ayref: 'y',
+                            x: 1.35, xref: 'x', y: 0.2, yref: 'y', arrowside: 'end+start',
+                            arrowwidth: skala3, arrowhead: 4, startarrowhead: 4, startarrowsize: 0.3, arrowsize: 0.3,
+                            font: {size: 12}, text: '$\\epsilon \\sigma T_{a}^4$', arrowcolor: 'FireBrick'});
+            }
+            piler.push(tekster[3]);
+
+            var jord = '$T_{j}=\\left(\\frac{(1-\\alpha)\\Omega)}{4\\sigma(1-\\frac{\\epsilon}{2})}\\right)^{\\frac{1}{4}}=\\text{' +
+                en_desimal(temp) + ' K =' + en_desimal(temp - 273) + '} ^{\\circ}C$';
+            var atm = '$T_{a}=\\frac{T_{j}}{\\sqrt[4]{2}} =\\text{' + en_desimal(temp2) + ' K =' +
+                en_desimal(temp2 - 273) + '} ^{\\circ}C$';
+            piler.push({text: jord, xref: 'x', yref: 'y', x: 1.7, y: 0.7, showarrow: false, font: {size: 12}});
+            piler.push({text: atm, xref: 'x', yref: 'y', x: 1.7, y: 1.7, showarrow: false, font: {size: 12}});
+            return fig;
+        },
+
+        // toboks_framtid.modellvalg: bare valgene som krever en ny utregning på serveren
+        framtid_modellvalg: function (check, forrige) {
+            var valg = toboks_framtid_modellvalg(check);
+            if (forrige !== null && forrige !== undefined && JSON.stringify(forrige) === JSON.stringify(valg)) {
+                return window.dash_clientside.no_update;
+            }
+            return valg;
+        },
+
+        // toboks_framtid: pådrivsgrafen for perioden
+        framtid_paadriv: function (data, periode) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            return vis_figur(data.figur, data.x0, data, periode);
+        },
+
+        // toboks_framtid: temperaturgrafen for perioden og nullnivået
+        framtid_temperatur: function (data, periode, check) {
+            var nullnivaa = check.indexOf('1986:2005') >= 0 ? '1986:2005' : '1750';
+            if (!data || !(nullnivaa in data.nullnivaa)) {
+                // med ensemble regnes nullnivået på serveren, og nye data er på vei
+                return window.dash_clientside.no_update;
+            }
+            return vis_figur(data.figur, data.x0, data.nullnivaa[nullnivaa], periode);
+        },
+
+        // toboks_fokus_tilbakekobling: tolker tekstboksene, markerer ugyldige og sender bare
+        // gyldige og endrede parametre videre til modellen på serveren
+        tilbakekobling_parametre: function (planck, laps, vanndamp, albedo, skyer, gamma,
+                                            med_laps, med_vanndamp, med_albedo, med_skyer, med_gamma, forrige) {
+            var tolket = tolk_parametre([planck, laps, vanndamp, albedo, skyer, gamma],
+                                        [true, med_laps, med_vanndamp, med_albedo, med_skyer, med_gamma]);
+            var parametre = tolket[0];
+            if (parametre === null ||
+                    (forrige !== null && forrige !== undefined && JSON.stringify(forrige) === JSON.stringify(parametre))) {
+                parametre = window.dash_clientside.no_update;
+            }
+            return [parametre].concat(tolket[1]);
+        },
+
+        // planckkurve.plot
+        planckkurve: function (Temp, valg, mal) {
+            var fig = kopi(mal.figur);
+            var h = mal.h, c = mal.c, k = mal.k;
+            var T = Temp + 273;
+            var lamda = fig.data[0].x;
+            var U = new Array(lamda.length);
+            for (var i = 0; i < lamda.length; i++) {
+                U[i] = (8 * Math.PI * h * c) / Math.pow(lamda[i], 5) * (1 / (Math.exp((h * c) / (lamda[i] * k * T)) - 1));
+            }
+            fig.data[0].y = U;
+
+            var LGY = valg.indexOf('LGY') >= 0;
+            if (valg.indexOf('LGX') >= 0) {
+                fig.layout.xaxis.type = 'log';
+            }
+            if (LGY) {
+                fig.layout.yaxis.type = 'log';
+            }
+            if (valg.indexOf('lock') >= 0) {  // løser y-aksen
+                fig.layout.yaxis.range = LGY ? [-2, 6.5] : [0.01, 1.6E6];
+            }
+            if (valg.indexOf('VIS') >= 0) {  // viser regnbue
+                fig.layout.shapes = (fig.layout.shapes || []).concat(kopi(mal.regnbue));
+            }
+            if (valg.indexOf('GRID') < 0) {  // slår av rutenett
+                fig.layout.xaxis.showgrid = false;
+                fig.layout.yaxis.showgrid = false;
+            }
+            return fig;
+        }
+    };
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {ebm: ebm});
+})();
@@ -10,10 +10,18 @@
 
 import plotly.express as px
 from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.figurer import figur_til_dict
+
 sigma = 5.67E-8  # Stefan-Boltzmann konstant (W.m-2.K-4)
 I_sol = 1361  #
 tyk = 50  # 100% - piltykkelse
@@ -29,71 +37,38 @@ app = Dash(__name__,
 
 load_figure_template(Template)
 
-# ---------------------------------------------------------------
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1(app.title,
-                    className='text-center text-primary mb-4')
-        ], width=12)  # ,style={'font-size': '2.5vw'})
-    ], justify='center'),
-
-    dbc.Row([
-        dbc.Card([
-            dbc.CardBody([
-                html.H4("Balanser energien som stråler inn og ut fra jorden ved å regulere gjennomsnittstemperaturen",
-                        className="card-title"),  # style={'font-size': '1.5vw'}),
-                dbc.Row([dbc.Col(
-                    dbc.Label("Temperatur målt i celsius"), lg=2, md=12),  # ,style={'font-size': '.95vw'}),
+# _________________________________________________________________________________________________________
 
-                    dbc.Col(dcc.Slider(-50, 50, .01, value=-30, marks=None, id='temp_slide',
-                                       tooltip={"placement": "bottom", "always_visible": True}),
-                            )
-                ]),
+# Figurene tegnes i nettleseren (assets/klientfigurer.js) slik at glidebryterne ikke
+# trenger en runde til serveren. Det som ikke avhenger av glidebryterne lages her én
+# gang og sendes med i en dcc.Store. piler og soyle lager de samme figurene i Python
+# og brukes til å sjekke at JavaScript-versjonen tegner likt (bench/klientfigurer.py).
 
-                dbc.Row([
-                    dbc.Col(
-                        dbc.Label("Albedo:"), lg=2, md=12),  # ,style={'font-size': '.95vw'}),
-                    dbc.Col(dcc.Slider(0, 1, .01, value=0.306, marks=None, id='alfa_slide',
-                                       tooltip={"placement": "bottom", "always_visible": True}),
-                            )
-                ])
-            ])
-        ], color="primary", inverse=True)
-    ]),
+def piler_mal():
+    fig = px.line(x=[0], y=[0])
 
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='pil_graf', figure={}, mathjax=True)
-            # , className='four columns')#,config={'staticPlot': True})
-        ], lg=7, md=7, sm=12, xs=12, class_name="mt-3"),
-        dbc.Col([
-            dcc.Graph(id='intensistet_graf', figure={}, mathjax=True)
-            # , className='four columns')#,config={'staticPlot': True})
-        ], lg=5, md=5, sm=12, xs=12, class_name="mt-3"),
-    ])
+    fig.add_annotation(ax=0.7, axref='x', ay=1.8, ayref='y',
+                       x=0.7, xref='x', y=0.68, yref='y',
+                       arrowwidth=tyk, arrowhead=7, arrowsize=0.3, text="Solinstråling", arrowcolor="gold",
+                       arrowside='none')
 
-],fluid='lg')
+    fig.update_layout(xaxis_range=[0.3, 1.2],
+                      yaxis_range=[0, 2],
+                      margin_l=0,
+                      margin_r=0,
+                      height=400)
 
+    fig.add_hrect(y0=0, y1=0.2, fillcolor="darkolivegreen", opacity=0.5, layer="below", line_width=0)
+    fig.update_yaxes(showgrid=False, title=None, showticklabels=False)
+    fig.update_xaxes(showgrid=False, title=None, showticklabels=False)
+    return fig
 
-# _________________________________________________________________________________________________________
 
-# #Pilfigur
-@app.callback(
-    Output(component_id='pil_graf', component_property='figure'),
-    Input(component_id='temp_slide', component_property='value'),
-    Input(component_id='alfa_slide', component_property='value')
-)
 def piler(temp, alfa):
     U = sigma * (temp + 273) ** 4
     skala = (4 * U / I_sol) * tyk
 
-    fig = px.line(x=[0], y=[0])
-
-    fig.add_annotation(ax=0.7, axref='x', ay=1.8, ayref='y',
-                       x=0.7, xref='x', y=0.68, yref='y',
-                       arrowwidth=tyk, arrowhead=7, arrowsize=0.3, text="Solinstråling", arrowcolor="gold",
-                       arrowside='none')
+    fig = piler_mal()
 
     if tyk * (1 - alfa) > 0.1:
         fig.add_annotation(ax=0.7 + alfa * 0.025, axref='x', ay=0.9, ayref='y',
@@ -111,46 +86,12 @@ def piler(temp, alfa):
                            x=1, xref='x', y=0.2, yref='y', arrowside='start',
                            arrowwidth=skala, startarrowhead=4, startarrowsize=0.3, text="Varmestråling",
                            arrowcolor="red", )
-
-    fig.update_layout(xaxis_range=[0.3, 1.2],
-                      yaxis_range=[0, 2],
-                      margin_l=0,
-                      margin_r=0,
-                      height=400)
-
-    fig.add_hrect(y0=0, y1=0.2, fillcolor="darkolivegreen", opacity=0.5, layer="below", line_width=0)
-    fig.update_yaxes(showgrid=False, title=None, showticklabels=False)
-    fig.update_xaxes(showgrid=False, title=None, showticklabels=False)
     return fig
 
 
-@app.callback(
-    Output(component_id='intensistet_graf', component_property='figure'),
-    Input(component_id='temp_slide', component_property='value'),
-    Input(component_id='alfa_slide', component_property='value')
-)
-def soyle(temp, alfa):
-    U_jord = sigma * (temp + 273) ** 4
-    I_max = I_sol / 4
-    I_abs = I_max * (1 - alfa)
-
-    grenser = [-8, I_abs - U_jord, I_max]  # for å bestemme ymax og ymin til skalering
-
+def soyle_mal():
     fig2 = px.line(x=[0], y=[0])
 
-    # bakken
-    fig2.add_shape(type="rect", x0=0, y0=I_abs, x1=1, y1=I_max,
-                   line=dict(color="snow", width=2, ), fillcolor="lightgrey")
-
-    fig2.add_shape(type="rect", x0=0, y0=0, x1=1, y1=I_abs,
-                   line=dict(color="orange", width=2, ), fillcolor="gold")
-
-    fig2.add_shape(type="rect", x0=1.5, y0=I_abs, x1=2.5, y1=I_abs - U_jord,
-                   line=dict(color="Maroon", width=2, ), fillcolor="Red")
-
-    fig2.add_shape(type="rect", x0=3, y0=0, x1=4, y1=I_abs - U_jord,
-                   line=dict(color="RoyalBlue", width=2, ), fillcolor="LightSkyBlue")
-
     # tekst
     fig2.add_annotation(
         text="Energibalanse",
@@ -185,15 +126,110 @@ def soyle(temp, alfa):
     fig2.update_xaxes(title=dict(text=r''))
     fig2.update_layout(title='',
                        xaxis_range=[-0.3, 4.5],
-                       yaxis_range=[1.2 * min(grenser), 1.15 * max(grenser)],
                        legend=dict(orientation="h", y=1.15, xanchor="center", x=0.5,
                                    title=""),
                        height=400)  # , yaxis_range = [0, 2],margin_l=0,margin_r=0)
     fig2.update_xaxes(showgrid=False, title=None, showticklabels=False)
+    return fig2
+
+
+def soyle(temp, alfa):
+    U_jord = sigma * (temp + 273) ** 4
+    I_max = I_sol / 4
+    I_abs = I_max * (1 - alfa)
+
+    grenser = [-8, I_abs - U_jord, I_max]  # for å bestemme ymax og ymin til skalering
+
+    fig2 = soyle_mal()
 
+    # bakken
+    fig2.layout.shapes = [
+        dict(type="rect", x0=0, y0=I_abs, x1=1, y1=I_max,
+             line=dict(color="snow", width=2, ), fillcolor="lightgrey"),
+        dict(type="rect", x0=0, y0=0, x1=1, y1=I_abs,
+             line=dict(color="orange", width=2, ), fillcolor="gold"),
+        dict(type="rect", x0=1.5, y0=I_abs, x1=2.5, y1=I_abs - U_jord,
+             line=dict(color="Maroon", width=2, ), fillcolor="Red"),
+        dict(type="rect", x0=3, y0=0, x1=4, y1=I_abs - U_jord,
+             line=dict(color="RoyalBlue", width=2, ), fillcolor="LightSkyBlue"),
+    ]
+    fig2.update_layout(yaxis_range=[1.2 * min(grenser), 1.15 * max(grenser)])
     return fig2
 
 
+# ---------------------------------------------------------------
+app.layout = dbc.Container([
+    dbc.Row([
+        dbc.Col([
+            html.H1(app.title,
+                    className='text-center text-primary mb-4')
+        ], width=12)  # ,style={'font-size': '2.5vw'})
+    ], justify='center'),
+
+    dbc.Row([
+        dbc.Card([
+            dbc.CardBody([
+                html.H4("Balanser energien som stråler inn og ut fra jorden ved å regulere gjennomsnittstemperaturen",
+                        className="card-title"),  # style={'font-size': '1.5vw'}),
+                dbc.Row([dbc.Col(
+                    dbc.Label("Temperatur målt i celsius"), lg=2, md=12),  # ,style={'font-size': '.95vw'}),
+
+                    dbc.Col(dcc.Slider(-50, 50, .01, value=-30, marks=None, id='temp_slide',
+                                       tooltip={"placement": "bottom", "always_visible": True}),
+                            )
+                ]),
+
+                dbc.Row([
+                    dbc.Col(
+                        dbc.Label("Albedo:"), lg=2, md=12),  # ,style={'font-size': '.95vw'}),
+                    dbc.Col(dcc.Slider(0, 1, .01, value=0.306, marks=None, id='alfa_slide',
+                                       tooltip={"placement": "bottom", "always_visible": True}),
+                            )
+                ])
+            ])
+        ], color="primary", inverse=True)
+    ]),
+
+    dbc.Row([
+        dbc.Col([
+            dcc.Graph(id='pil_graf', figure={}, mathjax=True)
+            # , className='four columns')#,config={'staticPlot': True})
+        ], lg=7, md=7, sm=12, xs=12, class_name="mt-3"),
+        dbc.Col([
+            dcc.Graph(id='intensistet_graf', figure={}, mathjax=True)
+            # , className='four columns')#,config={'staticPlot': True})
+        ], lg=5, md=5, sm=12, xs=12, class_name="mt-3"),
+    ]),
+
+    dcc.Store(id='figurmaler', data={'piler': figur_til_dict(piler_mal()),
+                                     'soyle': figur_til_dict(soyle_mal()),
+                                     'sigma': sigma, 'I_sol': I_sol, 'tyk': tyk})
+
+],fluid='lg')
+
+
+# _________________________________________________________________________________________________________
+
+# #Pilfigur
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='uten_atmosfaere_piler'),
+    Output(component_id='pil_graf', component_property='figure'),
+    Input(component_id='temp_slide', component_property='value'),
+    Input(component_id='alfa_slide', component_property='value'),
+    State(component_id='figurmaler', component_property='data')
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='uten_atmosfaere_soyle'),
+    Output(component_id='intensistet_graf', component_property='figure'),
+    Input(component_id='temp_slide', component_property='value'),
+    Input(component_id='alfa_slide', component_property='value'),
+    State(component_id='figurmaler', component_property='data')
+)
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=88)
     # app.run_server(mode='inline')
@@ -9,10 +9,18 @@
 #############################
 import plotly.express as px
 from dash import dash, dcc, html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.figurer import figur_til_dict
+
 sigma = 5.67E-8  # Stefan-Boltzmann konstant (W.m-2.K-4)
 I_sol = 1361  #
 tyk = 50  # 100% - piltykkelse
@@ -79,14 +87,37 @@ app.layout = dbc.Container([
 
 
 # ------------------
+# Figuren tegnes i nettleseren (assets/klientfigurer.js) når knappen trykkes, se
+# energibalanse_uten_atmosfaere. Alt som ikke avhenger av tekstboksene (solinnstrålingen,
+# tekstene under pilene, aksene og lagene) ligger i piler_mal. piler er Python-versjonen
+# av den samme figuren.
+
+def piler_mal():
+    fig = px.line(x=[0], y=[0])
+
+    # sol
+    fig.add_annotation(ax=0.7, axref='x', ay=2.2, ayref='y',
+                       x=0.7, xref='x', y=0.68, yref='y',
+                       arrowwidth=tyk, arrowhead=7, arrowsize=0.3, font=dict(size=16), text="$\\frac{\\Omega}{4}$",
+                       arrowcolor="gold", arrowside='none')
+
+    fig.add_annotation(text='$\\frac{(1-\\alpha) \\Omega}{4}$', xref="x", yref="y", x=0.7, y=0.1, showarrow=False,
+                       font=dict(size=12))
+
+    fig.add_annotation(text='$\\sigma T_{j}^4$', xref="x", yref="y", x=0.99, y=0.1, font=dict(size=12), showarrow=False)
+
+    fig.add_annotation(text='$\\epsilon \\sigma T_{a}^4$', xref="x", yref="y", x=1.35, y=0.1, font=dict(size=12),
+                       showarrow=False)
+
+    fig.update_layout(xaxis_range=[0.4, 2], yaxis_range=[0, 2], margin_l=0, margin_r=0,height=350)
+
+    fig.add_hrect(y0=0, y1=0.2, fillcolor="DarkOliveGreen", opacity=0.5, layer="below", line_width=0)
+    fig.add_hrect(y0=1, y1=1.4, fillcolor="lightblue", opacity=0.5, layer="above", line_width=0)
+    fig.update_yaxes(showgrid=False, title=None, showticklabels=False)
+    fig.update_xaxes(showgrid=False, title=None, showticklabels=False)
+    return fig
+
 
-@app.callback(
-    Output(component_id='pil_graf', component_property='figure'),
-    [Input(component_id='modell_knapp', component_property='n_clicks')],
-    State(component_id='my_Omega', component_property='value'),
-    State(component_id='my_alpha', component_property='value'),
-    State(component_id='my_epsilon', component_property='value'),
-)
 def piler(klikk, omega, alfa, epsilon):
     omega = float(omega)
     alfa = float(alfa)
@@ -101,17 +132,13 @@ def piler(klikk, omega, alfa, epsilon):
     skala = skala * epsilon
     skala3 = (4 * u_atm / omega) * tyk
 
-    fig = px.line(x=[0], y=[0])
+    fig = piler_mal()
+    # pilene legges mellom tekstene fra malen, i samme rekkefølge som før malen (den
+    # siste annotasjonen tegnes øverst)
+    sol, sol_tekst, jord_tekst, atm_tekst = fig.layout.annotations
+    fig.layout.annotations = [sol, sol_tekst]
 
     # sol
-    fig.add_annotation(ax=0.7, axref='x', ay=2.2, ayref='y',
-                       x=0.7, xref='x', y=0.68, yref='y',
-                       arrowwidth=tyk, arrowhead=7, arrowsize=0.3, font=dict(size=16), text="$\\frac{\\Omega}{4}$",
-                       arrowcolor="gold", arrowside='none')
-
-    fig.add_annotation(text='$\\frac{(1-\\alpha) \\Omega}{4}$', xref="x", yref="y", x=0.7, y=0.1, showarrow=False,
-                       font=dict(size=12))
-
     if (1 - alfa) > 0.1:
         fig.add_annotation(ax=0.7 + alfa * 0.025, axref='x', ay=0.9, ayref='y',
                            x=0.7 + alfa * 0.025, xref='x', y=0.2, yref='y',
@@ -137,7 +164,7 @@ def piler(klikk, omega, alfa, epsilon):
                            arrowwidth=skala2, startarrowhead=4, startarrowsize=0.3, font=dict(size=12),
                            text="'$(1-\\epsilon)\\sigma T_{j}^4$'", arrowcolor="red", )
 
-    fig.add_annotation(text='$\\sigma T_{j}^4$', xref="x", yref="y", x=0.99, y=0.1, font=dict(size=12), showarrow=False)
+    fig.add_annotation(jord_tekst)
 
     # atmosfære
     if skala3 > 0.1:
@@ -146,8 +173,7 @@ def piler(klikk, omega, alfa, epsilon):
                            arrowwidth=skala3, arrowhead=4, startarrowhead=4, startarrowsize=0.3, arrowsize=0.3,
                            font=dict(size=12), text="$\\epsilon \\sigma T_{a}^4$", arrowcolor="FireBrick", )
 
-    fig.add_annotation(text='$\\epsilon \\sigma T_{a}^4$', xref="x", yref="y", x=1.35, y=0.1, font=dict(size=12),
-                       showarrow=False)
+    fig.add_annotation(atm_tekst)
 
     jord = (
             '$T_{j}=\\left(\\frac{(1-\\alpha)\\Omega)}{4\\sigma(1-\\frac{\\epsilon}{2})}\\right)^{\\frac{1}{4}}=\\text{'
@@ -170,15 +196,24 @@ def piler(klikk, omega, alfa, epsilon):
         showarrow=False,
         font=dict(size=12),
     )
+    return fig
 
-    fig.update_layout(xaxis_range=[0.4, 2], yaxis_range=[0, 2], margin_l=0, margin_r=0,height=350)
 
-    fig.add_hrect(y0=0, y1=0.2, fillcolor="DarkOliveGreen", opacity=0.5, layer="below", line_width=0)
-    fig.add_hrect(y0=1, y1=1.4, fillcolor="lightblue", opacity=0.5, layer="above", line_width=0)
-    fig.update_yaxes(showgrid=False, title=None, showticklabels=False)
-    fig.update_xaxes(showgrid=False, title=None, showticklabels=False)
-    return fig
+app.layout.children.append(dcc.Store(id='figurmaler', data={'piler': figur_til_dict(piler_mal()),
+                                                            'sigma': sigma, 'tyk': tyk}))
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='likevektstemperatur_piler'),
+    Output(component_id='pil_graf', component_property='figure'),
+    [Input(component_id='modell_knapp', component_property='n_clicks')],
+    State(component_id='my_Omega', component_property='value'),
+    State(component_id='my_alpha', component_property='value'),
+    State(component_id='my_epsilon', component_property='value'),
+    State(component_id='figurmaler', component_property='data')
+)
 
 
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=50)
@@ -8,11 +8,20 @@
 #############################
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.figurer import figur_til_dict
+
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -89,49 +98,57 @@ def u_planck(lamda, T):
     # Regner utstrålingstettheten ved hver bølgelengde for en gitt temperatur
     return (8 * np.pi * h * c) / (lamda ** 5) * (1 / (np.exp((h * c) / (lamda * k * T)) - 1))
 
-@app.callback(
-    Output(component_id='my-graph', component_property='figure'),
-    Input(component_id='slider', component_property='value'),
-    Input(component_id='my_dropdown', component_property='value'),
-)
+def plot_mal():
+    # Det som ikke avhenger av valgene. Kurven regnes ut på nytt i nettleseren
+    # (assets/klientfigurer.js), så serveren trengs ikke når glidebryteren flyttes.
+    fig = px.line(x=lamda, y=u_planck(lamda, 14 + 273))
+
+    fig.update_layout(
+        xaxis_title='Bølgelengde (m)',
+        yaxis_title='$W\cdot m^{-2}\cdot nm^{-1}$',
+        height=400
+    )
+    fig.update_xaxes(showline=True, linewidth=2, linecolor='black', mirror=True)
+    fig.update_yaxes(showline=True, linewidth=2, linecolor='black', mirror=True)
+    return fig
+
+
+def regnbue(fig):
+    fig.add_vrect(x0=440E-9, x1=460E-9, line_width=0, fillcolor='#8b00ff', layer='below')
+    fig.add_vrect(x0=460E-9, x1=495E-9, line_width=0, fillcolor='#0000ff', layer='below')
+    fig.add_vrect(x0=495E-9, x1=570E-9, line_width=0, fillcolor='#00ff00', layer='below')
+    fig.add_vrect(x0=570E-9, x1=590E-9, line_width=0, fillcolor='#ffff00', layer='below')
+    fig.add_vrect(x0=590E-9, x1=620E-9, line_width=0, fillcolor='#ff7f00', layer='below')
+    fig.add_vrect(x0=620E-9, x1=750E-9, line_width=0, fillcolor='#ff0000', layer='below')
+    return fig
+
+
 def plot(Temp, valg):
+    # Python-versjonen av ebm.planckkurve i assets/klientfigurer.js
     T = Temp + 273
     U = u_planck(lamda, T)
 
-    if 'LGX' in valg:
-        LGX = True
-    else:
-        LGX = False
-
     if 'LGY' in valg:
-        LGY = True
         ymin = -2
         ymax = 6.5
     else:
-        LGY = False
         ymin = 0.01
         ymax = 1.6E6
 
-    fig = px.line(x=lamda, y=U, log_y=LGY, log_x=LGX)
+    fig = plot_mal()
+    fig.update_traces(y=U)
 
-    fig.update_layout(
-        xaxis_title='Bølgelengde (m)',
-        yaxis_title='$W\cdot m^{-2}\cdot nm^{-1}$',
-        height=400
-    )
-    fig.update_xaxes(showline=True, linewidth=2, linecolor='black', mirror=True)
-    fig.update_yaxes(showline=True, linewidth=2, linecolor='black', mirror=True)
+    if 'LGX' in valg:
+        fig.update_xaxes(type='log')
+
+    if 'LGY' in valg:
+        fig.update_yaxes(type='log')
 
     if 'lock' in valg:  # løser y-aksen
         fig.update_layout(yaxis_range=[ymin, ymax])
 
     if 'VIS' in valg:  # viser regnbue
-        fig.add_vrect(x0=440E-9, x1=460E-9, line_width=0, fillcolor='#8b00ff', layer='below')
-        fig.add_vrect(x0=460E-9, x1=495E-9, line_width=0, fillcolor='#0000ff', layer='below')
-        fig.add_vrect(x0=495E-9, x1=570E-9, line_width=0, fillcolor='#00ff00', layer='below')
-        fig.add_vrect(x0=570E-9, x1=590E-9, line_width=0, fillcolor='#ffff00', layer='below')
-        fig.add_vrect(x0=590E-9, x1=620E-9, line_width=0, fillcolor='#ff7f00', layer='below')
-        fig.add_vrect(x0=620E-9, x1=750E-9, line_width=0, fillcolor='#ff0000', layer='below')
+        regnbue(fig)
 
     if not 'GRID' in valg:  # slår av rutenett
         fig.update_layout(
@@ -142,5 +159,21 @@ def plot(Temp, valg):
     return fig
 
 
+app.layout.children.append(
+    dcc.Store(id='figurmal', data={'figur': figur_til_dict(plot_mal()),
+                                   'regnbue': figur_til_dict(regnbue(go.Figure()))['layout']['shapes'],
+                                   'h': h, 'c': c, 'k': k}))
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='planckkurve'),
+    Output(component_id='my-graph', component_property='figure'),
+    Input(component_id='slider', component_property='value'),
+    Input(component_id='my_dropdown', component_property='value'),
+    State(component_id='figurmal', component_property='data')
+)
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True)
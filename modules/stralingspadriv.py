@@ -9,19 +9,24 @@
 # bjarte.ursin@vlfk.no
 ##########################
 
-import pandas as pd
 import plotly.express as px
-import os.path
 
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
-# df=pd.read_csv('historical.csv',index_col = 0,sep=',',encoding = "utf-8")
-df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data', 'historical_IPCC6.csv'),index_col = 0,sep=',',encoding = "utf-8")
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-df['total'] = df.sum(axis=1)
+from ebm.datasett import delt
+from ebm.figurer import Figurmal
+
+# df=pd.read_csv('historical.csv',index_col = 0,sep=',',encoding = "utf-8")
+df = delt('historisk')  # med kolonnen 'total'
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -89,13 +94,13 @@ app.layout = dbc.Container([
 
 # _________________________________________________________________________________________________________
 #
-# Strålingspådrivgraf henter
-@app.callback(
-    Output(component_id='my-graph', component_property='figure'),
-    Input(component_id='my_checklist', component_property='value'),
-)
-def update_graph(paadriv):
-    dff = df[paadriv]
+# Figurene bygges med plotly.express første gang et utvalg av pådriv vises (paadrivsfigur,
+# fordelingsfigur og totalfigur), og callbackene bytter bare inn tallene og tittelen i
+# kopier av dem (ebm.figurer.Figurmal).
+figurmal = Figurmal()
+
+
+def paadrivsfigur(dff):
     fig = px.line(data_frame=dff, title='Strålingspådriv', template=Template)  # template='ggplot2'
     fig.update_traces(mode='lines')
     fig.update_yaxes(title=dict(text=r'$W / m^2$'))  # ,showgrid=True, gridwidth=1, gridcolor='white')
@@ -107,46 +112,21 @@ def update_graph(paadriv):
         x=0.5,
         title=""
     ))
-
     return fig
 
 
-# sektordiagram henter årstall fra "hoverdata"
-@app.callback(
-    Output(component_id='pie-graph', component_property='figure'),
-    Input(component_id='my-graph', component_property='hoverData'),
-    Input(component_id='my_checklist', component_property='value')
-)
-def update_side_graph(hov_data, paadriv):  # clk_data, slct_data, paadriv):
-    if hov_data is None:
-        dff2 = df[paadriv].loc[1952]
-        # dff2 = np.abs(dff2.loc[ 1952.0])
-        dff2 = dff2.to_frame(name='verdi')
-        dff2.reset_index(inplace=True)
-        fig2 = px.bar(dff2, x='index', y='verdi', color='index', title='Fordeling av strålingspådriv i 1952',
-                      template=Template)
-
-    else:
-        hov_year = hov_data['points'][0]['x']
-        dff2 = df[paadriv].loc[hov_year]
-        # dff2 = np.abs(dff2.loc)
-        dff2 = dff2.to_frame(name='verdi')
-        dff2.reset_index(inplace=True)
-        fig2 = px.bar(dff2, x='index', y='verdi', color='index', title=f'Fordeling av strålingspådriv i {hov_year}',
-                      template=Template)
-
+def fordelingsfigur(dff2, aar):
+    dff2 = dff2.to_frame(name='verdi')
+    dff2.reset_index(inplace=True)
+    fig2 = px.bar(dff2, x='index', y='verdi', color='index', title=f'Fordeling av strålingspådriv i {aar}',
+                  template=Template)
     fig2.update_layout(height=400,showlegend=False)
     fig2.update_yaxes(title=dict(text=r'$W / m^2$'))
     fig2.update_xaxes(title=dict(text=r''))
-
     return fig2
 
 
-@app.callback(
-    Output(component_id='total-graph', component_property='figure'),
-    Input(component_id='my_checklist', component_property='value')
-)
-def update_total(paadriv):
+def totalfigur(paadriv):
     if len(paadriv) == 1:
         liste = ''.join(paadriv)
     else:
@@ -159,5 +139,46 @@ def update_total(paadriv):
     return fig3
 
 
+# Strålingspådrivgraf henter
+@app.callback(
+    Output(component_id='my-graph', component_property='figure'),
+    Input(component_id='my_checklist', component_property='value'),
+)
+def update_graph(paadriv):
+    dff = df[paadriv]
+    aar = dff.index.to_numpy()
+    return figurmal(('paadriv', tuple(paadriv)), lambda: paadrivsfigur(dff),
+                    [{'x': aar, 'y': dff[kolonne].to_numpy()} for kolonne in paadriv])
+
+
+# sektordiagram henter årstall fra "hoverdata"
+@app.callback(
+    Output(component_id='pie-graph', component_property='figure'),
+    Input(component_id='my-graph', component_property='hoverData'),
+    Input(component_id='my_checklist', component_property='value')
+)
+def update_side_graph(hov_data, paadriv):  # clk_data, slct_data, paadriv):
+    if hov_data is None:
+        aar = 1952
+    else:
+        aar = hov_data['points'][0]['x']
+    dff2 = df[paadriv].loc[aar]
+    # én søyle (kurve) per pådriv
+    return figurmal(('fordeling', tuple(paadriv)), lambda: fordelingsfigur(dff2, aar),
+                    [{'x': [navn], 'y': [verdi]} for navn, verdi in dff2.items()],
+                    layout={'title': {'text': f'Fordeling av strålingspådriv i {aar}'}})
+
+
+@app.callback(
+    Output(component_id='total-graph', component_property='figure'),
+    Input(component_id='my_checklist', component_property='value')
+)
+def update_total(paadriv):
+    return figurmal(('total', tuple(paadriv)), lambda: totalfigur(paadriv),
+                    [{'x': df.index.to_numpy(), 'y': df[paadriv].sum(axis=1).to_numpy()}])
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=81)
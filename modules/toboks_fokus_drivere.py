@@ -11,16 +11,23 @@
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import os.path
-from dash import Dash, dcc, html
+from dash import Dash, callback_context, dcc, html, no_update
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
-df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data', 'historical_IPCC6.csv'),
-                 index_col=0, sep=',', encoding="utf-8")
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.datasett import delt, sti
+from ebm.figurer import Figurmal
+from ebm.respons import forvarm_respons, sum_respons
 
-df['total'] = df.sum(axis=1)
+historisk = sti('historical_IPCC6.csv')
+df = delt('historisk')  # med kolonnen 'total'
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -91,56 +98,22 @@ app.layout = dbc.Container([
 
 # _________________________________________________________________________________________________________
 #
-def calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma):
-    H_MIX = 100  # tykkelse av blandingslaget [m]
-    H_DEEP = 3700 - H_MIX  # gjennomsnitts tykkelse av dyphavet [m]
-    RHO = 1000  # vannets tetthet (kg m-3)
-    CPO = 4200  # spesifikk varmekapasitet for vann(J kg-1 K-1)
-    f_o = 0.7  # andel av jordens overflate dekket av vann
-
-    Dt = 365 * 24 * 60 * 60  # steglenge i modellen - 1 år i sekund
-
-    # effektiv varmekapasitet for atmosfære-hav-systemet [J m-2 K-1]
-    # Hvor mye energi skal til for å heve en vannsøyle med grunnflate en kvadratmeter og høyde
-    # tilsvarende havdybden en grad.
-
-    CEFF_M = f_o * H_MIX * CPO * RHO
-    CEFF_D = f_o * H_DEEP * CPO * RHO
-
-    Ts = np.array([0])  # Starter temperaturseriene med temperaturen første år.
-    To = np.array([0])
-
-    for t in range(1, len(radiative_forcing)):
-        # --------------
-        # Temperatur tendenser (den deriverte) [K/s]
-        #     dTs/dt, dTo/dt
-        # --------------
-        dTs_dt = (radiative_forcing[t] + (lambda_sum * Ts[t - 1]) + (gamma * (Ts[t - 1] - To[t - 1]))) / CEFF_M
-        dTo_dt = -gamma * (Ts[t - 1] - To[t - 1]) / CEFF_D
-
-        # ----------------------------------------------------------------------
-        # Antar konstant temperaturendring i løpet av et år, regner ut ny temperatur
-        # ved hjelp av Eulermetoden og oppdaterer temperaturarrayene
-        # ----------------------------------------------------------------------
-        Ts = np.append(Ts, Ts[t - 1] + dTs_dt * Dt)
-        To = np.append(To, To[t - 1] + dTo_dt * Dt)
-    return Ts, To
-
-
-# Strålingspådrivgraf henter
-@app.callback(
-    Output(component_id='small-graph', component_property='figure'),
-    [Input(component_id='my_checklist', component_property='value'),
-     Input(component_id='check_Sum', component_property='value')],
-)
+# Responsen på hvert pådriv for standardverdiene regnes ut ved oppstart
+forvarm_respons(historisk, [(-1.3, -0.69)])
+
+
 # ---------------------------------------------------------------------
 # Callbacks
 #
-def update_graph(paadriv, check_Sum):
-    dff = df[paadriv]
-    sum_paadriv = dff.sum(axis=1).to_numpy()
+# Figurene bygges med plotly.express første gang hvert oppsett vises (paadrivsfigur og
+# temperaturfigur), og callbacken bytter bare inn tallene i kopier av dem
+# (ebm.figurer.Figurmal).
+figurmal = Figurmal()
+
+
+def paadrivsfigur(dff, check_Sum):
     if check_Sum:
-        fig = px.line(x=dff.index, y=sum_paadriv, title='Summen av strålingspådrivene', template=Template)
+        fig = px.line(x=dff.index, y=dff.sum(axis=1).to_numpy(), title='Summen av strålingspådrivene', template=Template)
         fig.update_xaxes(title=dict(text='År'))
     else:
         fig = px.line(data_frame=dff, title='Strålingspådriv', template=Template)  # template='ggplot2'
@@ -161,31 +134,16 @@ def update_graph(paadriv, check_Sum):
     return fig
 
 
-@app.callback(
-    Output(component_id='my-graph', component_property='figure'),
-    Input(component_id='my_checklist', component_property='value'),
-    prevent_initial_call=False
-)
-def tegn_temp_graf(driv, my_lambda=-1.3, my_gamma=-0.69):
-    aar = df.index.tolist()
-    lambda_sum = float(my_lambda)
-    gamma = float(my_gamma)
-
-    if len(driv) == 0:
+def temperaturfigur(temp):
+    # temp er None når ingen pådriv er valgt
+    if temp is None:
+        aar = df.index.tolist()
         null = np.zeros(len(aar))
         fig3 = px.line(x=aar, y=null,
                        title='Velg strålingspådriv, sett andre parametre og trykk på knappen for å kjøre modell',
                        template=Template)
         fig3.update_layout(showlegend=False)
     else:
-
-        radiative_forcing = df[driv].sum(axis=1).to_numpy()
-        Ts, To = calculate_temp_anomalies(radiative_forcing, lambda_sum,
-                                          gamma)  # kaller opp funksjonen som regner ut temperaturendringene
-        temp = pd.DataFrame(index=df.index)  # vi lager en ny dataramme som har samme indexer (i.e. årstal) som pådrivet
-        temp['Overflate'] = Ts
-        temp['Dyphavet'] = To
-
         fig3 = px.line(data_frame=temp, template=Template)
         fig3.update_traces(mode='lines')
         fig3.update_yaxes(title=dict(text=r'$\Delta T [^{\circ} C]$'))
@@ -202,5 +160,57 @@ def tegn_temp_graf(driv, my_lambda=-1.3, my_gamma=-0.69):
     return fig3
 
 
+# Strålingspådrivgraf
+def update_graph(dff, check_Sum):
+    aar = dff.index.to_numpy()
+    if check_Sum:
+        return figurmal(('sum',), lambda: paadrivsfigur(dff, check_Sum),
+                        [{'x': aar, 'y': dff.sum(axis=1).to_numpy()}])
+    return figurmal(('paadriv', tuple(dff.columns)), lambda: paadrivsfigur(dff, check_Sum),
+                    [{'x': aar, 'y': dff[kolonne].to_numpy()} for kolonne in dff.columns])
+
+
+def tegn_temp_graf(driv, my_lambda=-1.3, my_gamma=-0.69):
+    lambda_sum = float(my_lambda)
+    gamma = float(my_gamma)
+
+    if len(driv) == 0:
+        return figurmal(('tom',), lambda: temperaturfigur(None),
+                        [{'x': df.index.tolist(), 'y': np.zeros(len(df.index))}])
+
+    Ts, To = sum_respons(historisk, driv, lambda_sum, gamma)  # summerer bufrede responser
+    aar = df.index.to_numpy()
+
+    def lag():
+        temp = pd.DataFrame(index=df.index)  # vi lager en ny dataramme som har samme indexer (i.e. årstal) som pådrivet
+        temp['Overflate'] = Ts
+        temp['Dyphavet'] = To
+        return temperaturfigur(temp)
+
+    return figurmal(('temperatur',), lag, [{'x': aar, 'y': Ts}, {'x': aar, 'y': To}])
+
+
+# Begge figurene tegnes av én callback, slik at utvalget av pådriv gjøres én gang per
+# endring. Temperaturgrafen avhenger ikke av check_Sum og tegnes ikke på nytt når bare
+# den endres.
+@app.callback(
+    Output(component_id='small-graph', component_property='figure'),
+    Output(component_id='my-graph', component_property='figure'),
+    [Input(component_id='my_checklist', component_property='value'),
+     Input(component_id='check_Sum', component_property='value')],
+)
+def oppdater_figurer(paadriv, check_Sum):
+    endret = {utloser['prop_id'].split('.')[0] for utloser in callback_context.triggered}
+    dff = df[paadriv]
+
+    if endret == {'check_Sum'}:
+        fig_temp = no_update
+    else:
+        fig_temp = tegn_temp_graf(paadriv)
+    return update_graph(dff, check_Sum), fig_temp
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=83)
@@ -8,19 +8,30 @@
 # Bjarte Ursin
 # bjarte.ursin@vlfk.no
 ##########################
+import itertools
+import math
+import re
 import numpy as np
 import plotly.express as px
 import pandas as pd
-import os.path
 from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
-df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data", 'historical_IPCC6.csv'),
-                 index_col=0, sep=',', encoding="utf-8")
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.datasett import delt, sti
+from ebm.figurer import Figurmal
+from ebm.respons import forvarm_respons
+from ebm.responsnett import responsnett, sum_respons
 
-df['total'] = df.sum(axis=1)
+historisk = sti('historical_IPCC6.csv')
+df = delt('historisk')  # med kolonnen 'total'
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -33,6 +44,8 @@ app = Dash(__name__,
 load_figure_template(Template)
 # ---------------------------------------------------------------
 app.layout = dbc.Container([
+    # tolk_parametre for standardverdiene i tekstboksene
+    dcc.Store(id='parametre', data={'lambda': [-3.22, -0.5, 1.77, 0.35, 0.42], 'gamma': -0.69}),
     dbc.Row([
         dbc.Col([
             html.H1(app.title,
@@ -50,7 +63,7 @@ app.layout = dbc.Container([
                             dbc.InputGroup(
                                 #                  [dbc.InputGroupText(dbc.Checkbox(id='check_Planck',value=True)),dbc.InputGroupText("Planck"),
                                 [dbc.InputGroupText("Planck"),
-                                 dbc.Input(id='my_Planck', type='text', value='-3.22')],
+                                 dbc.Input(id='my_Planck', type='text', value='-3.22', debounce=True)],
                             )
                         ], lg=3, md=6, align="end"),
 
@@ -58,7 +71,7 @@ app.layout = dbc.Container([
                             dbc.InputGroup(
                                 [dbc.InputGroupText(dbc.Checkbox(id='check_Laps', value=True)),
                                  dbc.InputGroupText("Lapse rate"),
-                                 dbc.Input(id='my_Laps', type='text', value='-0.5')],
+                                 dbc.Input(id='my_Laps', type='text', value='-0.5', debounce=True)],
                             )
                         ], lg=3, md=6, align="end"),
 
@@ -66,7 +79,7 @@ app.layout = dbc.Container([
                             dbc.InputGroup(
                                 [dbc.InputGroupText(dbc.Checkbox(id='check_Water', value=True)),
                                  dbc.InputGroupText("Vanndamp"),
-                                 dbc.Input(id='my_Water', type='text', value='1.77')],
+                                 dbc.Input(id='my_Water', type='text', value='1.77', debounce=True)],
                             )
                         ], lg=3, md=6, align="end"),
 
@@ -74,7 +87,7 @@ app.layout = dbc.Container([
                             dbc.InputGroup(
                                 [dbc.InputGroupText(dbc.Checkbox(id='check_Albedo', value=True)),
                                  dbc.InputGroupText("Albedo"),
-                                 dbc.Input(id='my_Albedo', type='text', value='0.35')],
+                                 dbc.Input(id='my_Albedo', type='text', value='0.35', debounce=True)],
                             )
                         ], lg=3, md=6, align="end"),
 
@@ -82,14 +95,14 @@ app.layout = dbc.Container([
                             dbc.InputGroup(
                                 [dbc.InputGroupText(dbc.Checkbox(id='check_Clouds', value=True)),
                                  dbc.InputGroupText("Skyer"),
-                                 dbc.Input(id='my_Clouds', type='text', value='0.42')],
+                                 dbc.Input(id='my_Clouds', type='text', value='0.42', debounce=True)],
                             )
                         ], lg=3, md=6, align="end"),
 
                         dbc.Col([
                             dbc.InputGroup([dbc.InputGroupText(dbc.Checkbox(id='check_Gamma', value=True)),
                                             dbc.InputGroupText("Gamma"),
-                                            dbc.Input(id='my_Gamma', type='text', value='-0.69')],
+                                            dbc.Input(id='my_Gamma', type='text', value='-0.69', debounce=True)],
                                            )
                         ], lg=3, md=6, align="end"),
                         dbc.Col([
@@ -144,101 +157,77 @@ app.layout = dbc.Container([
 
 
 # _________________________________________________________________________________________________________
-def calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma):
-    H_MIX = 100  # tykkelse av blandingslaget [m]
-    H_DEEP = 3700 - H_MIX  # gjennomsnitts tykkelse av dyphavet [m]
-    RHO = 1000  # vannets tetthet (kg m-3)
-    CPO = 4200  # spesifikk varmekapasitet for vann(J kg-1 K-1)
-    f_o = 0.7  # andel av jordens overflate dekket av vann
-
-    Dt = 365 * 24 * 60 * 60  # steglenge i modellen - 1 år i sekund
-
-    # effektiv varmekapasitet for atmosfære-hav-systemet [J m-2 K-1]
-    # Hvor mye energi skal til for å heve en vannsøyle med grunnflate en kvadratmeter og høyde
-    # tilsvarende havdybden en grad.
-
-    CEFF_M = f_o * H_MIX * CPO * RHO
-    CEFF_D = f_o * H_DEEP * CPO * RHO
-
-    Ts = np.array([0])  # Starter temperaturseriene med temperaturen første år.
-    To = np.array([0])
-
-    for t in range(1, len(radiative_forcing)):
-        # --------------
-        # Temperatur tendenser (den deriverte) [K/s]
-        #     dTs/dt, dTo/dt
-        # --------------
-        dTs_dt = (radiative_forcing[t] + (lambda_sum * Ts[t - 1]) + (gamma * (Ts[t - 1] - To[t - 1]))) / CEFF_M
-        dTo_dt = -gamma * (Ts[t - 1] - To[t - 1]) / CEFF_D
-
-        # ----------------------------------------------------------------------
-        # Antar konstant temperaturendring i løpet av et år, regner ut ny temperatur
-        # ved hjelp av Eulermetoden og oppdaterer temperaturarrayene
-        # ----------------------------------------------------------------------
-        Ts = np.append(Ts, Ts[t - 1] + dTs_dt * Dt)
-        To = np.append(To, To[t - 1] + dTo_dt * Dt)
-    return Ts, To
-
-
-@app.callback(
-    Output(component_id='my-graph', component_property='figure'),
-    #     [Input(component_id='modell_knapp', component_property='n_clicks')],
-    [Input(component_id='my_checklist', component_property='value'),
-     Input(component_id='check_Laps', component_property='value'),
-     Input(component_id='check_Water', component_property='value'),
-     Input(component_id='check_Albedo', component_property='value'),
-     Input(component_id='check_Clouds', component_property='value'),
-     Input(component_id='check_Gamma', component_property='value'),
-     Input(component_id='my_Planck', component_property='value'),
-     Input(component_id='my_Laps', component_property='value'),
-     Input(component_id='my_Water', component_property='value'),
-     Input(component_id='my_Albedo', component_property='value'),
-     Input(component_id='my_Clouds', component_property='value'),
-     Input(component_id='my_Gamma', component_property='value'),
-     Input(component_id='check_Null', component_property='value')
-     ],
-    prevent_initial_call=False
+# Responsen på hvert pådriv regnes ut ved oppstart for alle kombinasjoner av avhukingene
+# med standardverdiene i tekstboksene. Lambda summeres i samme rekkefølge som i
+# tegn_temp_graf, slik at verdiene blir nøyaktig like og treffer bufferen.
+standardverdier = []
+for valg in itertools.product([True, False], repeat=5):
+    lambda_standard = float('-3.22')
+    for verdi, med in zip(['-0.5', '1.77', '0.35', '0.42'], valg):
+        if med:
+            lambda_standard += float(verdi)
+    standardverdier.append((lambda_standard, float('-0.69') if valg[4] else 0))
+forvarm_respons(historisk, standardverdier)
+# Andre verdier interpoleres i rutenettet i ebm.responsnett, eller regnes ut eksakt
+# utenfor det.
+responsnett(historisk)
+
+
+# Tekstboksene oppdateres først når eleven trykker Enter eller går ut av boksen (debounce).
+# Tallene tolkes i nettleseren (ebm.tilbakekobling_parametre i assets/klientfigurer.js),
+# som markerer ugyldige bokser og bare sender gyldige og endrede verdier videre til
+# serveren gjennom dcc.Store-en parametre.
+TALL = re.compile(r' *[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)? *')
+
+
+def les_tall(tekst):
+    # Tallet i tekstboksen, eller None hvis teksten ikke er et endelig tall (f.eks. '-' eller '1e')
+    if not isinstance(tekst, str) or TALL.fullmatch(tekst) is None:
+        return None
+    tall = float(tekst)
+    return tall if math.isfinite(tall) else None
+
+
+def tolk_parametre(tekster, med):
+    """
+    Python-versjonen av ebm.tilbakekobling_parametre. tekster er verdiene i de seks
+    tekstboksene (Planck, lapse rate, vanndamp, albedo, skyer, gamma) og med om hver
+    av dem er avhuket (Planck er alltid med). Gir (parametre, ugyldig), der parametre
+    er None hvis en avhuket boks er ugyldig, og ugyldig sier hvilke bokser som markeres.
+    """
+    tall = [les_tall(tekst) for tekst in tekster]
+    ugyldig = [verdi is None for verdi in tall]
+    if any(u and m for u, m in zip(ugyldig, med)):
+        return None, ugyldig
+    return {'lambda': [verdi for verdi, m in zip(tall[:5], med[:5]) if m],
+            'gamma': tall[5] if med[5] else 0}, ugyldig
+
+
+BOKSER = ['my_Planck', 'my_Laps', 'my_Water', 'my_Albedo', 'my_Clouds', 'my_Gamma']
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='tilbakekobling_parametre'),
+    [Output(component_id='parametre', component_property='data')] +
+    [Output(component_id=boks, component_property='invalid') for boks in BOKSER],
+    [Input(component_id=boks, component_property='value') for boks in BOKSER] +
+    [Input(component_id=avkrysning, component_property='value')
+     for avkrysning in ['check_Laps', 'check_Water', 'check_Albedo', 'check_Clouds', 'check_Gamma']],
+    [State(component_id='parametre', component_property='data')]
 )
-def tegn_temp_graf(driv, check_Laps, check_Water, check_Albedo, check_Clouds, check_Gamma,
-                   my_Planck, my_Laps, my_Water, my_Albedo, my_Clouds, my_Gamma, check_Null):
-    aar = df.index.tolist()
-    lambda_sum = float(my_Planck)
-    gamma = 0
 
-    if check_Laps:
-        lambda_sum += float(my_Laps)
 
-    if check_Water:
-        lambda_sum += float(my_Water)
+# Figuren bygges med plotly.express første gang (temperaturfigur), og callbacken bytter
+# bare inn tallene i kopier av den (ebm.figurer.Figurmal).
+figurmal = Figurmal()
 
-    if check_Albedo:
-        lambda_sum += float(my_Albedo)
 
-    if check_Clouds:
-        lambda_sum += float(my_Clouds)
-
-    if check_Gamma:
-        gamma = float(my_Gamma)
-
-    # print(lambda_sum)
-
-    if len(driv) == 0:
+def temperaturfigur(temp):
+    # temp er None når ingen pådriv er valgt
+    if temp is None:
+        aar = df.index.tolist()
         null = np.zeros(len(aar))
         fig3 = px.line(x=aar, y=null, title='Velg minst ett strålingspådriv for å kjøre modell', template=Template)
         fig3.update_layout(showlegend=False)
     else:
-
-        radiative_forcing = df[driv].sum(axis=1).to_numpy()
-        Ts, To = calculate_temp_anomalies(radiative_forcing, lambda_sum,
-                                          gamma)  # kaller opp funksjonen som regner ut temperaturendringene
-        temp = pd.DataFrame(index=df.index)  # vi lager en ny dataramme som har samme indexer (i.e. årstal) som pådrivet
-        temp['Overflate'] = Ts
-        temp['Dyphavet'] = To
-
-        if check_Null:
-            temp['Overflate'] = temp['Overflate'] - temp['Overflate'].loc[1986:2005].mean()
-            temp['Dyphavet'] = temp['Dyphavet'] - temp['Dyphavet'].loc[1986:2005].mean()
-
         fig3 = px.line(data_frame=temp, template=Template)
         fig3.update_traces(mode='lines')
         fig3.update_yaxes(title=dict(text=r'$\Delta T [^{\circ} C]$'))
@@ -255,5 +244,42 @@ def tegn_temp_graf(driv, check_Laps, check_Water, check_Albedo, check_Clouds, ch
     return fig3
 
 
+@app.callback(
+    Output(component_id='my-graph', component_property='figure'),
+    #     [Input(component_id='modell_knapp', component_property='n_clicks')],
+    [Input(component_id='my_checklist', component_property='value'),
+     Input(component_id='parametre', component_property='data'),
+     Input(component_id='check_Null', component_property='value')
+     ],
+    prevent_initial_call=False
+)
+def tegn_temp_graf(driv, parametre, check_Null):
+    lambda_sum = sum(parametre['lambda'])  # Planck først, samme rekkefølge som i standardverdier
+    gamma = parametre['gamma']
+
+    # print(lambda_sum)
+
+    if len(driv) == 0:
+        return figurmal(('tom',), lambda: temperaturfigur(None),
+                        [{'x': df.index.tolist(), 'y': np.zeros(len(df.index))}])
+
+    Ts, To = sum_respons(historisk, driv, lambda_sum, gamma)  # bufrede eller interpolerte responser
+    if check_Null:
+        periode = (df.index >= 1986) & (df.index <= 2005)
+        Ts = Ts - Ts[periode].mean()
+        To = To - To[periode].mean()
+    aar = df.index.to_numpy()
+
+    def lag():
+        temp = pd.DataFrame(index=df.index)  # vi lager en ny dataramme som har samme indexer (i.e. årstal) som pådrivet
+        temp['Overflate'] = Ts
+        temp['Dyphavet'] = To
+        return temperaturfigur(temp)
+
+    return figurmal(('temperatur',), lag, [{'x': aar, 'y': Ts}, {'x': aar, 'y': To}])
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=84)
@@ -8,18 +8,30 @@
 # Bjarte Ursin
 # bjarte.ursin@vlfk.no
 ##########################
+import functools
+import itertools
+import threading
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import os.path
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash import Dash, callback_context, dcc, html, no_update
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
-df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data', 'futureForcing_IPCC6.csv'),
-                 index_col=0, sep=',', encoding="utf-8")
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.datasett import delt
+from ebm.ensemble import PERSENTILER, ensemble_persentiler, trekk_parametre
+from ebm.figurer import Figurmal, omhylling
+from ebm.respons import responstabell
+
+df = delt('framtid')
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -71,6 +83,7 @@ app.layout = dbc.Container([
                                     {'label': 'Dyphav', 'value': 'hav'},
                                     {'label': 'Nullnivå 1986-2005', 'value': '1986:2005'},
                                     {'label': 'Usikkerhet i lambda', 'value': 'lambda'},
+                                    {'label': 'Ensemble 5-95 %', 'value': 'ensemble'},
                                 ],
                                 value=['hav'],
                                 inline=True)  # ,width=8)
@@ -92,6 +105,9 @@ app.layout = dbc.Container([
                       mathjax=True,
                       )], width=8)
     ]),
+    dcc.Store(id='modellvalg', data=['hav']),  # modellvalg(value) for my_checklist2
+    dcc.Store(id='paadrivsdata'),
+    dcc.Store(id='temperaturdata'),
     dbc.Row([
         dbc.Card([
             dbc.CardBody([
@@ -123,55 +139,20 @@ app.layout = dbc.Container([
 
 # _________________________________________________________________________________________________________
 #
-def calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma):
-    H_MIX = 100  # tykkelse av blandingslaget [m]
-    H_DEEP = 3700 - H_MIX  # gjennomsnitts tykkelse av dyphavet [m]
-    RHO = 1000  # vannets tetthet (kg m-3)
-    CPO = 4200  # spesifikk varmekapasitet for vann(J kg-1 K-1)
-    f_o = 0.7  # andel av jordens overflate dekket av vann
-
-    Dt = 365 * 24 * 60 * 60  # steglenge i modellen - 1 år i sekund
-
-    # effektiv varmekapasitet for atmosfære-hav-systemet [J m-2 K-1]
-    # Hvor mye energi skal til for å heve en vannsøyle med grunnflate en kvadratmeter og høyde
-    # tilsvarende havdybden en grad.
-
-    CEFF_M = f_o * H_MIX * CPO * RHO
-    CEFF_D = f_o * H_DEEP * CPO * RHO
-
-    Ts = np.array([0])  # Starter temperaturseriene med temperaturen første år.
-    To = np.array([0])
-
-    for t in range(1, len(radiative_forcing)):
-        # --------------
-        # Temperatur tendenser (den deriverte) [K/s]
-        #     dTs/dt, dTo/dt
-        # --------------
-        dTs_dt = (radiative_forcing[t] + (lambda_sum * Ts[t - 1]) + (gamma * (Ts[t - 1] - To[t - 1]))) / CEFF_M
-        dTo_dt = -gamma * (Ts[t - 1] - To[t - 1]) / CEFF_D
-
-        # ----------------------------------------------------------------------
-        # Antar konstant temperaturendring i løpet av et år, regner ut ny temperatur
-        # ved hjelp av Eulermetoden og oppdaterer temperaturarrayene
-        # ----------------------------------------------------------------------
-        Ts = np.append(Ts, Ts[t - 1] + dTs_dt * Dt)
-        To = np.append(To, To[t - 1] + dTo_dt * Dt)
-    return Ts, To
+# Perioden (slide1) og nullnivået endrer bare aksene og forskyver kurvene. Serveren sender
+# figurene uten akseområder til en dcc.Store, sammen med omhyllingen av kurvene
+# (ebm.figurer.omhylling), og nettleseren tegner dem for valgt periode og nullnivå
+# (assets/klientfigurer.js). Bare endringer i utviklingsbaner og modellvalg går til serveren.
+NULLNIVAAER = {'1750': (1750, 1750), '1986:2005': (1986, 2005)}
 
 
-#
-@app.callback(
-    Output(component_id='small-graph', component_property='figure'),
-    [Input(component_id='my_checklist', component_property='value'),
-     Input(component_id='slide1', component_property='value')]
-)
-def update_graph(paadriv, periode):
-    dff = df[paadriv]
+# Figurene bygges med plotly.express første gang hvert utvalg vises (paadrivsfigur og
+# temperaturfigur), og senere byttes bare tallene inn i kopier av dem (ebm.figurer.Figurmal).
+figurmal = Figurmal()
 
-    fig = px.line(data_frame=dff, title='Samlet strålingspådriv', template=Template)  # template='ggplot2'
 
-    ymax = np.max(dff.loc[periode[0]:periode[1]].max())
-    ymin = np.min(dff.loc[periode[0]:periode[1]].min())
+def paadrivsfigur(dff):
+    fig = px.line(data_frame=dff, title='Samlet strålingspådriv', template=Template)  # template='ggplot2'
 
     fig.update_traces(mode='lines')
     fig.update_yaxes(title=dict(text=r'$W / m^2$'))  # ,showgrid=True, gridwidth=1, gridcolor='white')
@@ -184,14 +165,20 @@ def update_graph(paadriv, periode):
         x=0.01,
         title="Utviklingbaner"
     ),
-        xaxis_range=[periode[0], periode[1]],
-        yaxis_range=[ymin * 1.05, ymax * 1.05],
         height=400
     )
-
     return fig
 
 
+def paadrivsdata(dff):
+    aar = dff.index.to_numpy()
+    figur = figurmal(('paadriv', tuple(dff.columns)), lambda: paadrivsfigur(dff),
+                     [{'x': aar, 'y': dff[kolonne].to_numpy()} for kolonne in dff.columns])
+    return {'figur': figur,
+            'x0': int(dff.index[0]),
+            'omhylling': omhylling(dff.to_numpy().T)}
+
+
 lambda_planck = (-3.22, -3.4, -3.0, 'high')
 lamdba_WV = (1.77, 1.57, 1.97, 'high')  # from Zelinka et al., 2020 (one standard deviation)
 lamdba_LR = (-0.5, -0.7, -0.3, 'high')  # from Dessler, 2013; Caldwell et al., 2016; Colman and Hanson,
@@ -212,52 +199,64 @@ Std = sum_var ** 0.5
 lambda_sum_min = lambda_sum - Std
 lambda_sum_max = lambda_sum + Std
 
+# Alle utviklingsbaner regnes ut én gang ved oppstart, med og uten dyphav og for sentral,
+# minste og største lambda. Tabellene har form (utviklingsbane, gamma, lambda, år), og
+# callbackene henter bare ut det som er valgt.
+utviklingsbaner = [kolonne for kolonne in df.columns if kolonne.startswith('SSP')]
+gammaer = [-0.69, 0]  # med og uten dyphav
+tabell_Ts, tabell_To = responstabell(df[utviklingsbaner], [lambda_sum, lambda_sum_min, lambda_sum_max], gammaer)
 
-# Temperaturanomali
-@app.callback(
-    Output(component_id='my-graph', component_property='figure'),
-    [Input(component_id='my_checklist', component_property='value'),
-     Input(component_id='my_checklist2', component_property='value'),
-     Input(component_id='slide1', component_property='value')],
-)
-def update_temperatur(paadriv, check, periode):
-#    global nullnivaa
-    dff = df[paadriv]
-    nivaa1 = 1750
-    nivaa2 = 1750
+# Monte Carlo-ensemble: hver tilbakekobling (og gamma) trekkes uavhengig. Usikkerheten i gamma
+# er ikke oppgitt i kilden og er her antatt å være +-0.2 (to standardavvik).
+gamma_hav = (-0.69, -0.89, -0.49)
+ensemble_lambda, ensemble_gamma = trekk_parametre(10000,
+                                                  [lambda_planck, lamdba_WV, lamdba_LR, lambda_albedo, lambda_cloud],
+                                                  gamma_hav, seed=613)
 
-    if '1986:2005' in check:
-        nivaa1 = 1986
-        nivaa2 = 2005
 
-    if 'hav' in check:
-        gamma = -0.69
-    else:
-        gamma = 0
+@functools.lru_cache(maxsize=64)
+def ensemble_vifte(bane, hav, nivaa1, nivaa2):
+    # Persentilene (5, 17, 50, 83, 95) for én utviklingsbane, regnes ut første gang de trengs
+    gamma = ensemble_gamma if hav else 0
+    nullnivaa = (df.index.get_loc(nivaa1), df.index.get_loc(nivaa2) + 1)
+    return ensemble_persentiler(df[bane].to_numpy(), ensemble_lambda, gamma, nullnivaa=nullnivaa)
+
+
+def _regn_ut_vifter(valg):
+    for (hav, navn), bane in itertools.product(valg, utviklingsbaner):
+        ensemble_vifte(bane, hav, *NULLNIVAAER[navn])
+
+
+# Viftene for standardvalgene (med dyphav, nullnivå 1750) regnes ut ved oppstart, som
+# tabell_Ts, og resten i en bakgrunnstråd, så første klikk på ensemblet ikke må vente.
+_regn_ut_vifter([(True, '1750')])
+threading.Thread(target=_regn_ut_vifter, args=([(True, '1986:2005'), (False, '1750'), (False, '1986:2005')],),
+                 name='ensemble_vifter', daemon=True).start()
+
+
+def modellvalg(check):
+    # Valgene i my_checklist2 som krever en ny utregning på serveren. Nullnivået er bare med
+    # når ensemblet vises, fordi persentilene regnes ut etter at hvert medlem har fått sitt
+    # eget nullnivå. Ellers er nullnivået bare en forskyvning av hver kurve.
+    # Python-versjonen av ebm.framtid_modellvalg i assets/klientfigurer.js.
+    return [valg for valg in check if valg != '1986:2005' or 'ensemble' in check]
 
-    temp = pd.DataFrame(index=dff.index)
 
-    for i in range(len(paadriv)):
-        temp[paadriv[i]], To = calculate_temp_anomalies(dff[paadriv[i]].to_numpy(), lambda_sum, gamma)
-        nullnivaa = temp[paadriv[i]].loc[nivaa1:nivaa2].mean()
-        temp[paadriv[i]] = temp[paadriv[i]] - nullnivaa
+def temperaturfigur(dff, Ts, check, persentiler):
+    # Ts har form (utviklingsbane, lambda, år), og persentiler er ensemble_vifte for hver
+    # utviklingsbane når ensemblet vises
+    paadriv = list(dff.columns)
+    temp = pd.DataFrame(Ts[:, 0, :].T, index=dff.index, columns=paadriv)
 
     fig = px.line(data_frame=temp, title='Temperaturanomali overflate', template=Template)
     fig.update_yaxes(title=dict(text=r'$\Delta T [^{\circ} C]$'))
     fig.update_xaxes(title=dict(text='År'))
 
-    ymax = np.max(temp.loc[periode[0]:periode[1]].max())
-    ymin = np.min(temp.loc[periode[0]:periode[1]].min())
-
     if 'lambda' in check:
-        min_temp = pd.DataFrame(index=dff.index)
-        max_temp = pd.DataFrame(index=dff.index)
+        min_temp = pd.DataFrame(Ts[:, 1, :].T, index=dff.index, columns=paadriv)
+        max_temp = pd.DataFrame(Ts[:, 2, :].T, index=dff.index, columns=paadriv)
 
         for i in range(len(paadriv)):
-            min_temp[paadriv[i]], To = calculate_temp_anomalies(dff[paadriv[i]].to_numpy(), lambda_sum_min, gamma)
-            min_temp[paadriv[i]] = min_temp[paadriv[i]] - nullnivaa
-            max_temp[paadriv[i]], To = calculate_temp_anomalies(dff[paadriv[i]].to_numpy(), lambda_sum_max, gamma)
-            max_temp[paadriv[i]] = max_temp[paadriv[i]] - nullnivaa
             fig.add_trace(go.Scatter(x=max_temp.index, y=max_temp[paadriv[i]],
                                      fill='none',
                                      mode='lines',
@@ -276,8 +275,26 @@ def update_temperatur(paadriv, check, periode):
                                      opacity=0.01
                                      ))
 
-        ymax = np.max([max_temp.loc[periode[0]:periode[1]].max(), min_temp.loc[periode[0]:periode[1]].min()])
-        ymin = np.min([max_temp.loc[periode[0]:periode[1]].max(), min_temp.loc[periode[0]:periode[1]].min()])
+    for i, vifte in enumerate(persentiler):
+        # ytre bånd 5-95 %, indre bånd 17-83 %
+        for ovre, nedre in [(4, 0), (3, 1)]:
+            fig.add_trace(go.Scatter(x=dff.index, y=vifte[ovre],
+                                     fill='none',
+                                     mode='lines',
+                                     line_color=px.colors.qualitative.Plotly[i],
+                                     showlegend=False,
+                                     name=f'{PERSENTILER[ovre]} %',
+                                     opacity=0.01
+                                     ))
+
+            fig.add_trace(go.Scatter(x=dff.index, y=vifte[nedre],
+                                     fill='tonexty',
+                                     mode='lines',
+                                     line_color=px.colors.qualitative.Plotly[i],
+                                     showlegend=False,
+                                     name=f'{PERSENTILER[nedre]} %',
+                                     opacity=0.01
+                                     ))
 
     fig.update_layout(legend=dict(
         # orientation="h",
@@ -287,13 +304,113 @@ def update_temperatur(paadriv, check, periode):
         x=0.01,
         title="Utviklingbaner"
     ),
-        xaxis_range=[periode[0], periode[1]],
-        yaxis_range=[ymin * 1.05, ymax * 1.05],
         height=400
     )
-
     return fig
 
 
+# Temperaturanomali
+def temperaturdata(dff, check):
+    paadriv = list(dff.columns)
+
+    if 'hav' in check:
+        gamma = -0.69
+    else:
+        gamma = 0
+
+    n_lambda = 1
+    if 'lambda' in check:
+        n_lambda = 3
+
+    # (utviklingsbane, lambda, år) for de valgte utviklingsbanene
+    Ts = tabell_Ts[[utviklingsbaner.index(bane) for bane in paadriv], gammaer.index(gamma), :n_lambda]
+    nullnivaa = {navn: Ts[:, 0, (dff.index >= fra) & (dff.index <= til)].mean(axis=1)
+                 for navn, (fra, til) in NULLNIVAAER.items()}
+
+    # Nullnivået kurvene tegnes med, og de nettleseren kan bytte mellom
+    if 'ensemble' in check:
+        tegnet = '1986:2005' if '1986:2005' in check else '1750'
+        valgbare = [tegnet]
+    else:
+        tegnet = '1750'
+        valgbare = list(NULLNIVAAER)
+    Ts = Ts - nullnivaa[tegnet][:, np.newaxis, np.newaxis]
+
+    # Kurvene i samme rekkefølge som i temperaturfigur: utviklingsbanene, så største og
+    # minste lambda for hver bane, så båndene fra ensemblet
+    linjer = list(Ts[:, 0, :])
+    baner = list(range(len(paadriv)))  # utviklingsbanen til hver kurve, None for ensemblet
+    if 'lambda' in check:
+        for i in range(len(paadriv)):
+            linjer += [Ts[i, 2], Ts[i, 1]]
+            baner += [i, i]
+    persentiler = []
+    if 'ensemble' in check:
+        persentiler = [ensemble_vifte(bane, 'hav' in check, *NULLNIVAAER[tegnet]) for bane in paadriv]
+        for vifte in persentiler:
+            # ytre bånd 5-95 %, indre bånd 17-83 %
+            linjer += [vifte[4], vifte[0], vifte[3], vifte[1]]
+            baner += [None] * 4
+    vifter = [vifte[[0, 4]] for vifte in persentiler]
+
+    aar = dff.index.to_numpy()
+    figur = figurmal(('temperatur', tuple(paadriv), 'lambda' in check, 'ensemble' in check),
+                     lambda: temperaturfigur(dff, Ts, check, persentiler),
+                     [{'x': aar, 'y': linje} for linje in linjer])
+
+    visninger = {}
+    for navn in valgbare:
+        forskyvning = nullnivaa[navn] - nullnivaa[tegnet]
+        kurver = (Ts - forskyvning[:, np.newaxis, np.newaxis]).reshape(-1, len(dff.index))
+        visninger[navn] = {'forskyvning': [0 if bane is None else float(forskyvning[bane]) for bane in baner],
+                           'omhylling': omhylling(np.concatenate([kurver] + vifter))}
+    return {'figur': figur,
+            'x0': int(dff.index[0]),
+            'nullnivaa': visninger}
+
+
+@app.callback(
+    Output(component_id='paadrivsdata', component_property='data'),
+    Output(component_id='temperaturdata', component_property='data'),
+    [Input(component_id='my_checklist', component_property='value'),
+     Input(component_id='modellvalg', component_property='data')],
+)
+def oppdater_figurer(paadriv, valg):
+    # Pådrivsgrafen avhenger ikke av modellvalgene og regnes ikke ut på nytt når bare de endres
+    endret = {utloser['prop_id'].split('.')[0] for utloser in callback_context.triggered}
+    dff = df[paadriv]
+
+    if endret == {'modellvalg'}:
+        data_paadriv = no_update
+    else:
+        data_paadriv = paadrivsdata(dff)
+    return data_paadriv, temperaturdata(dff, valg)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='framtid_modellvalg'),
+    Output(component_id='modellvalg', component_property='data'),
+    Input(component_id='my_checklist2', component_property='value'),
+    State(component_id='modellvalg', component_property='data')
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='framtid_paadriv'),
+    Output(component_id='small-graph', component_property='figure'),
+    Input(component_id='paadrivsdata', component_property='data'),
+    Input(component_id='slide1', component_property='value')
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='ebm', function_name='framtid_temperatur'),
+    Output(component_id='my-graph', component_property='figure'),
+    Input(component_id='temperaturdata', component_property='data'),
+    Input(component_id='slide1', component_property='value'),
+    Input(component_id='my_checklist2', component_property='value')
+)
+
+
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=60)
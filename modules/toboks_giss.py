@@ -12,24 +12,34 @@
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import os.path
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template  # Bruker bootstap-template i plotly grafene
 
+if __name__ == '__main__':
+    # kjørt som skript (python modules/<navn>.py): ebm ligger i rotmappen, som i code/toboks.py
+    import os.path
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebm.datasett import delt, les, sti
+from ebm.kalibrering import kalibrer
+from ebm.respons import sum_respons
+
 # df=pd.read_csv('historical.csv',index_col = 0,sep=',',encoding = "utf-8")
-df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)),'../data','historical_IPCC6.csv'),
-                 index_col=0, sep=',', encoding="utf-8")
+historisk = sti('historical_IPCC6.csv')
+df = les(historisk)
 
 # df['total']=df.sum(axis=1)
-data =  pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)),'../data','graph.csv'), skiprows=1, index_col=0)
-error = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)),'../data','totalCI_ERA.csv'), index_col=0)
-data['Max'] = data['No_Smoothing'] + error['ci95']
-data['Min'] = data['No_Smoothing'] - error['ci95']
+data = delt('giss')  # med Max og Min (No_Smoothing +- ci95)
 
 lambda_sum = -1.3  # [Wm-2K-1] - Parameter for tilbakekobling,sum av gjennomsnitt fra Soden and Held (2006)
 gamma = -0.69  # [Wm-2K-1] - effektivitet for opptak av varme i dyphav fra Dufresne and Bony (2008)
+kalibrering = kalibrer()  # lambda_sum og gamma tilpasset GISS, se ebm.kalibrering
+# Ligger det beste punktet på kanten av rutenettet, er det ikke et ekte minimum, og da
+# vises ikke kurven for de tilpassede verdiene
+tilpasset = not kalibrering['paa_grensen']
 
 Template = 'flatly'  # bruk samme "theme" som under, men med småbokstaver
 app = Dash(__name__,
@@ -70,7 +80,10 @@ app.layout = dbc.Container([
                                 value=['drivhusgasser', 'solinnstråling', 'vulkanisme', 'arealbruk', 'aerosoler'],
                                 # hukker alle av til å begynne med.
                                 inline=True)  # ,width=8)
-                        ], className="col-md-8")
+                        ], className="col-md-8"),
+                        dbc.Col([
+                            dbc.Switch(id='kalibrert', label='Tilpasset GISS', value=False, disabled=not tilpasset),
+                        ], className="col-md-2"),
                     ])
                 ])
             ], color="primary", inverse=True, class_name="mb-3")
@@ -79,6 +92,13 @@ app.layout = dbc.Container([
     dbc.Row([
         dbc.Col([
             dcc.Graph(id='my-graph', figure={},
+                      mathjax=True,
+                      ),
+            html.P(id='parametre', className='text-center')])
+    ]),
+    dbc.Row([
+        dbc.Col([
+            dcc.Graph(id='misfit-graph', figure={},
                       mathjax=True,
                       )])
     ])
@@ -86,59 +106,62 @@ app.layout = dbc.Container([
 
 
 # ---------------------------------------------
-def calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma):
-    H_MIX = 100  # tykkelse av blandingslaget [m]
-    H_DEEP = 3700 - H_MIX  # gjennomsnitts tykkelse av dyphavet [m]
-    RHO = 1000  # vannets tetthet (kg m-3)
-    CPO = 4200  # spesifikk varmekapasitet for vann(J kg-1 K-1)
-    f_o = 0.7  # andel av jordens overflate dekket av vann
-
-    Dt = 365 * 24 * 60 * 60  # steglenge i modellen - 1 år i sekund
-
-    # effektiv varmekapasitet for atmosfære-hav-systemet [J m-2 K-1]
-    # Hvor mye energi skal til for å heve en vannsøyle med grunnflate en kvadratmeter og høyde
-    # tilsvarende havdybden en grad.
-
-    CEFF_M = f_o * H_MIX * CPO * RHO
-    CEFF_D = f_o * H_DEEP * CPO * RHO
-
-    Ts = np.array([0])  # Starter temperaturseriene med temperaturen første år.
-    To = np.array([0])
-
-    for t in range(1, len(radiative_forcing)):
-        # --------------
-        # Temperatur tendenser (den deriverte) [K/s]
-        #     dTs/dt, dTo/dt
-        # --------------
-        dTs_dt = (radiative_forcing[t] + (lambda_sum * Ts[t - 1]) + (gamma * (Ts[t - 1] - To[t - 1]))) / CEFF_M
-        dTo_dt = -gamma * (Ts[t - 1] - To[t - 1]) / CEFF_D
-
-        # ----------------------------------------------------------------------
-        # Antar konstant temperaturendring i løpet av et år, regner ut ny temperatur
-        # ved hjelp av Eulermetoden og oppdaterer temperaturarrayene
-        # ----------------------------------------------------------------------
-        Ts = np.append(Ts, Ts[t - 1] + dTs_dt * Dt)
-        To = np.append(To, To[t - 1] + dTo_dt * Dt)
-    return Ts, To
+# Responsen på hvert pådriv regnes ut her ved oppstart, for standardverdiene og for verdiene
+# tilpasset GISS, og callbacken summerer de valgte.
+parametre = {False: (lambda_sum, gamma)}
+if tilpasset:
+    parametre[True] = (kalibrering['lambda_sum'], kalibrering['gamma'])
+referanseverdier = {}
+for kalibrert, (lambda_verdi, gamma_verdi) in parametre.items():
+    Temps, Tempo = sum_respons(historisk, list(df.columns), lambda_verdi, gamma_verdi, fra_aar=1850)
+    referanseverdier[kalibrert] = np.mean(Temps[101:131])
+
+
+def misfit_figur():
+    # maal (chi2 mot GISS og prioren på lambda) over rutenettet i ebm.kalibrering, med
+    # standardverdiene og minimumet
+    flate = kalibrering['flate']
+    fig = go.Figure()
+    fig.add_trace(go.Contour(x=flate['lambdaer'], y=flate['gammaer'], z=np.log10(flate['maal']),
+                             colorscale='Viridis_r',
+                             colorbar=dict(title=r'$\log_{10} (\chi^2 / s^2 + \mathrm{prior})$'),
+                             name='Avvik fra GISS'))
+    fig.add_trace(go.Scatter(x=[lambda_sum], y=[gamma],
+                             mode='markers',
+                             marker=dict(color='white', size=10, line=dict(color='black', width=1)),
+                             name='Standard'))
+    fig.add_trace(go.Scatter(x=[kalibrering['lambda_sum']], y=[kalibrering['gamma']],
+                             mode='markers',
+                             marker=dict(color='red', size=10, symbol='x'),
+                             name='Tilpasset GISS' + (' (på grensen)' if kalibrering['paa_grensen'] else '')))
+    if kalibrering['paa_grensen']:
+        fig.add_annotation(x=kalibrering['lambda_sum'], y=kalibrering['gamma'],
+                           text='Beste på grensen av rutenettet,<br>ikke et ekte minimum',
+                           showarrow=True, arrowhead=2, ax=-80, ay=40,
+                           bgcolor='white', bordercolor='red')
+    fig.update_xaxes(title=dict(text=r'$\lambda [Wm^{-2}K^{-1}]$'))
+    fig.update_yaxes(title=dict(text=r'$\gamma [Wm^{-2}K^{-1}]$'))
+    fig.update_layout(title='Avvik mellom modell og GISS, vektet med usikkerheten, og prior på λ',
+                      legend=dict(orientation='h', y=-0.2),
+                      height=400)
+    return fig
 
 
-df1 = df.loc[1850:]
-radiative_forcing = df1.sum(axis=1).to_numpy()
-Temps, Tempo = calculate_temp_anomalies(radiative_forcing, lambda_sum, gamma)
-referanseverdi = np.mean(Temps[101:131])
+app.layout['misfit-graph'].figure = misfit_figur()
 
 
 @app.callback(
     Output(component_id='my-graph', component_property='figure'),
-    Input(component_id='my_checklist', component_property='value')
+    Output(component_id='parametre', component_property='children'),
+    Input(component_id='my_checklist', component_property='value'),
+    Input(component_id='kalibrert', component_property='value')
 )
-def tegn_sum_graf(driv):
-    df1 = df.loc[1850:]
-    radiative_forcing = df1[driv].sum(axis=1).to_numpy()
-    Ts, To = calculate_temp_anomalies(radiative_forcing, lambda_sum,
-                                      gamma)  # kaller opp funksjonen som regner ut temperaturendringene
+def tegn_sum_graf(driv, kalibrert):
+    kalibrert = bool(kalibrert) and tilpasset
+    lambda_verdi, gamma_verdi = parametre[kalibrert]
+    Ts, To = sum_respons(historisk, driv, lambda_verdi, gamma_verdi, fra_aar=1850)  # summerer bufrede responser
     # Ts=Ts-np.mean(Ts[101:131])
-    Ts = Ts - referanseverdi  # setter nullnivå 1951-80, med alle strålingspådriv
+    Ts = Ts - referanseverdier[kalibrert]  # setter nullnivå 1951-80, med alle strålingspådriv
     temp = pd.DataFrame(
         index=df.loc[1850:].index)  # vi lager en ny dataramme som har samme indexer (i.e. årstal) som pådrivet
     temp['Temp.endring overflate'] = Ts
@@ -189,8 +212,15 @@ def tegn_sum_graf(driv):
     #         color="RebeccaPurple"
     #     )
     # )
-    return fig
+    tekst = f'λ = {lambda_verdi:.2f} W/m²K, γ = {gamma_verdi:.2f} W/m²K'
+    if kalibrert:
+        tekst += (f' (tilpasset GISS {kalibrering["fra_aar"]}-{kalibrering["til_aar"]}, '
+                  f'χ² = {kalibrering["chi2"]:.0f} for {kalibrering["n_aar"]} år, '
+                  f'prior λ = {kalibrering["prior"][0]:.2f} ± {kalibrering["prior"][1]:.2f})')
+    return fig, tekst
 
 
 if __name__ == '__main__':
+    from flask import Flask
+    app.init_app(Flask(__name__))  # appen lages med server=False, se app_wsgi
     app.run_server(debug=True, port=80)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Figurene som tegnes i nettleseren (modules/assets/klientfigurer.js) mot
+Python-versjonene, med sjekken i bench/klientfigurer.py. Hoppes over uten node.
+
+Kjøres fra rotmappen:  python -m pytest tests
+"""
+import shutil
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='krever node')
+
+
+def test_klientfigurer_som_python():
+    from bench import klientfigurer
+
+    antall, ulike = klientfigurer.avvik()
+    assert antall > 0
+    assert not ulike, '\n'.join(f'{navn}{vist}: ' + '; '.join(feil[:3]) for navn, vist, feil in ulike[:10])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Løserne i ebm/toboks.py mot løkkeversjonen calculate_temp_anomalies.
+
+Kjøres fra rotmappen:  python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from ebm.datasett import les
+from ebm.toboks import calculate_temp_anomalies, calculate_temp_anomalies_batch, calculate_temp_anomalies_filter
+
+TOLERANSE = 1e-9  # relativt til største temperatur i hver serie (minst 1 K), som i bench/toboks_losere.py
+LOSERE = [calculate_temp_anomalies_batch, calculate_temp_anomalies_filter]
+
+# Et rutenett av parametre med og uten dyphav, også med positiv tilbakekobling (lambda_sum > 0)
+LAMBDAER = np.repeat(np.linspace(-3, 0.5, 15), 6)
+GAMMAER = np.tile(np.linspace(-1.5, 0, 6), 15)
+
+
+@pytest.fixture(scope='module')
+def paadriv():
+    return les('futureForcing_IPCC6.csv')['SSP5-8.5'].to_numpy()
+
+
+def fasit(paadriv, lambdaer, gammaer):
+    Ts, To = zip(*(calculate_temp_anomalies(F, lambda_sum, gamma)
+                   for F, lambda_sum, gamma in zip(paadriv, lambdaer, gammaer)))
+    return np.array(Ts), np.array(To)
+
+
+def sjekk(svar, forventet):
+    # Med positiv tilbakekobling vokser løsningen eksponentielt, så avviket måles
+    # relativt til størrelsen på hver serie.
+    skala = np.maximum(1, np.nanmax(np.abs(forventet[0]), axis=1, keepdims=True))
+    for a, b in zip(svar, forventet):
+        assert a.shape == b.shape
+        np.testing.assert_array_equal(np.isnan(a), np.isnan(b))
+        assert np.nanmax(np.abs(a - b) / skala) < TOLERANSE
+
+
+@pytest.mark.parametrize('losar', LOSERE)
+def test_samme_paadriv_for_alle(losar, paadriv):
+    sjekk(losar(paadriv, LAMBDAER, GAMMAER), fasit([paadriv] * len(LAMBDAER), LAMBDAER, GAMMAER))
+
+
+@pytest.mark.parametrize('losar', LOSERE)
+def test_eget_paadriv_for_hvert_medlem(losar, paadriv):
+    rng = np.random.default_rng(0)
+    F = paadriv[:300] * rng.uniform(0.5, 1.5, (20, 1)) + rng.normal(0, 0.2, (20, 300))
+    lambdaer = rng.uniform(-3, -0.5, 20)
+    sjekk(losar(F, lambdaer, -0.69), fasit(F, lambdaer, [-0.69] * 20))
+
+
+@pytest.mark.parametrize('losar', LOSERE)
+def test_manglende_paadriv(losar, paadriv):
+    # Mangler pådrivet fra et år, er temperaturene NaN fra og med det året
+    F = paadriv[:200].copy()
+    F[150:] = np.nan
+    sjekk(losar(F, LAMBDAER[:12], GAMMAER[:12]), fasit([F] * 12, LAMBDAER[:12], GAMMAER[:12]))
+
+
+@pytest.mark.parametrize('losar', LOSERE)
+@pytest.mark.parametrize('n_aar', [1, 2])
+def test_korte_serier(losar, n_aar, paadriv):
+    sjekk(losar(paadriv[:n_aar], [-1.3, -0.5], [-0.69, 0]),
+          fasit([paadriv[:n_aar]] * 2, [-1.3, -0.5], [-0.69, 0]))
+
+
+def test_tomt_paadriv():
+    # Som i den opprinnelige løkka gir et tomt pådriv bare startåret
+    Ts, To = calculate_temp_anomalies([], -1.3, -0.69)
+    np.testing.assert_array_equal(Ts, [0])
+    np.testing.assert_array_equal(To, [0])